@@ -0,0 +1,130 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+
+from django.db import connections
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from drf_attachments.config import config
+
+__all__ = [
+    "AccessTracker",
+    "access_tracker",
+]
+
+# attachments written per UPDATE, bounds the size (and number of parameters) of each statement
+FLUSH_BATCH_SIZE = 100
+
+
+class AccessTracker:
+    """
+    Tracks downloads of attachments (if settings.ATTACHMENT_ACCESS_TRACKING is enabled) without a database write per
+    download: the number of downloads and the last download time per attachment are buffered in process memory and
+    written as aggregated increments with a single UPDATE per FLUSH_BATCH_SIZE attachments. A flush happens once
+    settings.ATTACHMENT_ACCESS_FLUSH_SIZE attachments are buffered or settings.ATTACHMENT_ACCESS_FLUSH_INTERVAL seconds
+    have passed since the last flush. A background timer flushes the buffer of an otherwise quiet process after the
+    interval, the remaining accesses are flushed when the process exits (accesses of a killed process are lost).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._accessed = {}  # pk -> (number of downloads, last download time)
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def record(self, attachment):
+        """Record a download of the given attachment"""
+        if not config.access_tracking():
+            return
+
+        now = timezone.now()
+        with self._lock:
+            count, _ = self._accessed.get(attachment.pk, (0, None))
+            self._accessed[attachment.pk] = (count + 1, now)
+            flush = (
+                len(self._accessed) >= config.access_flush_size()
+                or time.monotonic() - self._last_flush >= config.access_flush_interval()
+            )
+            timer = None
+            if not flush and self._timer is None:
+                timer = self._timer = threading.Timer(
+                    config.access_flush_interval(), self._flush_in_background
+                )
+                timer.daemon = True
+
+        if flush:
+            self.flush()
+        elif timer is not None:
+            timer.start()
+
+    def flush(self):
+        """Write the buffered accesses to the database, return the number of updated attachments"""
+        from drf_attachments.models import Attachment
+
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+            self._last_flush = time.monotonic()
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+
+        if not accessed:
+            return 0
+
+        items = list(accessed.items())
+        return sum(
+            self._write(Attachment, dict(items[start : start + FLUSH_BATCH_SIZE]))
+            for start in range(0, len(items), FLUSH_BATCH_SIZE)
+        )
+
+    @staticmethod
+    def _write(model, accessed):
+        # attachments with the same number of downloads (or last download time) share a single condition
+        pks_per_count = defaultdict(list)
+        pks_per_date = defaultdict(list)
+        for pk, (count, last_access_date) in accessed.items():
+            pks_per_count[count].append(pk)
+            pks_per_date[last_access_date].append(pk)
+
+        return model.all_objects.filter(pk__in=accessed).update(
+            download_count=F("download_count")
+            + Case(
+                *(
+                    When(pk__in=pks, then=Value(count))
+                    for count, pks in pks_per_count.items()
+                ),
+                default=Value(0),
+            ),
+            last_access_date=Case(
+                *(
+                    When(pk__in=pks, then=Value(last_access_date))
+                    for last_access_date, pks in pks_per_date.items()
+                ),
+                default=F("last_access_date"),
+            ),
+        )
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            # the database connections of the timer thread
+            connections.close_all()
+
+    def flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            # the database may be gone already, the buffered accesses are lost
+            pass
+
+    def pending(self):
+        """Number of attachments with buffered accesses"""
+        with self._lock:
+            return len(self._accessed)
+
+
+access_tracker = AccessTracker()
+atexit.register(access_tracker.flush_at_exit)
@@ -4,12 +4,17 @@ from django.contrib.contenttypes.admin import GenericTabularInline
 from django.contrib.contenttypes.forms import BaseGenericInlineFormSet
 from django.forms import ChoiceField, ModelForm
 from django.forms.utils import ErrorList
-from django.http import StreamingHttpResponse
+from django.http import HttpResponseForbidden, StreamingHttpResponse
 from django.urls import NoReverseMatch, path, reverse
 from django.utils.safestring import mark_safe
+from django.utils.translation import gettext_lazy as _
 
+from drf_attachments.access import access_tracker
+from drf_attachments.compression import open_stored_file
 from drf_attachments.config import config
 from drf_attachments.models.models import Attachment
+from drf_attachments.scanning import is_quarantined
+from drf_attachments.uploads import inspect_attachments
 
 __all__ = [
     "AttachmentInlineAdmin",
@@ -35,6 +40,24 @@ class AttachmentAdminMixin(object):
         return obj.context_label
 
 
+class DeletedListFilter(admin.SimpleListFilter):
+    title = _("deleted")
+    parameter_name = "deleted"
+
+    def lookups(self, request, model_admin):
+        return (
+            ("no", _("No")),
+            ("yes", _("Yes")),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == "no":
+            return queryset.not_deleted()
+        if self.value() == "yes":
+            return queryset.deleted()
+        return queryset
+
+
 class AttachmentForm(ModelForm):
     context = ChoiceField(choices=config.context_choices(values_list=False))
 
@@ -42,7 +65,17 @@ class AttachmentForm(ModelForm):
 @admin.register(Attachment)
 class AttachmentAdmin(admin.ModelAdmin, AttachmentAdminMixin):
     form = AttachmentForm
-    list_display = ["pk", "name", "content_object", "context_label"]
+    list_display = [
+        "pk",
+        "name",
+        "content_object",
+        "context_label",
+        "download_count",
+        "last_access_date",
+        "deleted_at",
+    ]
+    list_filter = (DeletedListFilter, "processing_status", "scan_status")
+    actions = ("restore",)
     fields = (
         "name",
         "context",
@@ -51,19 +84,48 @@ class AttachmentAdmin(admin.ModelAdmin, AttachmentAdminMixin):
         "object_id",
         "content_object",
         "file",
+        "volume",
         "size",
         "mime_type",
         "extension",
         "creation_date",
+        "processing_status",
+        "scan_status",
+        "content_hash",
+        "download_count",
+        "last_access_date",
+        "deleted_at",
     )
     readonly_fields = (
         "content_object",
+        "volume",
         "size",
         "mime_type",
         "extension",
         "creation_date",
+        "processing_status",
+        "scan_status",
+        "content_hash",
+        "download_count",
+        "last_access_date",
+        "deleted_at",
     )
 
+    def get_queryset(self, request):
+        # include soft-deleted attachments (to restore them)
+        queryset = Attachment.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    @admin.action(description=_("Restore selected soft-deleted attachments"))
+    def restore(self, request, queryset):
+        count = queryset.restore()
+        self.message_user(
+            request, _("Restored {count} attachments.").format(count=count)
+        )
+
     def get_object(self, request, object_id, from_field=None):
         obj = super().get_object(request, object_id, from_field)
 
@@ -104,9 +166,16 @@ class AttachmentAdmin(admin.ModelAdmin, AttachmentAdminMixin):
         return custom_urls + urls
 
     def download_view(self, request, object_id):
-        attachment = Attachment.objects.get(pk=object_id)
+        attachment = Attachment.all_objects.get(pk=object_id)
+        if is_quarantined(attachment):
+            return HttpResponseForbidden(
+                _("The file is quarantined until it was scanned and found clean.")
+            )
+
+        access_tracker.record(attachment)
+        # compressed files are served decompressed (see settings.ATTACHMENT_COMPRESSION)
         response = StreamingHttpResponse(
-            attachment.file,
+            open_stored_file(attachment),
             content_type=attachment.get_mime_type(),
         )
         response["Content-Disposition"] = rfc5987_content_disposition(
@@ -163,19 +232,45 @@ class DynamicallyDisabledAttachmentInlineForm(AttachmentForm):
                 self.fields[field].disabled = True
 
 
-class DynamicallyDisabledAttachmentInlineFormSet(BaseGenericInlineFormSet):
+class AttachmentInlineFormSet(BaseGenericInlineFormSet):
+    """
+    Inspects and validates the files of all new inline attachments concurrently (see drf_attachments.uploads), their
+    errors are shown at the respective inline form
+    """
+
+    def clean(self):
+        super().clean()
+        forms = [
+            form
+            for form in self.extra_forms
+            if form.has_changed()
+            and not form.errors
+            and not self._should_delete_form(form)
+        ]
+        for form in forms:
+            form.instance.content_object = self.instance
+
+        errors = inspect_attachments(form.instance for form in forms)
+        for index, error in errors.items():
+            form = forms[index]
+            for field, messages in error.detail.items():
+                form.add_error(field if field in form.fields else None, messages)
+
+
+class DynamicallyDisabledAttachmentInlineFormSet(AttachmentInlineFormSet):
     def add_fields(self, form, index):
         """
         Disables the DELETE checkbox of disabled inline entries.
         """
         super().add_fields(form, index)
-        if hasattr(form, 'disable_inline_fields') and form.disable_inline_fields():
-            form.fields['DELETE'].disabled = True
+        if hasattr(form, "disable_inline_fields") and form.disable_inline_fields():
+            form.fields["DELETE"].disabled = True
 
 
 class BaseAttachmentInlineAdmin(GenericTabularInline, AttachmentAdminMixin):
     model = Attachment
     form = AttachmentForm
+    formset = AttachmentInlineFormSet
     extra = 0
     fields = (
         "name",
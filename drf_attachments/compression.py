@@ -0,0 +1,247 @@
+import os
+import zlib
+from tempfile import SpooledTemporaryFile
+
+from django.core.files import File
+
+from drf_attachments.config import config
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+__all__ = [
+    "Codec",
+    "DecompressedFile",
+    "DeflateCodec",
+    "GzipCodec",
+    "accepts_encoding",
+    "compress_file",
+    "get_codec",
+    "get_compression_rule",
+    "open_stored_file",
+    "register_codec",
+]
+
+CHUNK_SIZE = 64 * 1024
+# compressed files are kept in memory up to this size, larger ones are spooled to a temporary file
+SPOOL_SIZE = 1024 * 1024
+# files smaller than this are stored uncompressed unless a rule defines its own "min_size"
+DEFAULT_MIN_SIZE = 1024
+# compressed files must be at least 10% smaller than the original unless a rule defines its own "min_savings"
+DEFAULT_MIN_SAVINGS = 0.1
+
+# codec name -> Codec
+_codecs = {}
+
+
+def register_codec(codec_class):
+    """Register a Codec (subclass) by its name, so it can be used in settings.ATTACHMENT_COMPRESSION"""
+    _codecs[codec_class.name] = codec_class()
+    return codec_class
+
+
+def get_codec(name):
+    """Return the registered Codec of the given name (raise a KeyError for unknown codecs)"""
+    return _codecs[name]
+
+
+class Codec:
+    """
+    Compression format of stored files (see settings.ATTACHMENT_COMPRESSION). Downloads of clients accepting its HTTP
+    content coding are served without decompressing the file.
+    """
+
+    name = None
+    content_encoding = None
+    # appended to the name of the compressed file
+    extension = ""
+
+    def compressor(self, level=None):
+        """Return an object with compress(data) and flush() (like zlib.compressobj())"""
+        raise NotImplementedError()
+
+    def decompressor(self):
+        """Return an object with decompress(data) and flush() (like zlib.decompressobj())"""
+        raise NotImplementedError()
+
+
+@register_codec
+class GzipCodec(Codec):
+    name = "gzip"
+    content_encoding = "gzip"
+    extension = ".gz"
+    wbits = 16 + zlib.MAX_WBITS
+
+    def compressor(self, level=None):
+        return zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION if level is None else level,
+            zlib.DEFLATED,
+            self.wbits,
+        )
+
+    def decompressor(self):
+        return zlib.decompressobj(self.wbits)
+
+
+@register_codec
+class DeflateCodec(GzipCodec):
+    """zlib format (the HTTP content coding "deflate")"""
+
+    name = "deflate"
+    content_encoding = "deflate"
+    extension = ".zz"
+    wbits = zlib.MAX_WBITS
+
+
+if brotli is not None:  # pragma: no cover
+
+    class _BrotliCompressor:
+        def __init__(self, level):
+            self.compressor = (
+                brotli.Compressor()
+                if level is None
+                else brotli.Compressor(quality=level)
+            )
+
+        def compress(self, data):
+            return self.compressor.process(data)
+
+        def flush(self):
+            return self.compressor.finish()
+
+    class _BrotliDecompressor:
+        def __init__(self):
+            self.decompressor = brotli.Decompressor()
+
+        def decompress(self, data):
+            return self.decompressor.process(data)
+
+        def flush(self):
+            return b""
+
+    @register_codec
+    class BrotliCodec(Codec):
+        """Brotli (requires the optional "brotli" package)"""
+
+        name = "brotli"
+        content_encoding = "br"
+        extension = ".br"
+
+        def compressor(self, level=None):
+            return _BrotliCompressor(level)
+
+        def decompressor(self):
+            return _BrotliDecompressor()
+
+
+def get_compression_rule(mime_type):
+    """
+    Return the options ("codec", "level", "min_size" and "min_savings") of settings.ATTACHMENT_COMPRESSION for the
+    given mime type (an exact match before "<type>/*"), None if files of the mime type are stored uncompressed
+    """
+    rules = config.compression()
+    main_type = mime_type.split("/", 1)[0]
+    for key in (mime_type, f"{main_type}/*"):
+        if key in rules:
+            if rules[key] is None:
+                return None
+            return {
+                "codec": config.compression_codec(),
+                "level": None,
+                "min_size": DEFAULT_MIN_SIZE,
+                "min_savings": DEFAULT_MIN_SAVINGS,
+                **rules[key],
+            }
+    return None
+
+
+def compress_file(file, codec, level=None, min_savings=0):
+    """
+    Compress the file in chunks with the given codec (keeping its position). Return the compressed file named
+    <name><codec.extension>, None if it is not smaller than the original by the given fraction (min_savings).
+    """
+    initial_pos = file.tell()
+    compressor = codec.compressor(level)
+    output = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    for chunk in file.chunks(CHUNK_SIZE):
+        output.write(compressor.compress(chunk))
+    output.write(compressor.flush())
+    file.seek(initial_pos)
+
+    if output.tell() >= file.size * (1 - min_savings):
+        output.close()
+        return None
+
+    output.seek(0)
+    return File(output, name=f"{os.path.basename(file.name)}{codec.extension}")
+
+
+class DecompressedFile:
+    """Read-only, non-seekable stream of the decompressed content of a file (closes the file when it is closed)"""
+
+    def __init__(self, file, codec):
+        self.file = file
+        self.decompressor = codec.decompressor()
+        self.buffer = bytearray()
+        self.eof = False
+
+    def read(self, size=-1):
+        while not self.eof and (size is None or size < 0 or len(self.buffer) < size):
+            chunk = self.file.read(CHUNK_SIZE)
+            if chunk:
+                self.buffer += self.decompressor.decompress(chunk)
+            else:
+                self.buffer += self.decompressor.flush()
+                self.eof = True
+
+        if size is None or size < 0:
+            size = len(self.buffer)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        return iter(lambda: self.read(chunk_size), b"")
+
+    def __iter__(self):
+        return self.chunks()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_stored_file(attachment):
+    """Open the stored file of the attachment for reading its original (decompressed) content"""
+    file = attachment.file.storage.open(attachment.file.name, "rb")
+    if not attachment.meta.get("compression"):
+        return file
+    return DecompressedFile(file, get_codec(attachment.meta["compression"]))
+
+
+def accepts_encoding(accept_encoding, content_encoding):
+    """Whether the Accept-Encoding header value allows the given content coding (explicitly or via "*")"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    quality = qualities.get(content_encoding, qualities.get("*", 0.0))
+    return quality > 0
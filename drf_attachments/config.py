@@ -2,6 +2,7 @@ import importlib
 from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 
 from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
 from generic_relations.relations import GenericRelatedField
 
 __all__ = [
@@ -110,5 +111,239 @@ class Config:
         """
         return cls.get_optional_setting(DEFAULT_CONTEXT_SETTING)
 
+    @classmethod
+    def signed_download_urls(cls) -> bool:
+        """
+        Extract ATTACHMENT_SIGNED_DOWNLOAD_URLS from the settings (disabled by default)
+        """
+        return bool(cls.get_optional_setting("ATTACHMENT_SIGNED_DOWNLOAD_URLS", False))
+
+    @classmethod
+    def signed_download_url_max_age(cls) -> int:
+        """
+        Extract ATTACHMENT_SIGNED_DOWNLOAD_URL_MAX_AGE (in seconds) from the settings (1 hour by default)
+        """
+        return int(
+            cls.get_optional_setting("ATTACHMENT_SIGNED_DOWNLOAD_URL_MAX_AGE", 60 * 60)
+        )
+
+    @classmethod
+    def usage_tracking(cls) -> bool:
+        """
+        Extract ATTACHMENT_USAGE_TRACKING from the settings (disabled by default)
+        """
+        return bool(cls.get_optional_setting("ATTACHMENT_USAGE_TRACKING", False))
+
+    @classmethod
+    def storage_class(cls) -> str:
+        """
+        Extract ATTACHMENT_STORAGE_CLASS (dotted path of a django Storage class accepting a `location`) from the
+        settings
+        """
+        return cls.get_optional_setting(
+            "ATTACHMENT_STORAGE_CLASS", "drf_attachments.storage.AttachmentFileStorage"
+        )
+
+    @classmethod
+    def storage_volumes(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Extract ATTACHMENT_STORAGE_VOLUMES from the settings: a dict of volume name -> location (or a dict with the
+        keys "location", "capacity" (in bytes, optional) and "weight" (1 by default)).
+        New files are spread across the volumes if it is defined.
+        """
+        volumes = cls.get_optional_setting("ATTACHMENT_STORAGE_VOLUMES") or {}
+        return {
+            name: {"location": options} if isinstance(options, str) else options
+            for name, options in volumes.items()
+        }
+
+    @classmethod
+    def storage_volume_stats_ttl(cls) -> int:
+        """
+        Extract ATTACHMENT_STORAGE_VOLUME_STATS_TTL (seconds the measured free space of a volume is reused) from the
+        settings (1 minute by default)
+        """
+        return int(cls.get_optional_setting("ATTACHMENT_STORAGE_VOLUME_STATS_TTL", 60))
+
+    @classmethod
+    def cold_storage_after(cls) -> Optional[int]:
+        """
+        Extract ATTACHMENT_COLD_STORAGE_AFTER (seconds without access until files are moved to the cold storage tier)
+        from the settings (tiering is disabled if it is not defined)
+        """
+        return cls.get_optional_setting("ATTACHMENT_COLD_STORAGE_AFTER")
+
+    @classmethod
+    def access_tracking(cls) -> bool:
+        """
+        Extract ATTACHMENT_ACCESS_TRACKING from the settings (disabled by default)
+        """
+        return bool(cls.get_optional_setting("ATTACHMENT_ACCESS_TRACKING", False))
+
+    @classmethod
+    def access_flush_interval(cls) -> int:
+        """
+        Extract ATTACHMENT_ACCESS_FLUSH_INTERVAL (seconds between writes of the buffered downloads) from the settings
+        (1 minute by default)
+        """
+        return int(cls.get_optional_setting("ATTACHMENT_ACCESS_FLUSH_INTERVAL", 60))
+
+    @classmethod
+    def access_flush_size(cls) -> int:
+        """
+        Extract ATTACHMENT_ACCESS_FLUSH_SIZE (number of buffered attachments that triggers a write) from the settings
+        """
+        return int(cls.get_optional_setting("ATTACHMENT_ACCESS_FLUSH_SIZE", 1000))
+
+    @classmethod
+    def meta_read_limit(cls) -> int:
+        """
+        Extract ATTACHMENT_META_READ_LIMIT (maximum number of bytes meta data extractors read from the start or end of
+        a file) from the settings (64 KiB by default)
+        """
+        return int(cls.get_optional_setting("ATTACHMENT_META_READ_LIMIT", 64 * 1024))
+
+    @classmethod
+    def image_variants(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Extract ATTACHMENT_IMAGE_VARIANTS from the settings: a dict of variant name -> options ("width", "height",
+        "format", "quality" and "on_upload")
+        """
+        return cls.get_optional_setting("ATTACHMENT_IMAGE_VARIANTS") or {}
+
+    @classmethod
+    def image_variant_workers(cls) -> Optional[int]:
+        """
+        Extract ATTACHMENT_IMAGE_VARIANT_WORKERS (number of processes rendering image variants) from the settings
+        (the number of CPUs by default, 0 renders within the current process)
+        """
+        return cls.get_optional_setting("ATTACHMENT_IMAGE_VARIANT_WORKERS")
+
+    @classmethod
+    def processing_stages(cls) -> List[str]:
+        """
+        Extract ATTACHMENT_PROCESSING_STAGES (dotted paths of ProcessingStage classes run in the background after an
+        upload) from the settings
+        """
+        return cls.get_optional_setting(
+            "ATTACHMENT_PROCESSING_STAGES",
+            [
+                "drf_attachments.scanning.ScanStage",
+                "drf_attachments.variants.ImageVariantStage",
+            ],
+        )
+
+    @classmethod
+    def processing_executor(cls) -> str:
+        """
+        Extract ATTACHMENT_PROCESSING_EXECUTOR ("thread" for a local thread pool or "sync" to process within the
+        committing thread) from the settings
+        """
+        return cls.get_optional_setting("ATTACHMENT_PROCESSING_EXECUTOR", "thread")
+
+    @classmethod
+    def processing_workers(cls) -> int:
+        """
+        Extract ATTACHMENT_PROCESSING_WORKERS (number of background processing threads) from the settings
+        """
+        return int(cls.get_optional_setting("ATTACHMENT_PROCESSING_WORKERS", 4))
+
+    @classmethod
+    def scanner(cls) -> Optional[str]:
+        """
+        Extract ATTACHMENT_SCANNER (dotted path of a drf_attachments.scanning.Scanner class) from the settings
+        (uploads are not scanned if it is not defined)
+        """
+        return cls.get_optional_setting("ATTACHMENT_SCANNER")
+
+    @classmethod
+    def scanner_options(cls) -> Dict[str, Any]:
+        """
+        Extract ATTACHMENT_SCANNER_OPTIONS (keyword arguments of the scanner class) from the settings
+        """
+        return cls.get_optional_setting("ATTACHMENT_SCANNER_OPTIONS") or {}
+
+    @classmethod
+    def scan_concurrency(cls) -> int:
+        """
+        Extract ATTACHMENT_SCAN_CONCURRENCY (maximum number of files scanned at once per process) from the settings
+        """
+        return int(cls.get_optional_setting("ATTACHMENT_SCAN_CONCURRENCY", 2))
+
+    @classmethod
+    def mime_sniff_window(cls) -> int:
+        """
+        Extract ATTACHMENT_MIME_SNIFF_WINDOW (number of bytes read to identify container formats like OOXML) from the
+        settings
+        """
+        return int(cls.get_optional_setting("ATTACHMENT_MIME_SNIFF_WINDOW", 64 * 1024))
+
+    @classmethod
+    def compression(cls) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Extract ATTACHMENT_COMPRESSION from the settings: a dict of mime type (or "<type>/*") -> options ("codec",
+        "level", "min_size" and "min_savings") of the files stored compressed, None stores a mime type uncompressed.
+        Files are stored uncompressed if it is not defined.
+        """
+        return cls.get_optional_setting("ATTACHMENT_COMPRESSION") or {}
+
+    @classmethod
+    def compression_codec(cls) -> str:
+        """
+        Extract ATTACHMENT_COMPRESSION_CODEC (name of the codec of rules without a "codec", see
+        drf_attachments.compression) from the settings
+        """
+        return cls.get_optional_setting("ATTACHMENT_COMPRESSION_CODEC", "gzip")
+
+    @classmethod
+    def upload_workers(cls) -> int:
+        """
+        Extract ATTACHMENT_UPLOAD_WORKERS (number of threads inspecting the files of multi-file uploads) from the
+        settings (0 inspects them in the calling thread)
+        """
+        return int(cls.get_optional_setting("ATTACHMENT_UPLOAD_WORKERS", 4))
+
+    @classmethod
+    def delete_batch_size(cls) -> int:
+        """
+        Extract ATTACHMENT_DELETE_BATCH_SIZE (number of attachments deleted per query) from the settings
+        """
+        return int(cls.get_optional_setting("ATTACHMENT_DELETE_BATCH_SIZE", 1000))
+
+    @classmethod
+    def soft_delete(cls) -> bool:
+        """
+        Extract ATTACHMENT_SOFT_DELETE from the settings (disabled by default)
+        """
+        return bool(cls.get_optional_setting("ATTACHMENT_SOFT_DELETE", False))
+
+    @classmethod
+    def soft_delete_retention(cls) -> int:
+        """
+        Extract ATTACHMENT_SOFT_DELETE_RETENTION (seconds until soft-deleted attachments are purged) from the settings
+        (1 day by default)
+        """
+        return int(
+            cls.get_optional_setting("ATTACHMENT_SOFT_DELETE_RETENTION", 60 * 60 * 24)
+        )
+
+    @classmethod
+    def representation_cache_alias(cls) -> Optional[str]:
+        """
+        Extract ATTACHMENT_REPRESENTATION_CACHE (alias of a settings.CACHES entry) from the settings.
+        The representation cache is disabled if it is not defined.
+        """
+        return cls.get_optional_setting("ATTACHMENT_REPRESENTATION_CACHE")
+
+    @classmethod
+    def representation_cache_timeout(cls) -> Optional[int]:
+        """
+        Extract ATTACHMENT_REPRESENTATION_CACHE_TIMEOUT (in seconds) from the settings
+        (the cache's default timeout is used if it is not defined)
+        """
+        return cls.get_optional_setting(
+            "ATTACHMENT_REPRESENTATION_CACHE_TIMEOUT", DEFAULT_TIMEOUT
+        )
+
 
 config = Config()
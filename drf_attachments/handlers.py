@@ -1,16 +1,45 @@
-import os
-
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from drf_attachments.models import Attachment
-from drf_attachments.utils import remove_file
+from drf_attachments.models import Attachment, AttachmentUsage
+from drf_attachments.models.querysets import is_bulk_delete_in_progress
+from drf_attachments.rest.cache import representation_cache
+from drf_attachments.utils import delete_files
 
 
 @receiver(post_delete, sender=Attachment)
 def auto_delete_attachment_file(sender, instance, **kwargs):
     """
     Deletes file after corresponding `Attachment` object is deleted.
+    Bulk deletes via `AttachmentQuerySet.delete` remove the files per batch instead.
+    """
+    if not instance.file or is_bulk_delete_in_progress():
+        return
+    # the file may be shared with deduplicated Attachments
+    if not Attachment.all_objects.get_referenced_files(
+        [(instance.file.name, instance.volume)]
+    ):
+        delete_files(instance.file.storage, [instance.file.name])
+
+
+@receiver(post_delete, sender=Attachment)
+def record_deleted_attachment_usage(sender, instance, **kwargs):
+    """
+    Decrements the usage counters of the content object of a deleted `Attachment`.
+    """
+    # the usage of soft-deleted attachments was already removed from the counters
+    if is_bulk_delete_in_progress() or instance.is_deleted:
+        return
+
+    AttachmentUsage.objects.record(
+        [(instance.content_type_id, instance.object_id, -1, -instance.get_size())]
+    )
+
+
+@receiver(post_save, sender=Attachment)
+@receiver(post_delete, sender=Attachment)
+def invalidate_attachment_representation(sender, instance, **kwargs):
+    """
+    Removes the cached representations of a changed or deleted `Attachment`.
     """
-    if instance.file:
-        remove_file(instance.file.path)
+    representation_cache.invalidate(instance.pk)
@@ -0,0 +1,124 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from drf_attachments.models import Attachment
+from drf_attachments.orphans import (
+    find_missing_files,
+    find_orphaned_files,
+    get_storage_scopes,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Find (and delete) stored files no attachment refers to, e.g. left behind by crashes or concurrent uploads. "
+        "The storages are walked as a stream and compared with the attachments in batches, orphaned files are "
+        "deleted in parallel. With --rows, attachments whose files are missing are collected as well."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the orphans, delete nothing",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=60 * 60 * 24,
+            help="Only collect files (and attachments) at least this many seconds old, so uploads in progress are "
+            "never affected (default: 86400)",
+        )
+        parser.add_argument(
+            "--rows",
+            action="store_true",
+            help="Delete attachments whose files are missing from their storage as well",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of files deleted or looked up in parallel (default: 4)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of files compared per query (default: settings.ATTACHMENT_DELETE_BATCH_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        older_than = time.time() - options["min_age"]
+        dry_run = options["dry_run"]
+        workers = options["workers"]
+
+        orphan_count = 0
+        failed = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for storage, scope in get_storage_scopes():
+                if not isinstance(storage, FileSystemStorage):
+                    self.stderr.write(
+                        f"Skipped {type(storage).__name__}, only file system storages can be walked."
+                    )
+                    continue
+
+                for names in find_orphaned_files(
+                    storage,
+                    scope,
+                    older_than=older_than,
+                    batch_size=options["batch_size"],
+                ):
+                    orphan_count += len(names)
+                    self.report(names, "Orphaned file")
+                    if not dry_run:
+                        # image variants are walked (and deleted) by themselves
+                        for name, error in zip(
+                            names, pool.map(partial(self.delete, storage), names)
+                        ):
+                            if error is not None:
+                                failed.append((name, error))
+
+        action = "Found" if dry_run else "Deleted"
+        self.stdout.write(
+            self.style.SUCCESS(f"{action} {orphan_count - len(failed)} orphaned files.")
+        )
+        for name, error in failed:
+            self.stderr.write(f"Failed to delete the orphaned file {name}: {error}")
+
+        if options["rows"]:
+            missing_count = 0
+            for pks in find_missing_files(
+                Attachment.all_objects.all(),
+                older_than=older_than,
+                workers=workers,
+                batch_size=options["batch_size"],
+            ):
+                missing_count += len(pks)
+                self.report(pks, "Missing file of attachment")
+                if not dry_run:
+                    # updates the usage counters as well
+                    Attachment.all_objects.filter(pk__in=pks).hard_delete()
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{action} {missing_count} attachments with missing files."
+                )
+            )
+
+    @staticmethod
+    def delete(storage, name):
+        try:
+            storage.delete(name)
+        except Exception as e:
+            return e
+        return None
+
+    def report(self, items, label):
+        if self.verbosity >= 2:
+            for item in items:
+                self.stdout.write(f"{label}: {item}")
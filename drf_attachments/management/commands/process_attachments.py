@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from drf_attachments.models import Attachment
+from drf_attachments.processing import FAILED, PENDING, process_attachment
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the background processing stages (see settings.ATTACHMENT_PROCESSING_STAGES) of attachments that are "
+        'still "pending" (e.g. because the process handling them was terminated), and of "failed" attachments with '
+        "--failed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=60 * 60,
+            help="Only process attachments modified at least this many seconds ago (default: 1 hour)",
+        )
+        parser.add_argument(
+            "--failed",
+            action="store_true",
+            help="Retry attachments whose processing failed as well",
+        )
+
+    def handle(self, *args, **options):
+        statuses = [PENDING, FAILED] if options["failed"] else [PENDING]
+        modified_before = timezone.now() - timedelta(seconds=options["older_than"])
+        pks = Attachment.objects.filter(
+            processing_status__in=statuses,
+            last_modification_date__lte=modified_before,
+        ).values_list("pk", flat=True)
+
+        results = {}
+        for pk in pks.iterator():
+            status = process_attachment(pk)
+            results[status] = results.get(status, 0) + 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {sum(results.values())} attachments "
+                f"({results.get(FAILED, 0)} failed)."
+            )
+        )
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from drf_attachments.config import config
+from drf_attachments.models import Attachment
+
+
+class Command(BaseCommand):
+    help = (
+        "Permanently delete soft-deleted attachments (see settings.ATTACHMENT_SOFT_DELETE) and their files once "
+        "the retention period (settings.ATTACHMENT_SOFT_DELETE_RETENTION) has passed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=None,
+            help="Only purge attachments soft-deleted at least this many seconds ago "
+            "(default: settings.ATTACHMENT_SOFT_DELETE_RETENTION)",
+        )
+
+    def handle(self, *args, **options):
+        older_than = options["older_than"]
+        if older_than is None:
+            older_than = config.soft_delete_retention()
+
+        deleted_before = timezone.now() - timedelta(seconds=older_than)
+        # deleted in batches of settings.ATTACHMENT_DELETE_BATCH_SIZE including their files
+        count, _ = Attachment.all_objects.filter(
+            deleted_at__lte=deleted_before
+        ).hard_delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {count} attachments."))
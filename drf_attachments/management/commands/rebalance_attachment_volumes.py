@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from drf_attachments.config import config
+from drf_attachments.models import Attachment
+from drf_attachments.storage import choose_storage_volume, get_volume_tier
+
+
+class Command(BaseCommand):
+    help = (
+        "Move attachment files from the given storage volumes (by default: all volumes with a weight of 0) to the "
+        "other volumes of the same storage tier, placed by their free space and weight. "
+        "Files are copied in parallel, the attachments are updated and the source files removed per batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            action="append",
+            default=None,
+            help="Volume to move files from (can be repeated)",
+        )
+        parser.add_argument(
+            "--unassigned",
+            action="store_true",
+            help="Move files of attachments that are not placed on any volume yet (default storage) as well",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Move at most this many files",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of files copied in parallel (default: 4)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of attachments moved per batch (default: settings.ATTACHMENT_DELETE_BATCH_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        volumes = config.storage_volumes()
+        if not volumes:
+            raise CommandError("settings.ATTACHMENT_STORAGE_VOLUMES is not defined.")
+
+        sources = options["source"]
+        if sources is None:
+            sources = [
+                name
+                for name, volume_options in volumes.items()
+                if float(volume_options.get("weight", 1)) <= 0
+            ]
+        unknown = set(sources) - set(volumes)
+        if unknown:
+            raise CommandError(f"Unknown volumes: {', '.join(sorted(unknown))}")
+        if options["unassigned"]:
+            sources = [*sources, ""]
+        if not sources:
+            raise CommandError("No volumes to move files from.")
+
+        def choose_volume(size, volume):
+            # files stay on the storage tier of their volume
+            return choose_storage_volume(
+                size, exclude=sources, tier=get_volume_tier(volume)
+            )
+
+        moved, failed = Attachment.all_objects.filter(
+            volume__in=sources
+        ).move_to_volumes(
+            choose_volume,
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            limit=options["limit"],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} attachment files."))
+        for pk, error in failed:
+            self.stderr.write(f"Failed to move the file of attachment {pk}: {error}")
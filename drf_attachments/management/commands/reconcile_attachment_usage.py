@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from drf_attachments.models import Attachment, AttachmentUsage
+from drf_attachments.models.querysets import get_size_expression
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the attachment usage counters (see settings.ATTACHMENT_USAGE_TRACKING) of all content objects "
+        "and content types from the stored attachments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of usage counters to insert per query (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        per_object = (
+            Attachment.objects.order_by()
+            .values("content_type_id", "object_id")
+            .annotate(
+                attachment_count=Count("pk"), total_size=Sum(get_size_expression())
+            )
+        )
+
+        content_type_totals = defaultdict(lambda: [0, 0])
+        object_count = 0
+
+        with transaction.atomic():
+            AttachmentUsage.objects.all().delete()
+
+            batch = []
+            for row in per_object.iterator(chunk_size=batch_size):
+                usage = AttachmentUsage(
+                    content_type_id=row["content_type_id"],
+                    object_id=row["object_id"],
+                    attachment_count=row["attachment_count"],
+                    total_size=row["total_size"] or 0,
+                )
+                batch.append(usage)
+                content_type_totals[usage.content_type_id][0] += usage.attachment_count
+                content_type_totals[usage.content_type_id][1] += usage.total_size
+                object_count += 1
+
+                if len(batch) >= batch_size:
+                    AttachmentUsage.objects.bulk_create(batch)
+                    batch = []
+
+            batch.extend(
+                AttachmentUsage(
+                    content_type_id=content_type_id,
+                    object_id=AttachmentUsage.objects.CONTENT_TYPE_TOTAL,
+                    attachment_count=attachment_count,
+                    total_size=total_size,
+                )
+                for content_type_id, (
+                    attachment_count,
+                    total_size,
+                ) in content_type_totals.items()
+            )
+            AttachmentUsage.objects.bulk_create(batch, batch_size=batch_size)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reconciled the usage of {object_count} content objects "
+                f"and {len(content_type_totals)} content types."
+            )
+        )
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from drf_attachments.access import access_tracker
+from drf_attachments.config import config
+from drf_attachments.models import Attachment
+from drf_attachments.storage import (
+    COLD_TIER,
+    HOT_TIER,
+    choose_storage_volume,
+    get_tier_volumes,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the files of attachments that have not been downloaded for settings.ATTACHMENT_COLD_STORAGE_AFTER "
+        "seconds from the hot to the cold storage tier (volumes of settings.ATTACHMENT_STORAGE_VOLUMES with "
+        '"tier": "cold"). With --promote, files of the cold tier that were downloaded since are moved back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=None,
+            help="Seconds without access until files are moved to the cold tier "
+            "(default: settings.ATTACHMENT_COLD_STORAGE_AFTER)",
+        )
+        parser.add_argument(
+            "--promote",
+            action="store_true",
+            help="Move recently downloaded files of the cold tier back to the hot tier as well",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Move at most this many files (per direction)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of files copied in parallel (default: 4)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of attachments moved per batch (default: settings.ATTACHMENT_DELETE_BATCH_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        older_than = options["older_than"]
+        if older_than is None:
+            older_than = config.cold_storage_after()
+        if older_than is None:
+            raise CommandError("settings.ATTACHMENT_COLD_STORAGE_AFTER is not defined.")
+        if not get_tier_volumes(COLD_TIER):
+            raise CommandError(
+                "settings.ATTACHMENT_STORAGE_VOLUMES does not define any cold volume."
+            )
+
+        # write the accesses buffered by this process
+        access_tracker.flush()
+
+        accessed_before = timezone.now() - timedelta(seconds=older_than)
+        attachments = Attachment.objects.alias(
+            accessed=Coalesce("last_access_date", "creation_date")
+        )
+
+        # files without a volume are stored on the hot tier
+        hot = Q(volume__in=get_tier_volumes(HOT_TIER)) | Q(volume="")
+        self.move(
+            attachments.filter(hot, accessed__lt=accessed_before), COLD_TIER, options
+        )
+
+        if options["promote"]:
+            cold = Q(volume__in=get_tier_volumes(COLD_TIER))
+            self.move(
+                attachments.filter(cold, last_access_date__gte=accessed_before),
+                HOT_TIER,
+                options,
+            )
+
+    def move(self, queryset, tier, options):
+        moved, failed = queryset.move_to_volumes(
+            lambda size, volume: choose_storage_volume(size, tier=tier),
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            limit=options["limit"],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Moved {moved} attachment files to the {tier} tier.")
+        )
+        for pk, error in failed:
+            self.stderr.write(f"Failed to move the file of attachment {pk}: {error}")
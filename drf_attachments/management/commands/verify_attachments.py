@@ -0,0 +1,230 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from drf_attachments.config import config
+from drf_attachments.models import Attachment, AttachmentUsage
+from drf_attachments.rest.cache import representation_cache
+from drf_attachments.storage import get_attachment_storage_for_content_type
+from drf_attachments.verification import (
+    Checkpoint,
+    get_meta_drift,
+    inspect_stored_files,
+)
+from drf_attachments.workers import create_process_pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify the meta data (size, mime_type, extension and the meta data of the extractors) and the content hash "
+        "of all attachments against their stored files, re-inspected by a process pool in batches ordered by pk. "
+        "Drifted or missing values are updated with one bulk_update() per batch. The progress is checkpointed, so an "
+        "interrupted run is resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of processes inspecting files (default: number of CPUs, 0 inspects them within the "
+            "command's process)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of attachments verified per batch (default: settings.ATTACHMENT_DELETE_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help="File to store the progress in after each batch, an existing checkpoint is resumed (removed once "
+            "all attachments are verified)",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing checkpoint and verify all attachments",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report mismatches, update nothing",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        batch_size = options["batch_size"] or config.delete_batch_size()
+        dry_run = options["dry_run"]
+
+        checkpoint = Checkpoint(options["checkpoint"])
+        if options["restart"]:
+            checkpoint.remove()
+        elif checkpoint.load():
+            self.stdout.write(f"Resuming after attachment {checkpoint.last_pk}.")
+        stats = checkpoint.stats
+
+        queryset = Attachment.all_objects.order_by("pk")
+        workers = options["workers"]
+        pool = create_process_pool(workers) if workers != 0 else None
+        started = time.monotonic()
+        verified = verified_bytes = 0
+        try:
+            while True:
+                batch_queryset = queryset
+                if checkpoint.last_pk is not None:
+                    batch_queryset = queryset.filter(pk__gt=checkpoint.last_pk)
+                rows = list(
+                    batch_queryset.values_list(
+                        "pk",
+                        "file",
+                        "content_type_id",
+                        "volume",
+                        "meta",
+                        "content_hash",
+                    )[:batch_size]
+                )
+                if not rows:
+                    break
+
+                files = [
+                    (
+                        get_attachment_storage_for_content_type(
+                            content_type_id, volume
+                        ).location,
+                        name,
+                        meta.get("compression"),
+                    )
+                    for pk, name, content_type_id, volume, meta, content_hash in rows
+                ]
+                results = inspect_stored_files(files, pool=pool)
+                changes = self.compare(rows, results, stats)
+                if changes and not dry_run:
+                    self.update(changes, stats)
+
+                verified += len(rows)
+                verified_bytes += sum(
+                    result[0]["size"] for result in results if result is not None
+                )
+                checkpoint.save(rows[-1][0])
+                if self.verbosity >= 2:
+                    self.stdout.write(
+                        f"Verified {verified} attachments ({self.throughput(verified, started)})."
+                    )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        checkpoint.remove()
+        self.write_summary(stats, verified, verified_bytes, started, dry_run)
+
+    def compare(self, rows, results, stats):
+        """
+        Compare the stored meta data of the rows with the inspected one. Return the {pk: (name, inspected_meta,
+        inspected_hash)} of the Attachments to update.
+        """
+        changes = {}
+        for row, result in zip(rows, results):
+            pk, name, _content_type_id, _volume, meta, content_hash = row
+            stats["verified"] += 1
+            if result is None:
+                stats["missing"] += 1
+                self.report(f"Missing file of attachment {pk}: {name}")
+                continue
+
+            inspected_meta, inspected_hash = result
+            drift = get_meta_drift(meta, inspected_meta)
+            if drift:
+                stats["mismatched"] += 1
+                stats.update(f"drift:{key}" for key in drift)
+                self.report(f"Drifted meta data of attachment {pk}: {', '.join(drift)}")
+            if not content_hash:
+                stats["hashes_backfilled"] += 1
+            elif content_hash != inspected_hash:
+                stats["hash_mismatches"] += 1
+                self.report(f"Content hash mismatch of attachment {pk}")
+
+            if drift or content_hash != inspected_hash:
+                changes[pk] = (name, inspected_meta, inspected_hash)
+        return changes
+
+    def update(self, changes, stats):
+        """
+        Write the inspected meta data and hashes with a single bulk_update(). The rows are re-read (and locked) first:
+        Attachments whose file was replaced in the meantime are skipped, concurrent changes of other meta data keys
+        (e.g. "processing_error") are kept.
+        """
+        updates = []
+        usage_changes = []
+        with transaction.atomic():
+            current = (
+                Attachment.all_objects.select_for_update()
+                .filter(pk__in=changes)
+                .values_list(
+                    "pk", "file", "content_type_id", "object_id", "meta", "deleted_at"
+                )
+            )
+            for pk, name, content_type_id, object_id, meta, deleted_at in current:
+                inspected_name, inspected_meta, inspected_hash = changes[pk]
+                if name != inspected_name:
+                    stats["skipped"] += 1
+                    self.report(f"Skipped attachment {pk}, its file was replaced")
+                    continue
+
+                updates.append(
+                    Attachment(
+                        pk=pk,
+                        meta={**meta, **inspected_meta},
+                        content_hash=inspected_hash,
+                    )
+                )
+                size_delta = inspected_meta["size"] - meta.get("size", 0)
+                if size_delta and deleted_at is None:
+                    usage_changes.append((content_type_id, object_id, 0, size_delta))
+
+            Attachment.all_objects.bulk_update(updates, ["meta", "content_hash"])
+            AttachmentUsage.objects.record(usage_changes)
+        representation_cache.invalidate_many([attachment.pk for attachment in updates])
+
+    @staticmethod
+    def throughput(count, started, size=None):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        throughput = f"{count / elapsed:.1f} attachments/s"
+        if size is not None:
+            throughput += f", {size / elapsed / 1024**2:.1f} MiB/s"
+        return throughput
+
+    def write_summary(self, stats, verified, verified_bytes, started, dry_run):
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Verified {stats['verified']} attachments, {verified} in {elapsed:.1f}s "
+                f"({self.throughput(verified, started, verified_bytes)})."
+            )
+        )
+
+        drift = ", ".join(
+            f"{key.split(':', 1)[1]}: {count}"
+            for key, count in sorted(stats.items())
+            if key.startswith("drift:")
+        )
+        action = "Found" if dry_run else "Updated"
+        self.stdout.write(
+            f"{action} {stats['mismatched']} attachments with drifted meta data"
+            + (f" ({drift})" if drift else "")
+            + f", {stats['hashes_backfilled']} missing and {stats['hash_mismatches']} mismatched content hashes."
+        )
+        if stats["skipped"]:
+            self.stdout.write(
+                f"Skipped {stats['skipped']} attachments whose files were replaced during the verification."
+            )
+        if stats["missing"]:
+            self.stderr.write(
+                f"{stats['missing']} attachments have no stored file (see the collect_attachment_orphans command)."
+            )
+
+    def report(self, message):
+        if self.verbosity >= 2:
+            self.stdout.write(message)
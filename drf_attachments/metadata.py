@@ -0,0 +1,127 @@
+import io
+import re
+
+from drf_attachments.config import config
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    Image = None
+
+__all__ = [
+    "extract_meta",
+    "get_extracted_meta_keys",
+    "read_head",
+    "read_tail",
+    "register_meta_extractor",
+]
+
+# mime type (or "<type>/*") -> extractors
+_meta_extractors = {}
+# keys of the meta data of all extractors
+_extracted_meta_keys = set()
+
+
+def register_meta_extractor(*mime_types, keys=()):
+    """
+    Register a function extracting additional meta data (e.g. image dimensions) from files of the given mime types
+    (e.g. "application/pdf" or "image/*"). It receives the file and returns a dict (with the given keys) that is
+    merged into the Attachment's meta. Extractors must only read a bounded part of the file (see read_head() and
+    read_tail()).
+    """
+
+    def decorator(extractor):
+        for mime_type in mime_types:
+            _meta_extractors.setdefault(mime_type, []).append(extractor)
+        _extracted_meta_keys.update(keys)
+        return extractor
+
+    return decorator
+
+
+def get_extracted_meta_keys():
+    """Keys of the meta data of all registered extractors (removed from the meta if the file is replaced)"""
+    return frozenset(_extracted_meta_keys)
+
+
+def extract_meta(file, mime_type):
+    """Run the extractors registered for the given mime type, return the merged meta data"""
+    main_type = mime_type.split("/", 1)[0]
+    extractors = [
+        *_meta_extractors.get(mime_type, []),
+        *_meta_extractors.get(f"{main_type}/*", []),
+    ]
+
+    meta = {}
+    for extractor in extractors:
+        try:
+            meta.update(extractor(file) or {})
+        except (OSError, ValueError, SyntaxError):
+            # malformed or truncated headers, the meta data is optional
+            continue
+    return meta
+
+
+def read_head(file, limit=None):
+    """Read up to settings.ATTACHMENT_META_READ_LIMIT bytes from the start of the file (keeping its position)"""
+    initial_pos = file.tell()
+    file.seek(0)
+    data = file.read(limit or config.meta_read_limit())
+    file.seek(initial_pos)
+    return data
+
+
+def read_tail(file, limit=None):
+    """Read up to settings.ATTACHMENT_META_READ_LIMIT bytes from the end of the file (keeping its position)"""
+    limit = limit or config.meta_read_limit()
+    initial_pos = file.tell()
+    file.seek(max(file.size - limit, 0))
+    data = file.read(limit)
+    file.seek(initial_pos)
+    return data
+
+
+if Image is not None:
+
+    @register_meta_extractor("image/*", keys=("width", "height", "orientation"))
+    def extract_image_meta(file):
+        """Dimensions and EXIF orientation of an image (Pillow only parses the header when opening an image)"""
+        with Image.open(io.BytesIO(read_head(file))) as image:
+            meta = {"width": image.width, "height": image.height}
+            orientation = image.getexif().get(0x0112)
+            if orientation:
+                meta["orientation"] = orientation
+        return meta
+
+
+PDF_LINEARIZED_PAGE_COUNT = re.compile(
+    rb"/Linearized\s(?:(?!>>).)*?/N\s+(\d+)", re.DOTALL
+)
+# innermost dictionaries of page tree nodes ("<< /Type /Pages /Kids [...] /Count 3 >>")
+PDF_PAGES_NODE = re.compile(
+    rb"<<((?:(?!<<|>>).)*/Type\s*/Pages\b(?:(?!<<|>>).)*)>>", re.DOTALL
+)
+PDF_COUNT = re.compile(rb"/Count\s+(\d+)")
+
+
+@register_meta_extractor("application/pdf", keys=("page_count",))
+def extract_pdf_meta(file):
+    """
+    Page count of a PDF, read from the linearization dictionary at the start of the file or from the page tree root
+    (the page tree node with the highest count) within the start or end of the file. Page trees within compressed
+    object streams are not found.
+    """
+    head = read_head(file)
+    match = PDF_LINEARIZED_PAGE_COUNT.search(head[:1024])
+    if match:
+        return {"page_count": int(match.group(1))}
+
+    counts = [
+        int(count)
+        for data in (head, read_tail(file))
+        for node in PDF_PAGES_NODE.findall(data)
+        for count in PDF_COUNT.findall(node)
+    ]
+    if counts:
+        return {"page_count": max(counts)}
+    return {}
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("drf_attachments", "0003_alter_attachment_file"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttachmentUsage",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("object_id", models.CharField(blank=True, max_length=64)),
+                (
+                    "attachment_count",
+                    models.BigIntegerField(default=0, verbose_name="attachment count"),
+                ),
+                (
+                    "total_size",
+                    models.BigIntegerField(
+                        default=0,
+                        help_text="Total size of all attachments in bytes.",
+                        verbose_name="total size",
+                    ),
+                ),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "attachment usage",
+                "verbose_name_plural": "attachment usages",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("content_type", "object_id"),
+                        name="unique_attachment_usage_per_object",
+                    )
+                ],
+            },
+        ),
+    ]
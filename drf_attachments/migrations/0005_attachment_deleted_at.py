@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("drf_attachments", "0004_attachmentusage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachment",
+            name="deleted_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Soft-deleted attachments are purged after the retention period.",
+                null=True,
+                verbose_name="Deletion date",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("drf_attachments", "0005_attachment_deleted_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachment",
+            name="volume",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="Storage volume of the file (see settings.ATTACHMENT_STORAGE_VOLUMES), empty for the default storage.",
+                max_length=64,
+                verbose_name="storage volume",
+            ),
+        ),
+    ]
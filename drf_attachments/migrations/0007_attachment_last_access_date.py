@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("drf_attachments", "0006_attachment_volume"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachment",
+            name="last_access_date",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="Last download of the file (see settings.ATTACHMENT_ACCESS_TRACKING).",
+                null=True,
+                verbose_name="Last access date",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("drf_attachments", "0007_attachment_last_access_date"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachment",
+            name="download_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Number of downloads of the file (see settings.ATTACHMENT_ACCESS_TRACKING).",
+                verbose_name="Download count",
+            ),
+        ),
+    ]
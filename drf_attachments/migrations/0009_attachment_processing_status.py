@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("drf_attachments", "0008_attachment_download_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachment",
+            name="processing_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "pending"),
+                    ("ready", "ready"),
+                    ("failed", "failed"),
+                ],
+                db_index=True,
+                default="ready",
+                editable=False,
+                help_text="Status of the background processing of the file (see settings.ATTACHMENT_PROCESSING_STAGES).",
+                max_length=16,
+                verbose_name="Processing status",
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("drf_attachments", "0009_attachment_processing_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachment",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="SHA-256 hash of the file.",
+                max_length=64,
+                verbose_name="Content hash",
+            ),
+        ),
+        migrations.AddField(
+            model_name="attachment",
+            name="scan_status",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("pending", "pending"),
+                    ("clean", "clean"),
+                    ("infected", "infected"),
+                ],
+                default="",
+                editable=False,
+                help_text="Result of the malware scan (see settings.ATTACHMENT_SCANNER), empty if the file was not scanned.",
+                max_length=16,
+                verbose_name="Scan status",
+            ),
+        ),
+    ]
@@ -0,0 +1,140 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import (
+    BigIntegerField,
+    CharField,
+    Count,
+    Func,
+    Max,
+    OuterRef,
+    Subquery,
+    Sum,
+    TextField,
+    UUIDField,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce, Concat, Substr
+
+from drf_attachments.models.models import Attachment, AttachmentUsage
+from drf_attachments.models.querysets import get_size_expression
+
+__all__ = [
+    "annotate_attachment_stats",
+    "get_object_id_reference",
+]
+
+
+def get_object_id_reference(model, field_name="pk"):
+    """
+    Reference the outer query's primary key in a form comparable with the CharField `Attachment.object_id`
+    (non-character primary keys like integers or UUIDs are cast to a string)
+    """
+    reference = OuterRef(field_name)
+    if isinstance(model._meta.pk, (CharField, TextField)):
+        return reference
+    if isinstance(model._meta.pk, UUIDField):
+        return UUIDString(reference)
+    return Cast(reference, output_field=CharField(max_length=64))
+
+
+class UUIDString(Func):
+    """
+    Hyphenated string of a UUID (like str(uuid)) on all databases: UUIDs without a native database type are stored
+    (and cast) as 32 hex digits
+    """
+
+    output_field = CharField(max_length=36)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (expression,) = self.get_source_expressions()
+        text = Cast(expression, output_field=CharField(max_length=36))
+        if not connection.features.has_native_uuid_field:
+            text = Concat(
+                Substr(text, 1, 8),
+                Value("-"),
+                Substr(text, 9, 4),
+                Value("-"),
+                Substr(text, 13, 4),
+                Value("-"),
+                Substr(text, 17, 4),
+                Value("-"),
+                Substr(text, 21, 12),
+                output_field=self.output_field,
+            )
+        return compiler.compile(text)
+
+
+def annotate_attachment_stats(
+    queryset,
+    contexts=None,
+    count="attachment_count",
+    total_size="attachment_total_size",
+    latest_upload="attachment_latest_upload",
+    use_usage_counters=False,
+):
+    """
+    Annotate every object of the (parent) queryset with the number, total size (in bytes) and latest creation date
+    of its attachments using correlated subqueries, e.g.:
+
+        annotate_attachment_stats(PhotoAlbum.objects.all())[0].attachment_total_size
+
+    All three values are computed within the same query as the page of parent objects (instead of one aggregate
+    query per object). Pass None as annotation name to skip an annotation.
+
+    :param contexts: only consider attachments with one of the given contexts (a single context or an iterable)
+    :param use_usage_counters: read count and total size from the denormalized usage counters
+        (requires settings.ATTACHMENT_USAGE_TRACKING, can't be combined with contexts)
+    """
+    content_type = ContentType.objects.get_for_model(queryset.model)
+    object_id = get_object_id_reference(queryset.model)
+    attachments = Attachment.objects.filter(
+        content_type=content_type,
+        object_id=object_id,
+    )
+    if contexts is not None:
+        if isinstance(contexts, str):
+            contexts = [contexts]
+        attachments = attachments.filter(context__in=contexts)
+
+    # group by the parent (single group per subquery) and drop the default ordering
+    grouped = attachments.order_by().values("object_id")
+
+    annotations = {}
+    if use_usage_counters:
+        if contexts is not None:
+            raise ValueError("Usage counters are not available per context")
+
+        usage = AttachmentUsage.objects.filter(
+            content_type=content_type,
+            object_id=object_id,
+        )
+        for name, field_name in (
+            (count, "attachment_count"),
+            (total_size, "total_size"),
+        ):
+            if name:
+                annotations[name] = Coalesce(
+                    Subquery(usage.values(field_name)),
+                    Value(0),
+                    output_field=BigIntegerField(),
+                )
+        count = total_size = None
+
+    if count:
+        annotations[count] = Coalesce(
+            Subquery(grouped.annotate(value=Count("pk")).values("value")),
+            Value(0),
+        )
+    if total_size:
+        annotations[total_size] = Coalesce(
+            Subquery(
+                grouped.annotate(value=Sum(get_size_expression())).values("value")
+            ),
+            Value(0),
+            output_field=BigIntegerField(),
+        )
+    if latest_upload:
+        annotations[latest_upload] = Subquery(
+            grouped.annotate(value=Max("creation_date")).values("value")
+        )
+
+    return queryset.annotate(**annotations)
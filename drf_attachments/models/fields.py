@@ -1,23 +1,119 @@
-from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS
 from django.db.models import FileField
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete
+
+from drf_attachments.config import config
+from drf_attachments.storage import get_attachment_storage_for_content_type
 
 __all__ = [
     "AttachmentRelation",
+    "AttachmentsByContextDescriptor",
+    "DynamicStorageFieldFile",
     "DynamicStorageFileField",
 ]
 
 
+class AttachmentsByContextDescriptor:
+    """
+    Provides the attachments of an AttachmentRelation grouped by context as `<relation_name>_by_context`, e.g.
+    `photo_album.attachments_by_context["VACATION_PHOTO"]`.
+    The grouping is evaluated once per instance from `<relation_name>.all()`, so it does not cause any additional
+    queries if the attachments were prefetched (see `drf_attachments.models.prefetch.prefetch_attachments`).
+    """
+
+    def __init__(self, relation_name):
+        self.relation_name = relation_name
+        self.name = f"{relation_name}_by_context"
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+
+        attachments_by_context = {}
+        for attachment in getattr(instance, self.relation_name).all():
+            attachments_by_context.setdefault(attachment.context, []).append(attachment)
+
+        # cache the result on the instance (the non-data descriptor won't be called again)
+        instance.__dict__[self.name] = attachments_by_context
+        return attachments_by_context
+
+
 class AttachmentRelation(GenericRelation):
-    """Shortcut for a GenericRelation to attachments."""
+    """
+    Shortcut for a GenericRelation to attachments.
+    If settings.ATTACHMENT_SOFT_DELETE is enabled, the attachments of deleted objects are soft-deleted (instead of
+    being deleted via CASCADE within the same request).
+    """
 
     def __init__(self, *args, **kwargs):
         super().__init__("drf_attachments.attachment", *args, **kwargs)
 
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        descriptor = AttachmentsByContextDescriptor(name)
+        if not hasattr(cls, descriptor.name):
+            setattr(cls, descriptor.name, descriptor)
+
+        if not cls._meta.abstract:
+            post_delete.connect(
+                self.soft_delete_related_attachments,
+                sender=cls,
+                weak=False,
+                dispatch_uid=f"drf_attachments_soft_delete_{cls._meta.label}_{name}",
+            )
+
+    def bulk_related_objects(self, objs, using=DEFAULT_DB_ALIAS):
+        if config.soft_delete():
+            # no CASCADE, the attachments are soft-deleted after the objects were deleted
+            return self.remote_field.model._base_manager.db_manager(using).none()
+        return super().bulk_related_objects(objs, using)
+
+    def soft_delete_related_attachments(self, sender, instance, using, **kwargs):
+        if not config.soft_delete():
+            return
+
+        content_type = ContentType.objects.db_manager(using).get_for_model(
+            instance, for_concrete_model=self.for_concrete_model
+        )
+        self.remote_field.model.objects.db_manager(using).filter(
+            content_type=content_type,
+            object_id=instance.pk,
+        ).soft_delete()
+
+
+class DynamicStorageFieldFile(FieldFile):
+    """
+    File of an Attachment using the storage of its volume (see settings.ATTACHMENT_STORAGE_VOLUMES) or of its
+    content_object's model (see AttachmentMeta.storage_location)
+    """
+
+    def __init__(self, instance, field, name):
+        super().__init__(instance, field, name)
+        self.storage = field.get_storage(instance)
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.storage = self.field.get_storage(self.instance)
+
 
 class DynamicStorageFileField(FileField):
+    """
+    FileField choosing the storage per instance (instead of sharing a single storage for all instances), so concurrent
+    saves of attachments with different storage locations can't interfere with each other
+    """
+
+    attr_class = DynamicStorageFieldFile
+
+    def get_storage(self, model_instance):
+        return get_attachment_storage_for_content_type(
+            model_instance.content_type_id, getattr(model_instance, "volume", "")
+        )
+
     def pre_save(self, model_instance, add):
-        meta = getattr(model_instance.content_object, "AttachmentMeta", None)
-        storage_location = getattr(meta, "storage_location", settings.PRIVATE_ROOT)
-        self.storage.location = storage_location
+        file = getattr(model_instance, self.attname)
+        # the content_object may have been set after the file was accessed
+        file.storage = self.get_storage(model_instance)
         return super().pre_save(model_instance, add)
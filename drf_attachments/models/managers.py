@@ -1,11 +1,77 @@
-from django.db import models
+from collections import defaultdict
 
+from django.db import models, transaction
+from django.db.models import F
+
+from drf_attachments.config import config
 from drf_attachments.models.querysets import AttachmentQuerySet
 
 __all__ = [
+    "AllAttachmentsManager",
     "AttachmentManager",
+    "AttachmentUsageManager",
 ]
 
 
 class AttachmentManager(models.Manager.from_queryset(AttachmentQuerySet)):
+    """Manages all Attachments that are not soft-deleted"""
+
     use_for_related_fields = True
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class AllAttachmentsManager(models.Manager.from_queryset(AttachmentQuerySet)):
+    """Manages all Attachments including soft-deleted ones"""
+
+
+class AttachmentUsageManager(models.Manager):
+    # object_id of the rows holding the totals of a whole content type
+    CONTENT_TYPE_TOTAL = ""
+
+    def get_usage(self, content_type_id, object_id=CONTENT_TYPE_TOTAL):
+        """Return the (attachment_count, total_size) of a content object (or a whole content type)"""
+        usage = (
+            self.filter(content_type_id=content_type_id, object_id=object_id)
+            .values_list("attachment_count", "total_size")
+            .first()
+        )
+        return usage or (0, 0)
+
+    def record(self, changes):
+        """
+        Apply count and size deltas to the usage counters (if settings.ATTACHMENT_USAGE_TRACKING is enabled).
+        The counters are updated atomically with F() expressions, the totals of the content types are derived from
+        the given changes.
+
+        :param changes: iterable of (content_type_id, object_id, count_delta, size_delta)
+        """
+        if not config.usage_tracking():
+            return
+
+        deltas = defaultdict(lambda: [0, 0])
+        for content_type_id, object_id, count_delta, size_delta in changes:
+            for key in (
+                (content_type_id, str(object_id)),
+                (content_type_id, self.CONTENT_TYPE_TOTAL),
+            ):
+                deltas[key][0] += count_delta
+                deltas[key][1] += size_delta
+
+        with transaction.atomic():
+            for (content_type_id, object_id), (count_delta, size_delta) in sorted(
+                deltas.items()
+            ):
+                if count_delta or size_delta:
+                    self._apply(content_type_id, object_id, count_delta, size_delta)
+
+    def _apply(self, content_type_id, object_id, count_delta, size_delta):
+        counters = self.filter(content_type_id=content_type_id, object_id=object_id)
+        values = {
+            "attachment_count": F("attachment_count") + count_delta,
+            "total_size": F("total_size") + size_delta,
+        }
+        if not counters.update(**values):
+            self.get_or_create(content_type_id=content_type_id, object_id=object_id)
+            counters.update(**values)
@@ -1,28 +1,61 @@
 import uuid
+from functools import partial
 
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.db import router, transaction
 from django.db.models import (
     CASCADE,
+    BigAutoField,
+    BigIntegerField,
     CharField,
     DateTimeField,
     ForeignKey,
     JSONField,
     Model,
+    PositiveIntegerField,
+    UniqueConstraint,
     UUIDField,
 )
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import ValidationError
 
+from drf_attachments.compression import compress_file, get_codec, get_compression_rule
 from drf_attachments.config import config
+from drf_attachments.metadata import extract_meta, get_extracted_meta_keys
 from drf_attachments.models.fields import DynamicStorageFileField
-from drf_attachments.models.managers import AttachmentManager
-from drf_attachments.storage import AttachmentFileStorage, attachment_upload_path
-from drf_attachments.utils import get_extension, get_mime_type, remove_file
+from drf_attachments.models.managers import (
+    AllAttachmentsManager,
+    AttachmentManager,
+    AttachmentUsageManager,
+)
+from drf_attachments.processing import (
+    FAILED,
+    PENDING,
+    READY,
+    get_required_processing_stages,
+    processing_executor,
+)
+from drf_attachments.scanning import CLEAN, INFECTED
+from drf_attachments.scanning import PENDING as SCAN_PENDING
+from drf_attachments.scanning import get_scanner
+from drf_attachments.storage import (
+    AttachmentFileStorage,
+    attachment_upload_path,
+    choose_storage_volume,
+)
+from drf_attachments.utils import (
+    delete_files,
+    get_content_hash,
+    get_extension,
+    get_mime_type,
+)
 
 __all__ = [
     "Attachment",
+    "AttachmentUsage",
 ]
 
 
@@ -32,6 +65,7 @@ class Attachment(Model):
     """
 
     objects = AttachmentManager()
+    all_objects = AllAttachmentsManager()
 
     id = UUIDField(
         _("Attachment ID"),
@@ -69,6 +103,18 @@ class Attachment(Model):
         storage=AttachmentFileStorage(),
     )
 
+    volume = CharField(
+        _("storage volume"),
+        help_text=_(
+            "Storage volume of the file (see settings.ATTACHMENT_STORAGE_VOLUMES), empty for the default storage."
+        ),
+        max_length=64,
+        blank=True,
+        default="",
+        db_index=True,
+        editable=False,
+    )
+
     # Generic Relation (to add one of multiple different models/content types to an attachment)
     content_type = ForeignKey(ContentType, on_delete=CASCADE)
     # allow any PrimaryKey (Integer, Char, UUID) as related object_id
@@ -94,6 +140,76 @@ class Attachment(Model):
         auto_now=True,
     )
 
+    download_count = PositiveIntegerField(
+        verbose_name=_("Download count"),
+        help_text=_(
+            "Number of downloads of the file (see settings.ATTACHMENT_ACCESS_TRACKING)."
+        ),
+        default=0,
+        editable=False,
+    )
+
+    last_access_date = DateTimeField(
+        verbose_name=_("Last access date"),
+        help_text=_(
+            "Last download of the file (see settings.ATTACHMENT_ACCESS_TRACKING)."
+        ),
+        blank=True,
+        null=True,
+        editable=False,
+    )
+
+    processing_status = CharField(
+        verbose_name=_("Processing status"),
+        help_text=_(
+            "Status of the background processing of the file (see settings.ATTACHMENT_PROCESSING_STAGES)."
+        ),
+        max_length=16,
+        choices=(
+            (PENDING, _("pending")),
+            (READY, _("ready")),
+            (FAILED, _("failed")),
+        ),
+        default=READY,
+        db_index=True,
+        editable=False,
+    )
+
+    scan_status = CharField(
+        verbose_name=_("Scan status"),
+        help_text=_(
+            "Result of the malware scan (see settings.ATTACHMENT_SCANNER), empty if the file was not scanned."
+        ),
+        max_length=16,
+        choices=(
+            (SCAN_PENDING, _("pending")),
+            (CLEAN, _("clean")),
+            (INFECTED, _("infected")),
+        ),
+        blank=True,
+        default="",
+        editable=False,
+    )
+
+    content_hash = CharField(
+        verbose_name=_("Content hash"),
+        help_text=_("SHA-256 hash of the file."),
+        max_length=64,
+        blank=True,
+        default="",
+        db_index=True,
+        editable=False,
+    )
+
+    deleted_at = DateTimeField(
+        verbose_name=_("Deletion date"),
+        help_text=_("Soft-deleted attachments are purged after the retention period."),
+        blank=True,
+        null=True,
+        db_index=True,
+        editable=False,
+    )
+
     class Meta:
         verbose_name = _("attachment")
         verbose_name_plural = _("attachments")
@@ -118,6 +234,10 @@ class Attachment(Model):
     def context_label(self):
         return config.translate_context(self.context)
 
+    @property
+    def is_deleted(self):
+        return self.deleted_at is not None
+
     def is_modified(self):
         return self.creation_date != self.last_modification_date
 
@@ -130,28 +250,102 @@ class Attachment(Model):
     def get_mime_type(self):
         return self.meta.get("mime_type", "unkown")
 
+    def get_stored_size(self):
+        """Size of the stored file (smaller than get_size() if it is compressed, see settings.ATTACHMENT_COMPRESSION)"""
+        return self.meta.get("stored_size", self.get_size())
+
     def save(self, *args, **kwargs):
         # set computed values for direct and API access
         self.set_and_validate()
+        processing = self.set_processing_status()
 
         super().save(*args, **kwargs)
+        self._inspected_file = None
+
+        self.record_usage()
+        if processing:
+            self.submit_processing(using=kwargs.get("using"))
+
+    def set_processing_status(self):
+        """
+        Reset the processing and scan state of a new file. Return whether it needs to be processed in the background.
+        """
+        if not self.file or self.file._committed:
+            return False
+
+        self.scan_status = SCAN_PENDING if get_scanner() else ""
+        processing = bool(get_required_processing_stages(self))
+        self.processing_status = PENDING if processing else READY
+        return processing
+
+    def submit_processing(self, using=None):
+        """Process the new file in the background after the current transaction was committed"""
+        using = using or router.db_for_write(Attachment, instance=self)
+        transaction.on_commit(partial(processing_executor.submit, self.pk), using=using)
+
+    def delete(self, using=None, keep_parents=False, hard=False):
+        """
+        Soft-delete the Attachment if settings.ATTACHMENT_SOFT_DELETE is enabled (the file is removed when the
+        Attachment is purged), delete it permanently otherwise or if hard=True.
+        """
+        if hard or not config.soft_delete():
+            return super().delete(using=using, keep_parents=keep_parents)
+
+        using = using or router.db_for_write(self.__class__, instance=self)
+        deleted_at = timezone.now()
+        result = (
+            Attachment.all_objects.using(using)
+            .filter(pk=self.pk)
+            .soft_delete(deleted_at=deleted_at)
+        )
+        self.deleted_at = deleted_at
+        return result
 
     def set_and_validate(self):
         # set computed values for direct and API access
+        self.set_previous_instance()  # load the currently stored state of an existing Attachment
+        if not (self._state.adding and self.is_inspected()):
+            self.inspect()  # extract the file meta data and validate context and file
+        self.validate_total_size()  # validate the content_object's storage quota
+        self.manage_uniqueness()  # remove any other Attachments for content_objects with
+        self.cleanup_file()  # remove the old file of a changed Attachment
+        self.compress_file()  # compress a new file of a compressible mime type
+        self.set_volume()  # choose the storage volume of a new file
+
+    def inspect(self):
+        """
+        Extract the meta data of the file and validate it (without database queries, so it can run concurrently for
+        the Attachments of multi-file uploads, see drf_attachments.uploads). New Attachments whose current file was
+        inspected already are not inspected again on save.
+        """
         self.set_attachment_meta()  # read the AttachmentMeta settings from the content_object's model
         self.set_file_meta()  # extract and store mime_type, extension and size from the current file
 
         self.validate_context()  # validate that the context is allowed
         self.set_default_context()  # set the default context if yet empty (and if default is defined)
         self.validate_file()  # validate the file and its mime_type, extension and size
-        self.manage_uniqueness()  # remove any other Attachments for content_objects with
-        self.cleanup_file()  # remove the old file of a changed Attachment
+        self._inspected_file = self.file.file if self.file else None
+
+    def is_inspected(self):
+        """Whether the current file was inspected already (and not replaced since)"""
+        inspected_file = getattr(self, "_inspected_file", None)
+        return (
+            inspected_file is not None
+            and bool(self.file)
+            and inspected_file is self.file.file
+        )
 
     def set_default_context(self):
         """Set context to settings.ATTACHMENT_DEFAULT_CONTEXT (if defined) if it's still empty"""
         if not self.context and hasattr(settings, "ATTACHMENT_DEFAULT_CONTEXT"):
             self.context = self.default_context
 
+    def set_previous_instance(self):
+        """Load the stored version of an existing (possibly soft-deleted) Attachment (None for new Attachments)"""
+        self.previous_instance = None
+        if not self._state.adding:
+            self.previous_instance = Attachment.all_objects.filter(pk=self.pk).first()
+
     def set_attachment_meta(self):
         meta = getattr(self.content_object, "AttachmentMeta", None)
         self.valid_mime_types = getattr(meta, "valid_mime_types", None)
@@ -161,17 +355,41 @@ class Attachment(Model):
             int(getattr(meta, "max_size", settings.ATTACHMENT_MAX_UPLOAD_SIZE)),
             int(settings.ATTACHMENT_MAX_UPLOAD_SIZE),
         )
+        self.max_total_size = getattr(meta, "max_total_size", None)
         self.unique_upload = getattr(meta, "unique_upload", False)
         self.unique_upload_per_context = getattr(
             meta, "unique_upload_per_context", False
         )
+        self.deduplicate = getattr(meta, "deduplicate", False)
 
     def set_file_meta(self):
+        """
+        Extract and store mime_type, extension and size as well as the meta data of the extractors registered for the
+        file's mime_type (see drf_attachments.metadata.register_meta_extractor).
+        Skipped if the file has not changed.
+        """
         if self.meta is None:
             self.meta = {}
+
+        previous = self.previous_instance
+        if (
+            self.file._committed
+            and "mime_type" in self.meta
+            and (previous is None or previous.file.name == self.file.name)
+        ):
+            # unchanged or referenced file of another Attachment (see use_file_of())
+            return
+
+        # remove the extracted meta data of a replaced file
+        for key in get_extracted_meta_keys():
+            self.meta.pop(key, None)
+
         self.meta["mime_type"] = get_mime_type(self.file)
         self.meta["extension"] = get_extension(self.file)
         self.meta["size"] = self.file.size
+        self.meta.update(extract_meta(self.file, self.meta["mime_type"]))
+        # only needed to find the file for deduplicated uploads, scanned files are hashed by the scan stage
+        self.content_hash = get_content_hash(self.file) if self.deduplicate else ""
 
     def validate_context(self):
         """
@@ -248,13 +466,14 @@ class Attachment(Model):
         Validate the size against the AttachmentMeta.min_size and AttachmentMeta.max_size defined in the
         content_object's model class.
         The maximum allowed file size is always restricted by settings.ATTACHMENT_MAX_UPLOAD_SIZE.
+        The original size is validated, also for files compressed at rest (see settings.ATTACHMENT_COMPRESSION).
         Validate the extension and raise a ValidationError on failure.
         """
-        if self.min_size and self.file.size < self.min_size:
+        if self.min_size and self.get_size() < self.min_size:
             error_msg = _(
                 "File size {size} too small! It must be at least {min_size}"
             ).format(
-                size=self.file.size,
+                size=self.get_size(),
                 min_size=self.min_size,
             )
             raise ValidationError(
@@ -265,11 +484,11 @@ class Attachment(Model):
             )
 
         # self.max_size is always given (settings.ATTACHMENT_MAX_UPLOAD_SIZE by default and as maximum)
-        if self.file.size > self.max_size:
+        if self.get_size() > self.max_size:
             error_msg = _(
                 "File size {size} too large! It can only be {max_size}"
             ).format(
-                size=self.file.size,
+                size=self.get_size(),
                 max_size=self.max_size,
             )
             raise ValidationError(
@@ -279,54 +498,247 @@ class Attachment(Model):
                 code="invalid",
             )
 
-    def manage_uniqueness(self):
+    def validate_total_size(self):
         """
-        If the content_object defines "unique_upload=True", only keep a single Attachment for it
-        ("unique_upload_per_context" config will be ignored). Remove any previous/other attachments and delete their
-        files from the storage.
-        If the content_object defines "unique_upload_per_context=True", only keep a single Attachment per context
-        ("unique_upload" must be set to "False" for this to work). Remove any previous/other attachments with the same
-        context and delete their files from the storage.
+        Validate the total size of all Attachments of the content_object (including this one) against the
+        AttachmentMeta.max_total_size defined in the content_object's model class.
+        With settings.ATTACHMENT_USAGE_TRACKING enabled the current total is read from the usage counters (O(1)),
+        otherwise it is aggregated over the content_object's Attachments.
+        Raise a ValidationError on failure.
         """
-        to_delete = None
+        if not self.max_total_size or self.is_deleted:
+            return
+
+        size = self.meta["size"]
+        if self.unique_upload:
+            # all other attachments are going to be replaced
+            total_size = size
+        else:
+            total_size = self.get_content_object_total_size() + size
+
+            previous = self.previous_instance
+            if (
+                previous
+                and not previous.is_deleted
+                and previous.content_type_id == self.content_type_id
+                and previous.object_id == str(self.object_id)
+            ):
+                total_size -= previous.get_size()
+
+            if self.unique_upload_per_context:
+                # attachments with the same context are going to be replaced
+                total_size -= self.get_replaced_attachments().aggregate_size()
+
+        if total_size > int(self.max_total_size):
+            error_msg = _(
+                "Total size {total_size} of all attachments too large! It can only be {max_total_size}"
+            ).format(
+                total_size=total_size,
+                max_total_size=self.max_total_size,
+            )
+            raise ValidationError(
+                {
+                    "file": error_msg,
+                },
+                code="invalid",
+            )
+
+    def get_content_object_total_size(self):
+        if config.usage_tracking():
+            return AttachmentUsage.objects.get_usage(
+                self.content_type_id, str(self.object_id)
+            )[1]
+
+        return Attachment.objects.filter(
+            content_type_id=self.content_type_id,
+            object_id=self.object_id,
+        ).aggregate_size()
+
+    def get_replaced_attachments(self):
+        """Return the other Attachments that are removed by manage_uniqueness()"""
+        to_delete = Attachment.objects.none()
 
         if self.unique_upload:
-            # delete any previous/other existing Attachments of the content_object (keep only the current one)
             to_delete = Attachment.objects.filter(
                 object_id=self.content_object.pk,
                 content_type=ContentType.objects.get_for_model(self.content_object).pk,
             )
-            if self.pk:
-                to_delete = to_delete.exclude(pk=self.pk)
         elif self.unique_upload_per_context:
-            # delete any previous/other existing Attachments of the content_object (keep only the current one)
             to_delete = Attachment.objects.filter(
                 object_id=self.content_object.pk,
                 content_type=ContentType.objects.get_for_model(self.content_object).pk,
                 context=self.context,
             )
-            if self.pk:
-                to_delete = to_delete.exclude(pk=self.pk)
 
-        if to_delete:
-            for attachment in to_delete:
-                remove_file(attachment.file.path)
+        return to_delete.exclude(pk=self.pk)
 
+    def manage_uniqueness(self):
+        """
+        If the content_object defines "unique_upload=True", only keep a single Attachment for it
+        ("unique_upload_per_context" config will be ignored). Remove any previous/other attachments and delete their
+        files from the storage.
+        If the content_object defines "unique_upload_per_context=True", only keep a single Attachment per context
+        ("unique_upload" must be set to "False" for this to work). Remove any previous/other attachments with the same
+        context and delete their files from the storage.
+        """
+        to_delete = None
+
+        if self.unique_upload or self.unique_upload_per_context:
+            # delete any previous/other existing Attachments of the content_object (keep only the current one)
+            to_delete = self.get_replaced_attachments()
+
+        if to_delete is not None:
+            # removes the files of the deleted Attachments as well
             to_delete.delete()
 
     def cleanup_file(self):
         """
         If an Attachment is updated and receives a new file, remove the previous file from the storage
         """
-        if self.pk:
-            try:
-                # on update delete the old file if a new one was inserted
-                # (delete_orphan only removes image on deletion of the whole attachment instance)
-                old_instance = Attachment.objects.get(pk=self.pk)
-
-                # on update delete the old file if a new one was inserted
-                if old_instance.file != self.file:
-                    remove_file(old_instance.file.path)
-            except Attachment.DoesNotExist:
-                # Do nothing if Attachment does not yet exist in DB
-                pass
+        # on update delete the old file if a new one was inserted
+        # (delete_orphan only removes image on deletion of the whole attachment instance)
+        old_instance = self.previous_instance
+
+        # Do nothing if Attachment does not yet exist in DB
+        if old_instance and old_instance.file != self.file:
+            # the file may be shared with deduplicated Attachments
+            if not Attachment.all_objects.exclude(pk=self.pk).get_referenced_files(
+                [(old_instance.file.name, old_instance.volume)]
+            ):
+                delete_files(old_instance.file.storage, [old_instance.file.name])
+
+    def use_file_of(self, other):
+        """
+        Reference the stored file of the other Attachment instead of uploading it again (see AttachmentMeta.deduplicate),
+        the file is removed when the last Attachment referencing it is deleted. Unless the other Attachment is processed
+        and scanned, this one has to be processed itself (see submit_processing()).
+        """
+        self.file = other.file.name
+        self.volume = other.volume
+        self.meta = {
+            key: value for key, value in other.meta.items() if key != "processing_error"
+        }
+        self.content_hash = other.content_hash
+        self.scan_status = other.scan_status
+        if other.processing_status == READY and other.scan_status != SCAN_PENDING:
+            self.processing_status = READY
+        else:
+            self.processing_status = PENDING
+
+    def clone_to(self, content_object, context=None):
+        """Clone the Attachment onto another content_object without copying its file (see AttachmentQuerySet.clone_to)"""
+        return Attachment.all_objects.filter(pk=self.pk).clone_to(
+            content_object, context=context
+        )[0]
+
+    def reassign_to(self, content_object):
+        """Move the Attachment to another content_object (see AttachmentQuerySet.reassign_to)"""
+        Attachment.all_objects.filter(pk=self.pk).reassign_to(content_object)
+        self.refresh_from_db()
+
+    def compress_file(self):
+        """
+        Compress a new file of a compressible mime type (see settings.ATTACHMENT_COMPRESSION) before it is stored. The
+        meta keeps its original size as "size" and records the codec as "compression" and the stored size as
+        "stored_size".
+        """
+        if not self.file or self.file._committed:
+            return
+
+        self.meta.pop("compression", None)
+        self.meta.pop("stored_size", None)
+        rule = get_compression_rule(self.get_mime_type())
+        if rule is None or self.meta["size"] < rule["min_size"]:
+            return
+
+        codec = get_codec(rule["codec"])
+        compressed = compress_file(
+            self.file, codec, level=rule["level"], min_savings=rule["min_savings"]
+        )
+        if compressed is None:
+            # (almost) incompressible content is stored as is
+            return
+
+        self.file = compressed
+        self.meta["compression"] = codec.name
+        self.meta["stored_size"] = compressed.size
+
+    def set_volume(self):
+        """
+        Place a new file on one of the settings.ATTACHMENT_STORAGE_VOLUMES (if defined), randomly weighted by their
+        free space and configured weight. Raise a ValidationError if no volume has enough free space left.
+        """
+        if not self.file or self.file._committed or not config.storage_volumes():
+            return
+
+        volume = choose_storage_volume(self.get_stored_size())
+        if volume is None:
+            error_msg = _(
+                "Insufficient storage! No storage volume has {size} bytes of free space left"
+            ).format(size=self.get_stored_size())
+            raise ValidationError(
+                {
+                    "file": error_msg,
+                },
+                code="invalid",
+            )
+        self.volume = volume
+
+    def record_usage(self):
+        """
+        Update the usage counters of the content_object (and of a previous one if the Attachment was moved).
+        Soft-deleted Attachments are not counted, so saving one changes nothing.
+        """
+        changes = []
+        if not self.is_deleted:
+            changes.append((self.content_type_id, self.object_id, 1, self.get_size()))
+
+        previous = self.previous_instance
+        if previous and not previous.is_deleted:
+            changes.append(
+                (previous.content_type_id, previous.object_id, -1, -previous.get_size())
+            )
+
+        AttachmentUsage.objects.record(changes)
+
+
+class AttachmentUsage(Model):
+    """
+    Denormalized number and total size of the Attachments per content_object (and per content_type, with an empty
+    object_id), maintained if settings.ATTACHMENT_USAGE_TRACKING is enabled.
+    Use the management command "reconcile_attachment_usage" to recompute the counters from the Attachments.
+    """
+
+    objects = AttachmentUsageManager()
+
+    id = BigAutoField(primary_key=True)
+
+    content_type = ForeignKey(ContentType, on_delete=CASCADE)
+    object_id = CharField(
+        max_length=64,
+        blank=True,
+    )
+
+    attachment_count = BigIntegerField(
+        _("attachment count"),
+        default=0,
+    )
+
+    total_size = BigIntegerField(
+        _("total size"),
+        help_text=_("Total size of all attachments in bytes."),
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = _("attachment usage")
+        verbose_name_plural = _("attachment usages")
+        constraints = [
+            UniqueConstraint(
+                fields=["content_type", "object_id"],
+                name="unique_attachment_usage_per_object",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.content_type} | {self.object_id} | {self.attachment_count} | {self.total_size}"
@@ -0,0 +1,60 @@
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+
+from drf_attachments.models.models import Attachment
+
+__all__ = [
+    "prefetch_attachments",
+]
+
+ROW_NUMBER_ANNOTATION = "_attachment_row_number"
+
+
+def prefetch_attachments(
+    lookup="attachments", contexts=None, ordering=None, limit=None, queryset=None
+):
+    """
+    Build a `Prefetch` for an `AttachmentRelation`, so the (nested) attachments of a whole page of parent objects are
+    loaded with a single query, e.g.:
+
+        PhotoAlbum.objects.prefetch_related(
+            prefetch_attachments("attachments", contexts=["VACATION_PHOTO"], limit=3)
+        )
+
+    The prefetched attachments are served by `parent.attachments.all()` (e.g. within a nested
+    `AttachmentSubSerializer(many=True)`) and grouped by context via `parent.attachments_by_context`.
+
+    :param lookup: name of the AttachmentRelation on the parent model
+    :param contexts: only prefetch attachments with one of the given contexts (a single context or an iterable)
+    :param ordering: order of the attachments per parent (the model's default ordering, or newest first if a limit
+        is given)
+    :param limit: only prefetch the first N attachments (according to the ordering) per parent, evaluated within the
+        database via a ROW_NUMBER() window partitioned by the parent
+    :param queryset: base queryset of the attachments (default: Attachment.objects.all())
+    """
+    if queryset is None:
+        queryset = Attachment.objects.all()
+
+    if contexts is not None:
+        if isinstance(contexts, str):
+            contexts = [contexts]
+        queryset = queryset.filter(context__in=contexts)
+
+    if ordering is None and limit is not None:
+        ordering = ("-creation_date",)
+
+    if ordering is not None:
+        queryset = queryset.order_by(*ordering)
+
+    if limit is not None:
+        queryset = queryset.annotate(
+            **{
+                ROW_NUMBER_ANNOTATION: Window(
+                    expression=RowNumber(),
+                    partition_by=[F("content_type_id"), F("object_id")],
+                    order_by=ordering,
+                )
+            }
+        ).filter(**{f"{ROW_NUMBER_ANNOTATION}__lte": limit})
+
+    return Prefetch(lookup, queryset=queryset)
@@ -1,38 +1,749 @@
-from django.conf import settings
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import (
+    BigIntegerField,
+    Case,
+    CharField,
+    Count,
+    F,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce
 from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
 
 from drf_attachments.config import config
-from drf_attachments.utils import remove_file
+from drf_attachments.processing import PENDING, READY
+from drf_attachments.rest.cache import representation_cache
+from drf_attachments.scanning import CLEAN, get_scanner
+from drf_attachments.storage import (
+    get_attachment_storage_for_content_type,
+    get_volume_storage,
+    link_file,
+)
+from drf_attachments.uploads import inspect_attachments, run_concurrently
+from drf_attachments.utils import delete_files
 
 __all__ = [
     "AttachmentQuerySet",
+    "get_size_expression",
+    "get_stored_size_expression",
+    "is_bulk_delete_in_progress",
 ]
 
+# set while AttachmentQuerySet.delete() removes a batch (files and usage counters are handled per batch)
+_bulk_delete_in_progress = ContextVar("drf_attachments_bulk_delete", default=False)
+
+
+# rows of deleted Attachments whose files are removed once the current operation succeeded (see
+# AttachmentQuerySet._remove_files_afterwards)
+_deferred_file_removals = ContextVar("drf_attachments_deferred_files", default=None)
+
+
+def is_bulk_delete_in_progress():
+    return _bulk_delete_in_progress.get()
+
+
+def get_size_expression():
+    """Expression of the file size stored in the Attachment's meta (for aggregations)"""
+    return Cast(KT("meta__size"), output_field=BigIntegerField())
+
+
+def get_stored_size_expression():
+    """Expression of the size of the stored (possibly compressed) file, see settings.ATTACHMENT_COMPRESSION"""
+    return Coalesce(
+        Cast(KT("meta__stored_size"), output_field=BigIntegerField()),
+        get_size_expression(),
+    )
+
 
 class AttachmentQuerySet(QuerySet):
     def viewable(self, *args, **kwargs):
         callable_ = config.get_filter_callable_for_viewable_content_objects()
-        return self.__filter_by_callable(callable_)
+        return self.__filter_by_callable(callable_).not_deleted()
 
     def editable(self, *args, **kwargs):
         callable_ = config.get_filter_callable_for_editable_content_objects()
-        return self.__filter_by_callable(callable_)
+        return self.__filter_by_callable(callable_).not_deleted()
 
     def deletable(self, *args, **kwargs):
         callable_ = config.get_filter_callable_for_deletable_content_objects()
-        return self.__filter_by_callable(callable_)
+        return self.__filter_by_callable(callable_).not_deleted()
+
+    def not_deleted(self):
+        return self.filter(deleted_at__isnull=True)
+
+    def deleted(self):
+        return self.filter(deleted_at__isnull=False)
+
+    def aggregate_size(self):
+        """Return the total size (in bytes) of all files"""
+        total_size = self.aggregate(total_size=Sum(get_size_expression()))["total_size"]
+        return total_size or 0
 
     def delete(self):
-        """Bulk remove files after related Attachments were deleted"""
-        files = list(self.values_list("file", flat=True))
-        result = super().delete()
+        """
+        Soft-delete the Attachments if settings.ATTACHMENT_SOFT_DELETE is enabled, delete them permanently otherwise
+        """
+        if config.soft_delete():
+            return self.soft_delete()
+        return self.hard_delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def soft_delete(self, deleted_at=None):
+        """
+        Mark the Attachments as deleted (their rows and files are removed later on by the "purge_attachments"
+        management command). Return the number of soft-deleted Attachments in the same format as delete().
+        """
+        queryset = self.not_deleted()
+        with transaction.atomic(using=self.db):
+            usage = list(queryset._get_usage_per_object())
+            count = queryset.update(deleted_at=deleted_at or timezone.now())
+            self._record_usage(
+                (content_type_id, object_id, -object_count, -(size or 0))
+                for content_type_id, object_id, object_count, size in usage
+            )
+
+        self._result_cache = None
+        return count, {self.model._meta.label: count}
+
+    soft_delete.alters_data = True
+    soft_delete.queryset_only = True
+
+    def restore(self):
+        """Undo the soft-deletion of the Attachments. Return the number of restored Attachments."""
+        queryset = self.deleted()
+        with transaction.atomic(using=self.db):
+            usage = list(queryset._get_usage_per_object())
+            count = queryset.update(deleted_at=None)
+            self._record_usage(usage)
+
+        self._result_cache = None
+        return count
+
+    restore.alters_data = True
+    restore.queryset_only = True
+
+    def hard_delete(self):
+        """
+        Delete the Attachments in batches of settings.ATTACHMENT_DELETE_BATCH_SIZE (keyset paginated by pk, so memory
+        stays bounded for any number of Attachments). After each batch, its files are removed exactly once via the
+        storage of their content_object and the usage counters are updated with one query per content_object.
+        """
+        self._not_support_combined_queries("delete")
+        if self.query.is_sliced:
+            raise TypeError("Cannot use 'limit' or 'offset' with delete().")
+        if self._fields is not None:
+            raise TypeError("Cannot call delete() after .values() or .values_list()")
+
+        batch_size = config.delete_batch_size()
+        queryset = self.order_by("pk")
+        base_queryset = self.model._base_manager.using(self.db)
+
+        deleted = 0
+        deleted_per_model = Counter()
+        last_pk = None
+
+        while True:
+            batch_queryset = (
+                queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            )
+            rows = list(
+                batch_queryset.values_list(
+                    "pk",
+                    "file",
+                    "content_type_id",
+                    "object_id",
+                    get_size_expression(),
+                    "deleted_at",
+                    "volume",
+                )[:batch_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            token = _bulk_delete_in_progress.set(True)
+            try:
+                count, count_per_model = base_queryset.filter(
+                    pk__in=[row[0] for row in rows]
+                ).delete()
+            finally:
+                _bulk_delete_in_progress.reset(token)
+
+            deleted += count
+            deleted_per_model.update(count_per_model)
+
+            self._remove_files(rows)
+            # the usage of soft-deleted Attachments was already removed from the counters
+            self._record_usage(
+                (content_type_id, object_id, -1, -(size or 0))
+                for pk, name, content_type_id, object_id, size, deleted_at, volume in rows
+                if deleted_at is None
+            )
+
+        self._result_cache = None
+        return deleted, dict(deleted_per_model)
+
+    hard_delete.alters_data = True
+    hard_delete.queryset_only = True
+
+    def get_referenced_files(self, files):
+        """
+        Return the set of the given (name, volume) files that are still referenced by Attachments of the queryset
+        (files are shared by deduplicated Attachments, see AttachmentMeta.deduplicate)
+        """
+        files = {(name, volume) for name, volume in files if name}
+        if not files:
+            return set()
+        referenced = self.filter(file__in={name for name, volume in files})
+        return files & set(referenced.values_list("file", "volume"))
+
+    @contextmanager
+    def _remove_files_afterwards(self):
+        """
+        Defer the removal of the files of Attachments deleted within the block until it succeeded and the current
+        transaction (e.g. of ATOMIC_REQUESTS or an outer atomic block) was committed, so the rows of a rolled back
+        transaction never point to removed files
+        """
+        deferred = []
+        token = _deferred_file_removals.set(deferred)
+        try:
+            yield
+        finally:
+            _deferred_file_removals.reset(token)
+
+        for rows in deferred:
+            transaction.on_commit(partial(self._remove_files, rows), using=self.db)
+
+    def _remove_files(self, rows):
+        """
+        Remove the files of deleted Attachments (grouped by the storage of their volume or content_type), except files
+        still referenced by other Attachments
+        """
+        deferred = _deferred_file_removals.get()
+        if deferred is not None:
+            deferred.append(rows)
+            return
+
+        referenced = self.model.all_objects.using(self.db).get_referenced_files(
+            (row[1], row[6]) for row in rows
+        )
+        names_per_storage = defaultdict(list)
+        for pk, name, content_type_id, object_id, size, deleted_at, volume in rows:
+            if name and (name, volume) not in referenced:
+                storage_key = (None, volume) if volume else (content_type_id, volume)
+                names_per_storage[storage_key].append(name)
+
+        for (content_type_id, volume), names in names_per_storage.items():
+            delete_files(
+                get_attachment_storage_for_content_type(content_type_id, volume), names
+            )
+
+    def find_stored_file(self, content_hash, size, content_type_id):
+        """
+        Return an Attachment of the queryset whose stored file has the given SHA-256 hash and size and is usable by
+        Attachments of the given content_type (same storage, processed and not quarantined), None if there is none
+        """
+        scan_statuses = [CLEAN] if get_scanner() else ["", CLEAN]
+        candidates = (
+            self.alias(size=get_size_expression())
+            .filter(
+                content_hash=content_hash,
+                size=size,
+                processing_status=READY,
+                scan_status__in=scan_statuses,
+            )
+            .exclude(file="")
+        )
+        storage = get_attachment_storage_for_content_type(content_type_id)
+        for candidate in candidates[:10]:
+            # files on volumes are stored independently of their content_type
+            if candidate.volume or candidate.file.storage is storage:
+                return candidate
+        return None
+
+    def create_by_reference(
+        self, content_object, content_hash, size, *, candidates, **kwargs
+    ):
+        """
+        Create an Attachment of the content_object referencing an already stored file with the given SHA-256 hash and
+        size instead of uploading it again, if the content_object's AttachmentMeta.deduplicate allows it. Return None
+        if the file has to be uploaded. The Attachment is validated like any upload.
+        Only files of the candidates (e.g. the Attachments the requester can view) are referenced, otherwise anyone
+        knowing the hash and size of a file could gain access to it.
+        """
+        attachment = self.model(content_object=content_object, **kwargs)
+        attachment.set_attachment_meta()
+        if not attachment.deduplicate:
+            return None
+
+        stored = candidates.find_stored_file(
+            content_hash.lower(), size, attachment.content_type_id
+        )
+        if stored is None:
+            return None
+
+        attachment.use_file_of(stored)
+        attachment.save(using=self.db)
+        return attachment
+
+    create_by_reference.alters_data = True
+
+    def clone_to(self, content_object, context=None):
+        """
+        Clone the Attachments onto the given content_object without copying their files: the clones reference the
+        same stored files (which are removed with their last reference). Files of another storage (e.g. a different
+        AttachmentMeta.storage_location) are hard linked where possible and copied otherwise.
+        The content_object's AttachmentMeta validation and uniqueness rules are applied to the clones as a set (raising
+        a ValidationError), the Attachments they replace are deleted. Return the clones.
+        """
+        sources = list(self.order_by("creation_date", "pk"))
+        if not sources:
+            return []
+
+        clones = []
+        for source in sources:
+            clone = self.model(
+                content_object=content_object,
+                name=source.name,
+                context=context or source.context,
+            )
+            clone.use_file_of(source)
+            clones.append(clone)
+
+        storage = get_attachment_storage_for_content_type(clones[0].content_type_id)
+        linked = []
+        try:
+            for clone, source in zip(clones, sources):
+                # files on volumes are stored independently of their content_type
+                if not source.volume and source.file.storage is not storage:
+                    clone.file = link_file(
+                        source.file.storage, source.file.name, storage
+                    )
+                    linked.append(clone.file.name)
+            self._validate_assignment(clones)
+
+            with self._remove_files_afterwards(), transaction.atomic(using=self.db):
+                self.model.objects.using(self.db).filter(
+                    self._get_replaced_filter(clones)
+                ).delete()
+                clones = self.model.objects.using(self.db).bulk_create(clones)
+                self._record_usage(
+                    (clone.content_type_id, clone.object_id, 1, clone.get_size())
+                    for clone in clones
+                )
+                # clones of files still being processed (or scanned) are processed themselves
+                for clone in clones:
+                    if clone.processing_status == PENDING:
+                        clone.submit_processing(using=self.db)
+        except Exception:
+            delete_files(storage, linked)
+            raise
+
+        return clones
+
+    clone_to.alters_data = True
+    clone_to.queryset_only = True
+
+    def reassign_to(self, content_object):
+        """
+        Move the Attachments to the given content_object with a single UPDATE (files of another storage, e.g. a
+        different AttachmentMeta.storage_location, are hard linked where possible and copied otherwise).
+        The content_object's AttachmentMeta validation and uniqueness rules are applied to the Attachments as a set
+        (raising a ValidationError), the other Attachments they replace are deleted. Return the number of moved
+        Attachments.
+        """
+        content_type = ContentType.objects.db_manager(self.db).get_for_model(
+            content_object
+        )
+        attachments = list(
+            self.exclude(content_type=content_type, object_id=content_object.pk)
+        )
+        if not attachments:
+            return 0
+
+        previous = [
+            (attachment.content_type_id, attachment.object_id, attachment.file)
+            for attachment in attachments
+        ]
+        for attachment in attachments:
+            attachment.content_object = content_object
+        self._validate_assignment(attachments)
+
+        storage = get_attachment_storage_for_content_type(content_type.pk)
+        relocated = {}
+        obsolete_files = []
+        try:
+            for attachment, (content_type_id, object_id, file) in zip(
+                attachments, previous
+            ):
+                if not attachment.volume and file.storage is not storage:
+                    relocated[attachment.pk] = link_file(
+                        file.storage, file.name, storage
+                    )
+                    obsolete_files.append(file)
+
+            values = {"content_type": content_type, "object_id": content_object.pk}
+            if relocated:
+                values["file"] = Case(
+                    *(When(pk=pk, then=Value(name)) for pk, name in relocated.items()),
+                    default=F("file"),
+                    output_field=CharField(),
+                )
+
+            pks = [attachment.pk for attachment in attachments]
+            with self._remove_files_afterwards(), transaction.atomic(using=self.db):
+                self.model.objects.using(self.db).filter(
+                    self._get_replaced_filter(attachments)
+                ).exclude(pk__in=pks).delete()
+                count = (
+                    self.model._base_manager.using(self.db)
+                    .filter(pk__in=pks)
+                    .update(**values)
+                )
+                self._record_usage(
+                    change
+                    for attachment, (content_type_id, object_id, file) in zip(
+                        attachments, previous
+                    )
+                    if not attachment.is_deleted
+                    for change in (
+                        (content_type_id, object_id, -1, -attachment.get_size()),
+                        (content_type.pk, content_object.pk, 1, attachment.get_size()),
+                    )
+                )
+        except Exception:
+            delete_files(storage, list(relocated.values()))
+            raise
+
+        # the moved Attachments reference their files within the new storage (possibly under the same name)
+        referenced = (
+            self.model.all_objects.using(self.db)
+            .exclude(pk__in=pks)
+            .get_referenced_files((file.name, "") for file in obsolete_files)
+        )
+        for file in obsolete_files:
+            if (file.name, "") not in referenced:
+                delete_files(file.storage, [file.name])
+        representation_cache.invalidate_many(pks)
+        return count
+
+    reassign_to.alters_data = True
+    reassign_to.queryset_only = True
+
+    def _validate_assignment(self, attachments):
+        """
+        Validate Attachments (with their files and meta data) assigned to a single content_object as a set against
+        its AttachmentMeta (context, file, uniqueness and total size). Raise a ValidationError on failure.
+        """
+        for attachment in attachments:
+            attachment.previous_instance = None
+            attachment.inspect()
+
+        first = attachments[0]
+        if first.unique_upload:
+            keys = [None for attachment in attachments]
+        elif first.unique_upload_per_context:
+            keys = [attachment.context for attachment in attachments]
+        else:
+            keys = []
+
+        if len(set(keys)) < len(keys):
+            error_msg = (
+                _("Only a single attachment is allowed per context!")
+                if not first.unique_upload
+                else _("Only a single attachment is allowed!")
+            )
+            raise ValidationError({"file": error_msg}, code="invalid")
+
+        error = self._validate_upload_group(attachments)
+        if error is not None:
+            raise error
+
+    def bulk_upload(self, attachments):
+        """
+        Create the given new Attachments (with content_object and file assigned) with a single bulk_create() in one
+        transaction. The files are inspected, validated and stored concurrently (see drf_attachments.uploads), the
+        uniqueness rules and storage quotas are applied once per content_object. Of several uploads replacing each
+        other (unique_upload or unique_upload_per_context) only the last one is kept.
+        Invalid Attachments are skipped. Return the list of created Attachments and a dict of the ValidationErrors of
+        the skipped ones by their index.
+        """
+        attachments = list(attachments)
+        errors = inspect_attachments(attachments)
+
+        # uploads replacing each other within the batch, the last one wins (like consecutive saves)
+        kept = {}
+        for index, attachment in enumerate(attachments):
+            if index in errors:
+                continue
+            key = (attachment.content_type_id, str(attachment.object_id))
+            if attachment.unique_upload_per_context and not attachment.unique_upload:
+                key += (attachment.context,)
+            elif not attachment.unique_upload:
+                key += (index,)
+            if key in kept:
+                errors[kept[key]] = ValidationError(
+                    {"file": _("Replaced by a later file of the same batch")},
+                    code="invalid",
+                )
+            kept[key] = index
+
+        groups = defaultdict(list)
+        for index in sorted(kept.values()):
+            attachment = attachments[index]
+            groups[(attachment.content_type_id, str(attachment.object_id))].append(
+                index
+            )
+
+        for indexes in groups.values():
+            error = self._validate_upload_group(
+                [attachments[index] for index in indexes]
+            )
+            if error is not None:
+                errors.update((index, error) for index in indexes)
+
+        valid = []
+        for index, attachment in enumerate(attachments):
+            if index in errors:
+                continue
+            try:
+                attachment.set_volume()
+            except ValidationError as e:
+                errors[index] = e
+                continue
+            valid.append(attachment)
+
+        replaced = Q(pk__in=[])
+        for indexes in groups.values():
+            group = [attachments[index] for index in indexes if index not in errors]
+            if group:
+                replaced |= self._get_replaced_filter(group)
+
+        def store(attachment):
+            attachment.compress_file()
+            # the storage of the file was chosen before its volume was set
+            attachment.file.storage = attachment._meta.get_field("file").get_storage(
+                attachment
+            )
+            attachment.file.save(attachment.file.name, attachment.file.file, save=False)
+
+        processing = [attachment.set_processing_status() for attachment in valid]
+        results = run_concurrently(store, valid)
+        failed = [result for result in results if isinstance(result, Exception)]
+        try:
+            if failed:
+                raise failed[0]
+
+            with self._remove_files_afterwards(), transaction.atomic(using=self.db):
+                # removes the files of the replaced Attachments as well (once committed)
+                self.model.objects.using(self.db).filter(replaced).delete()
+                created = self.model.objects.using(self.db).bulk_create(valid)
+                self._record_usage(
+                    (
+                        attachment.content_type_id,
+                        attachment.object_id,
+                        1,
+                        attachment.get_size(),
+                    )
+                    for attachment in created
+                )
+                for attachment, needs_processing in zip(created, processing):
+                    if needs_processing:
+                        attachment.submit_processing(using=self.db)
+        except Exception:
+            # remove the stored files, no Attachment refers to them
+            for attachment, result in zip(valid, results):
+                if not isinstance(result, Exception):
+                    delete_files(attachment.file.storage, [attachment.file.name])
+            raise
+
+        return created, errors
+
+    bulk_upload.alters_data = True
+
+    @staticmethod
+    def _get_replaced_filter(attachments):
+        """Filter of the existing Attachments replaced by the given uploads of a single content_object"""
+        first = attachments[0]
+        content_object = Q(
+            content_type_id=first.content_type_id, object_id=first.object_id
+        )
+        if first.unique_upload:
+            return content_object
+        if first.unique_upload_per_context:
+            return content_object & Q(
+                context__in={attachment.context for attachment in attachments}
+            )
+        return Q(pk__in=[])
+
+    def _validate_upload_group(self, attachments):
+        """
+        Validate the total size of the given uploads of a single content_object against its
+        AttachmentMeta.max_total_size. Return the ValidationError on failure (None otherwise).
+        """
+        first = attachments[0]
+        if not first.max_total_size:
+            return None
+
+        total_size = sum(attachment.get_size() for attachment in attachments)
+        if not first.unique_upload:
+            # attachments with the same context are going to be replaced by unique_upload_per_context
+            total_size += first.get_content_object_total_size()
+            total_size -= (
+                self.model.objects.using(self.db)
+                .filter(self._get_replaced_filter(attachments))
+                .aggregate_size()
+            )
+
+        if total_size > int(first.max_total_size):
+            error_msg = _(
+                "Total size {total_size} of all attachments too large! It can only be {max_total_size}"
+            ).format(
+                total_size=total_size,
+                max_total_size=first.max_total_size,
+            )
+            return ValidationError({"file": error_msg}, code="invalid")
+        return None
+
+    def move_to_volumes(self, choose_volume, workers=4, batch_size=None, limit=None):
+        """
+        Move the files of the Attachments to the volumes (see settings.ATTACHMENT_STORAGE_VOLUMES) returned by
+        `choose_volume(size, volume)` (None to skip an Attachment) in batches (keyset paginated by pk).
+        The files of a batch are copied by a pool of `workers` threads, then the Attachments are updated (unless they
+        were changed in the meantime) and the obsolete files are removed once per storage.
+        Return the number of moved files and a list of (pk, error) of the files that could not be moved.
+        """
+        batch_size = batch_size or config.delete_batch_size()
+        queryset = self.order_by("pk")
+
+        moved = 0
+        failed = []
+        last_pk = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while limit is None or moved + len(failed) < limit:
+                batch_queryset = (
+                    queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+                )
+                count = batch_size
+                if limit is not None:
+                    count = min(count, limit - moved - len(failed))
+                rows = list(
+                    batch_queryset.values_list(
+                        "pk",
+                        "file",
+                        "content_type_id",
+                        "volume",
+                        get_stored_size_expression(),
+                    )[:count]
+                )
+                if not rows:
+                    break
+                last_pk = rows[-1][0]
+
+                placements = []
+                for pk, name, content_type_id, volume, size in rows:
+                    target = choose_volume(size or 0, volume)
+                    if target is None:
+                        failed.append((pk, "No volume with enough free space left"))
+                    else:
+                        placements.append((pk, name, content_type_id, volume, target))
+
+                batch_moved, batch_failed = self._move_files(executor, placements)
+                moved += batch_moved
+                failed.extend(batch_failed)
+
+        return moved, failed
+
+    move_to_volumes.alters_data = True
+    move_to_volumes.queryset_only = True
+
+    def _move_files(self, executor, placements):
+        moved_pks = []
+        failed = []
+        obsolete_files = defaultdict(list)
+        results = executor.map(self._copy_file, placements)
+        for (pk, name, content_type_id, volume, target), (new_name, error) in zip(
+            placements, results
+        ):
+            if error:
+                failed.append((pk, error))
+                continue
+
+            # the Attachment may have been changed or deleted in the meantime
+            updated = (
+                self.model._base_manager.using(self.db)
+                .filter(pk=pk, volume=volume, file=name)
+                .update(volume=target, file=new_name)
+            )
+            if updated:
+                moved_pks.append(pk)
+                obsolete_files[(content_type_id, volume)].append(name)
+            else:
+                failed.append((pk, "Attachment was changed while its file was moved"))
+                obsolete_files[(None, target)].append(new_name)
+
+        # files shared with deduplicated Attachments are kept for them
+        referenced = self.model.all_objects.using(self.db).get_referenced_files(
+            (name, volume)
+            for (content_type_id, volume), names in obsolete_files.items()
+            for name in names
+        )
+        for (content_type_id, volume), names in obsolete_files.items():
+            names = [name for name in names if (name, volume) not in referenced]
+            if names:
+                delete_files(
+                    get_attachment_storage_for_content_type(content_type_id, volume),
+                    names,
+                )
+        representation_cache.invalidate_many(moved_pks)
+
+        return len(moved_pks), failed
+
+    @staticmethod
+    def _copy_file(placement):
+        """Copy the file to the target volume, return its new name and an error message (if it failed)"""
+        pk, name, content_type_id, volume, target = placement
+        source_storage = get_attachment_storage_for_content_type(
+            content_type_id, volume
+        )
+        try:
+            with source_storage.open(name, "rb") as file:
+                return get_volume_storage(target).save(name, file), None
+        except OSError as e:
+            return None, str(e)
+
+    def _get_usage_per_object(self):
+        """Yield (content_type_id, object_id, count, size) of the Attachments per content_object"""
+        return (
+            self.order_by()
+            .values_list("content_type_id", "object_id")
+            .annotate(count=Count("pk"), size=Sum(get_size_expression()))
+        )
 
-        # remove all files that belonged to the deleted attachments
-        for file in files:
-            path = f"{settings.MEDIA_ROOT}/{file}"
-            remove_file(path)
+    @staticmethod
+    def _record_usage(changes):
+        from drf_attachments.models.models import AttachmentUsage
 
-        return result
+        AttachmentUsage.objects.record(
+            (content_type_id, object_id, count, size or 0)
+            for content_type_id, object_id, count, size in changes
+        )
 
     def __filter_by_callable(self, callable_) -> QuerySet:
         if callable_:
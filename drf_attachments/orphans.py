@@ -0,0 +1,218 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Q
+
+from drf_attachments.config import config
+from drf_attachments.storage import (
+    get_attachment_storage,
+    get_attachment_storage_for_content_type,
+    get_storage_location,
+    get_volume_storage,
+)
+
+__all__ = [
+    "find_missing_files",
+    "find_orphaned_files",
+    "get_storage_scopes",
+    "walk_storage",
+]
+
+# directory of the attachment files within each storage (see drf_attachments.storage.attachment_upload_path)
+UPLOAD_DIRECTORY = "attachments"
+# maximum number of stems of image variants (in another format than their original) looked up with one query
+VARIANT_STEM_BATCH_SIZE = 100
+
+
+def get_storage_scopes():
+    """
+    Return (storage, filter) pairs of all attachment storages and the Q filter of the Attachments stored within each:
+    the storage of every volume (settings.ATTACHMENT_STORAGE_VOLUMES), the default storage and the ones of
+    AttachmentMeta.storage_location. Storages sharing a location are merged.
+    """
+    scopes = {}
+
+    def add(storage, scope):
+        key = (type(storage), getattr(storage, "location", id(storage)))
+        if key in scopes:
+            scopes[key] = (scopes[key][0], scopes[key][1] | scope)
+        else:
+            scopes[key] = (storage, scope)
+
+    for volume in config.storage_volumes():
+        add(get_volume_storage(volume), Q(volume=volume))
+
+    # models with a custom storage location, all others use the default storage
+    custom_locations = defaultdict(list)
+    for model in apps.get_models():
+        meta = getattr(model, "AttachmentMeta", None)
+        if getattr(meta, "storage_location", None):
+            custom_locations[get_storage_location(model)].append(model)
+
+    custom_content_type_ids = []
+    for models in custom_locations.values():
+        content_type_ids = [
+            content_type.pk
+            for content_type in ContentType.objects.get_for_models(*models).values()
+        ]
+        custom_content_type_ids += content_type_ids
+        add(
+            get_attachment_storage_for_content_type(content_type_ids[0]),
+            Q(volume="", content_type_id__in=content_type_ids),
+        )
+    add(
+        get_attachment_storage(),
+        Q(volume="") & ~Q(content_type_id__in=custom_content_type_ids),
+    )
+    return list(scopes.values())
+
+
+def walk_storage(storage, older_than=None):
+    """
+    Yield the names of the attachment files of a file system storage as a stream (os.scandir(), so no directory is
+    listed at once). Files modified after the given timestamp (e.g. uploads in progress) are skipped.
+    """
+    root = os.path.join(storage.location, UPLOAD_DIRECTORY)
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    if older_than is not None:
+                        try:
+                            if entry.stat().st_mtime > older_than:
+                                continue
+                        except FileNotFoundError:
+                            # removed in the meantime
+                            continue
+                    name = os.path.relpath(entry.path, storage.location)
+                    yield name.replace(os.sep, "/")
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _get_variant_original(name):
+    """
+    (stem, name) of the original file if the name is the one of an image variant, None otherwise. The name of the
+    original is only known for variants in its format (None for variants converted to another "format").
+    """
+    stem, extension = os.path.splitext(name)
+    stem, variant = os.path.splitext(stem)
+    options = config.image_variants().get(variant[1:])
+    if options is None:
+        return None
+    return stem, None if options.get("format") else f"{stem}{extension}"
+
+
+def find_orphaned_files(storage, scope, older_than=None, batch_size=None):
+    """
+    Yield batches of the files of the storage (see walk_storage()) that no Attachment of the scope refers to, checked
+    with one query per batch of settings.ATTACHMENT_DELETE_BATCH_SIZE names. Image variants are orphaned if their
+    original file is, the originals of variants in another format are looked up by prefix in batches of
+    VARIANT_STEM_BATCH_SIZE stems (unless the original is part of the same batch of names).
+    Raise a TypeError for storages without local files (e.g. object storages).
+    """
+    from drf_attachments.models import Attachment
+
+    if not isinstance(storage, FileSystemStorage):
+        raise TypeError(f"{type(storage).__name__} is not a file system storage")
+
+    attachments = Attachment.all_objects.filter(scope)
+    batch_size = batch_size or config.delete_batch_size()
+    for names in _batches(walk_storage(storage, older_than=older_than), batch_size):
+        variants = {
+            name: original
+            for name in names
+            if (original := _get_variant_original(name))
+        }
+        originals = [name for name in names if name not in variants]
+        originals += [name for _stem, name in variants.values() if name]
+
+        referenced = set(
+            attachments.filter(file__in=originals).values_list("file", flat=True)
+        )
+        referenced_stems = {os.path.splitext(name)[0] for name in referenced}
+        # the extension of the originals of converted variants is unknown, they are looked up by their stem
+        stems = {
+            stem
+            for stem, name in variants.values()
+            if not name and stem not in referenced_stems
+        }
+        for batch in _batches(sorted(stems), VARIANT_STEM_BATCH_SIZE):
+            query = Q()
+            for stem in batch:
+                query |= Q(file__startswith=f"{stem}.")
+            referenced_stems.update(
+                os.path.splitext(name)[0]
+                for name in attachments.filter(query).values_list("file", flat=True)
+            )
+        referenced.update(
+            name
+            for name, (stem, _original) in variants.items()
+            if stem in referenced_stems
+        )
+
+        orphans = [name for name in names if name not in referenced]
+        if orphans:
+            yield orphans
+
+
+def find_missing_files(queryset, older_than=None, workers=4, batch_size=None):
+    """
+    Yield batches of the pks of the Attachments of the queryset whose files are missing from their storage (keyset
+    paginated by pk). The files of each batch are looked up by a pool of threads. Attachments created after the
+    given timestamp are skipped.
+    """
+    batch_size = batch_size or config.delete_batch_size()
+    queryset = queryset.order_by("pk")
+    if older_than is not None:
+        queryset = queryset.filter(
+            creation_date__lte=datetime.fromtimestamp(older_than, tz=timezone.utc)
+        )
+
+    def exists(file):
+        storage, name = file
+        return bool(name) and storage.exists(name)
+
+    last_pk = None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch_queryset = (
+                queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            )
+            rows = list(
+                batch_queryset.values_list("pk", "file", "content_type_id", "volume")[
+                    :batch_size
+                ]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            files = [
+                (get_attachment_storage_for_content_type(content_type_id, volume), name)
+                for pk, name, content_type_id, volume in rows
+            ]
+            missing = [
+                row[0] for row, found in zip(rows, pool.map(exists, files)) if not found
+            ]
+            if missing:
+                yield missing
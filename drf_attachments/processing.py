@@ -0,0 +1,131 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from drf_attachments.config import config
+from drf_attachments.rest.cache import representation_cache
+
+__all__ = [
+    "FAILED",
+    "PENDING",
+    "READY",
+    "ProcessingExecutor",
+    "ProcessingStage",
+    "get_required_processing_stages",
+    "process_attachment",
+    "processing_executor",
+]
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+
+class ProcessingStage:
+    """
+    Heavy processing step of new files (e.g. thumbnailing or scanning), executed in the background after the
+    Attachment was committed (see settings.ATTACHMENT_PROCESSING_STAGES).
+    Cheap checks (mime type, extension, size, uniqueness) are still validated synchronously on save.
+    """
+
+    name = None
+
+    def is_required(self, attachment):
+        """Whether the stage has to process the given Attachment (evaluated on save and again before processing)"""
+        return True
+
+    def process(self, attachment):
+        """Process the Attachment, raise an exception to mark its processing as failed"""
+        raise NotImplementedError()
+
+
+def get_processing_stages():
+    return [import_string(path)() for path in config.processing_stages()]
+
+
+def get_required_processing_stages(attachment):
+    return [stage for stage in get_processing_stages() if stage.is_required(attachment)]
+
+
+def process_attachment(pk):
+    """
+    Run the required processing stages of the Attachment (in the order of settings.ATTACHMENT_PROCESSING_STAGES)
+    and set its processing_status to "ready", or to "failed" (with the error in meta["processing_error"]) as soon as
+    a stage fails. Return the new processing_status (None if the Attachment does not exist anymore).
+    """
+    from drf_attachments.models import Attachment
+
+    attachment = Attachment.all_objects.filter(pk=pk).first()
+    if attachment is None:
+        return None
+
+    status = READY
+    meta = attachment.meta
+    meta.pop("processing_error", None)
+    for stage in get_required_processing_stages(attachment):
+        try:
+            stage.process(attachment)
+        except Exception as e:
+            status = FAILED
+            meta["processing_error"] = f"{stage.name or type(stage).__name__}: {e}"
+            break
+
+    # skipped if the file was replaced in the meantime (it is processed again)
+    Attachment.all_objects.filter(pk=pk, file=attachment.file.name).update(
+        processing_status=status, meta=meta
+    )
+    representation_cache.invalidate(pk)
+    return status
+
+
+class ProcessingExecutor:
+    """
+    Runs process_attachment() in a local pool of settings.ATTACHMENT_PROCESSING_WORKERS threads (no message broker
+    required), or synchronously if settings.ATTACHMENT_PROCESSING_EXECUTOR is "sync".
+    Jobs of a terminated process are lost, their Attachments stay "pending" (see the "process_attachments"
+    management command).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._futures = set()
+
+    def submit(self, pk):
+        if config.processing_executor() == "sync":
+            process_attachment(pk)
+            return
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=config.processing_workers(),
+                    thread_name_prefix="drf_attachments_processing",
+                )
+            future = self._pool.submit(self._run, pk)
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+
+    def wait(self, timeout=None):
+        """Wait for all submitted jobs to finish"""
+        with self._lock:
+            futures = set(self._futures)
+        wait(futures, timeout=timeout)
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    @staticmethod
+    def _run(pk):
+        # the worker threads use their own database connections (like requests)
+        close_old_connections()
+        try:
+            return process_attachment(pk)
+        finally:
+            close_old_connections()
+
+
+processing_executor = ProcessingExecutor()
@@ -0,0 +1,111 @@
+import threading
+
+from django.core.cache import caches
+
+from drf_attachments.config import config
+
+__all__ = [
+    "MISSING_ENTRY",
+    "RepresentationCache",
+    "representation_cache",
+]
+
+# prefetched via RepresentationCache.get_entries(), but not cached (no further lookup needed)
+MISSING_ENTRY = object()
+
+
+class RepresentationCache:
+    """
+    Optional cache (using the Django cache framework) for serialized attachments.
+    Each attachment has one cache entry (keyed by its pk) holding the representations of all serializer variants
+    (serializer class, language, host) along with the attachment's last_modification_date they were created for.
+    Entries of modified attachments are therefore never served, even if the invalidation on save/delete was missed.
+    """
+
+    key_prefix = "drf_attachments:representation"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        alias = config.representation_cache_alias()
+        return caches[alias] if alias else None
+
+    def is_enabled(self):
+        return self.cache is not None
+
+    def get_key(self, pk):
+        return f"{self.key_prefix}:{pk}"
+
+    @staticmethod
+    def get_version(instance):
+        return instance.last_modification_date.isoformat()
+
+    def get_entries(self, instances):
+        """Fetch the cache entries of multiple attachments with a single cache lookup"""
+        keys = {self.get_key(instance.pk): instance.pk for instance in instances}
+        entries = self.cache.get_many(keys.keys())
+        return {keys[key]: entry for key, entry in entries.items()}
+
+    def get(self, instance, variant, entry=None):
+        """
+        Return the cached representation of the given attachment and serializer variant (or None).
+        An entry prefetched via get_entries() (MISSING_ENTRY if there was none) may be passed to avoid another cache
+        lookup.
+        """
+        if entry is None:
+            entry = self.cache.get(self.get_key(instance.pk))
+        elif entry is MISSING_ENTRY:
+            entry = None
+
+        data = None
+        if entry and entry["version"] == self.get_version(instance):
+            data = entry["representations"].get(variant)
+
+        self._count(hit=data is not None)
+        return data
+
+    def set(self, instance, variant, data, entry=None):
+        version = self.get_version(instance)
+        if not entry or entry is MISSING_ENTRY or entry["version"] != version:
+            entry = {"version": version, "representations": {}}
+
+        entry["representations"][variant] = data
+        self.cache.set(
+            self.get_key(instance.pk),
+            entry,
+            timeout=config.representation_cache_timeout(),
+        )
+
+    def invalidate(self, pk):
+        if self.is_enabled():
+            self.cache.delete(self.get_key(pk))
+
+    def invalidate_many(self, pks):
+        if self.is_enabled():
+            self.cache.delete_many([self.get_key(pk) for pk in pks])
+
+    def stats(self):
+        """Hit and miss counters of the current process"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+representation_cache = RepresentationCache()
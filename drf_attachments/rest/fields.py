@@ -1,21 +1,93 @@
-from django.urls import reverse
+from django.utils.http import urlencode
 from rest_framework import serializers
 
+from drf_attachments.config import config
+from drf_attachments.signing import get_download_expiry, get_download_signature
+from drf_attachments.utils import format_url_pk, get_url_template
+
 __all__ = [
     "DownloadURLField",
+    "MetaField",
 ]
 
 
 class DownloadURLField(serializers.Field):
-    def __init__(self, *args, **kwargs):
+    view_name = "attachment-download"
+    signed_view_name = "attachment-signed-download"
+
+    def __init__(self, *args, signed=None, variant=None, **kwargs):
+        """
+        :param signed: emit expiring, signed URLs to the token-validated download route instead of the regular
+            download route (defaults to settings.ATTACHMENT_SIGNED_DOWNLOAD_URLS)
+        :param variant: emit URLs of the given image variant (see settings.ATTACHMENT_IMAGE_VARIANTS)
+        """
         super().__init__(read_only=True, *args, **kwargs)
+        self.signed = signed
+        self.variant = variant
+        self._url_template_cache = None
+
     def get_attribute(self, instance):
-        request = self.context.get('request')
-        relative_url = reverse("attachment-download", kwargs={"pk": instance.pk})
+        pk = format_url_pk(instance.pk)
+        prefix, suffix = self.get_url_template()
+        url = f"{prefix}{pk}{suffix}"
+
+        query = {}
+        if self.variant:
+            query["variant"] = self.variant
+        if self.is_signed():
+            expires = get_download_expiry()
+            query["expires"] = expires
+            query["signature"] = get_download_signature(instance.pk, expires)
+        if query:
+            url = f"{url}?{urlencode(query)}"
+
+        return url
+
+    def is_signed(self):
+        if self.signed is None:
+            return config.signed_download_urls()
+        return self.signed
+
+    def get_url_template(self):
+        """
+        Return the (prefix, suffix) of the download URL around the attachment's pk.
+        The relative template is shared by the whole process (per script prefix), the absolute one is built once per
+        request (host) instead of once per serialized attachment.
+        """
+        request = self.context.get("request")
+        view_name = self.signed_view_name if self.is_signed() else self.view_name
+        relative_template = get_url_template(view_name)
 
         if request is None:
-            return relative_url
-        return request.build_absolute_uri(relative_url)
+            return relative_template
+
+        cache = self._url_template_cache
+        if (
+            cache is None
+            or cache[0] is not request
+            or cache[1] is not relative_template
+        ):
+            prefix, suffix = relative_template
+            absolute_template = (request.build_absolute_uri(prefix), suffix)
+            self._url_template_cache = cache = (
+                request,
+                relative_template,
+                absolute_template,
+            )
+
+        return cache[2]
 
     def to_representation(self, value):
         return value
+
+
+class MetaField(serializers.ReadOnlyField):
+    """Value of the given key of the Attachment's meta (e.g. "width" or "page_count"), None if it is not available"""
+
+    def __init__(self, key, **kwargs):
+        kwargs.setdefault("source", "meta")
+        super().__init__(**kwargs)
+        self.key = key
+
+    def to_representation(self, value):
+        return (value or {}).get(self.key)
@@ -1,18 +1,121 @@
+from django.db import models
+from django.urls import get_script_prefix
+from django.utils.translation import get_language
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from rest_framework.fields import ChoiceField, FileField, ReadOnlyField
 
 from drf_attachments.config import config
 from drf_attachments.models.models import Attachment
-from drf_attachments.rest.fields import DownloadURLField
-
+from drf_attachments.rest.cache import MISSING_ENTRY, representation_cache
+from drf_attachments.rest.fields import DownloadURLField, MetaField
+from drf_attachments.uploads import inspect_attachments
 
 __all__ = [
+    "AttachmentListSerializer",
+    "AttachmentPreflightSerializer",
     "AttachmentSerializer",
     "AttachmentSubSerializer",
+    "AttachmentWithMetaDataSerializer",
+    "CachedRepresentationListSerializer",
+    "CachedRepresentationMixin",
 ]
 
 
-class AttachmentSerializer(serializers.ModelSerializer):
+class CachedRepresentationListSerializer(serializers.ListSerializer):
+    """Fetches the cached representations of all listed attachments with a single cache lookup"""
+
+    def to_representation(self, data):
+        if not representation_cache.is_enabled():
+            return super().to_representation(data)
+
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        instances = list(iterable)
+        self.child.prefetched_cache_entries = representation_cache.get_entries(
+            instances
+        )
+        try:
+            return super().to_representation(instances)
+        finally:
+            self.child.prefetched_cache_entries = None
+
+
+class AttachmentListSerializer(CachedRepresentationListSerializer):
+    """Inspects the files of all new attachments concurrently before saving them (see drf_attachments.uploads)"""
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        attachments = [model(**attrs) for attrs in validated_data]
+
+        errors = inspect_attachments(attachments)
+        if errors:
+            raise ValidationError(
+                [
+                    errors[index].detail if index in errors else {}
+                    for index in range(len(attachments))
+                ]
+            )
+
+        for attachment in attachments:
+            attachment.save()
+        return attachments
+
+
+class CachedRepresentationMixin:
+    """
+    Serve representations from the representation cache (see settings.ATTACHMENT_REPRESENTATION_CACHE).
+    Fields listed in `uncached_fields` (e.g. signed download URLs that expire) are computed on every call.
+    """
+
+    uncached_fields = ("download_url",)
+    prefetched_cache_entries = None
+
+    def to_representation(self, instance):
+        if not representation_cache.is_enabled():
+            return super().to_representation(instance)
+
+        variant = self.get_cache_variant()
+        entries = self.prefetched_cache_entries
+        entry = entries.get(instance.pk, MISSING_ENTRY) if entries is not None else None
+        cached = representation_cache.get(instance, variant, entry=entry)
+
+        if cached is None:
+            data = super().to_representation(instance)
+            representation_cache.set(
+                instance,
+                variant,
+                {
+                    key: value
+                    for key, value in data.items()
+                    if key not in self.uncached_fields
+                },
+                entry=entry,
+            )
+            return data
+
+        data = {}
+        for field in self._readable_fields:
+            if field.field_name in self.uncached_fields:
+                data[field.field_name] = field.to_representation(
+                    field.get_attribute(instance)
+                )
+            else:
+                data[field.field_name] = cached[field.field_name]
+        return data
+
+    def get_cache_variant(self):
+        """
+        Identify everything besides the attachment itself the representation depends on
+        (absolute URLs contain the request's host, context labels are translated)
+        """
+        request = self.context.get("request")
+        host = request.build_absolute_uri("/") if request is not None else ""
+        return (
+            f"{type(self).__qualname__}|{get_language()}|{host}|{get_script_prefix()}"
+        )
+
+
+class AttachmentSerializer(CachedRepresentationMixin, serializers.ModelSerializer):
     """
     Attachment serializer with a `GenericRelatedField` mapping all possible models (content_types) with attachments
     to their own respective serializers.
@@ -22,9 +125,12 @@ class AttachmentSerializer(serializers.ModelSerializer):
     content_object = config.get_content_object_field()
     context = ChoiceField(choices=config.context_choices(values_list=False))
     download_url = DownloadURLField()
+    processing_status = ReadOnlyField()
+    scan_status = ReadOnlyField()
 
     class Meta:
         model = Attachment
+        list_serializer_class = AttachmentListSerializer
         fields = (
             "pk",
             "url",
@@ -32,11 +138,47 @@ class AttachmentSerializer(serializers.ModelSerializer):
             "name",
             "context",
             "content_object",
+            "processing_status",
+            "scan_status",
             # write-only
             "file",
         )
 
-class AttachmentSubSerializer(serializers.ModelSerializer):
+
+class AttachmentWithMetaDataSerializer(AttachmentSerializer):
+    """
+    AttachmentSerializer additionally exposing the extracted meta data (see drf_attachments.metadata), None if not
+    available for the file's mime type
+    """
+
+    width = MetaField("width")
+    height = MetaField("height")
+    orientation = MetaField("orientation")
+    page_count = MetaField("page_count")
+
+    class Meta(AttachmentSerializer.Meta):
+        fields = AttachmentSerializer.Meta.fields + (
+            "width",
+            "height",
+            "orientation",
+            "page_count",
+        )
+
+
+class AttachmentPreflightSerializer(serializers.Serializer):
+    """
+    Describes a file before its upload (SHA-256 hash and size), so an already stored file can be referenced instead
+    of being uploaded again (see AttachmentMeta.deduplicate)
+    """
+
+    content_object = config.get_content_object_field()
+    context = ChoiceField(choices=config.context_choices(values_list=False))
+    name = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    sha256 = serializers.RegexField(r"^[0-9a-fA-F]{64}$")
+    size = serializers.IntegerField(min_value=0)
+
+
+class AttachmentSubSerializer(CachedRepresentationMixin, serializers.ModelSerializer):
     """Sub serializer for nested data inside other serializers"""
 
     # pk is read-only by default
@@ -49,6 +191,7 @@ class AttachmentSubSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Attachment
+        list_serializer_class = CachedRepresentationListSerializer
         fields = (
             "pk",
             "download_url",
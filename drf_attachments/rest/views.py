@@ -1,16 +1,32 @@
+import os
+import time
+
 from django.http import FileResponse, Http404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
-from drf_attachments.storage import AttachmentFileStorage
-from drf_attachments.models.models import Attachment
-from drf_attachments.rest.renderers import FileDownloadRenderer
-from drf_attachments.rest.serializers import AttachmentSerializer
 from rest_framework import viewsets
 from rest_framework.decorators import action, parser_classes
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.filters import SearchFilter
 from rest_framework.pagination import LimitOffsetPagination
-from rest_framework.parsers import MultiPartParser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.status import HTTP_201_CREATED, HTTP_400_BAD_REQUEST
+
+from drf_attachments.access import access_tracker
+from drf_attachments.compression import DecompressedFile, accepts_encoding, get_codec
+from drf_attachments.models.models import Attachment
+from drf_attachments.rest.renderers import FileDownloadRenderer
+from drf_attachments.rest.serializers import (
+    AttachmentPreflightSerializer,
+    AttachmentSerializer,
+)
+from drf_attachments.scanning import is_quarantined
+from drf_attachments.signing import is_valid_download_signature
+from drf_attachments.variants import get_image_variant
 
 __all__ = [
     "AttachmentViewSet",
@@ -37,20 +53,90 @@ class AttachmentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Attachment.objects.viewable()
 
-    def get_storage_path(self):
-        attachment = self.get_object()
-        meta = getattr(attachment.content_object, "AttachmentMeta", None)
-        storage_location = getattr(meta, "storage_location", None)
+    @action(detail=False, methods=["POST"])
+    def batch(self, request, *args, **kwargs):
+        """
+        Uploads many files at once (multipart "file" fields) with a single transaction. "content_object", "context"
+        and "name" are given once for all files or once per file (in the order of the files). Invalid files are
+        skipped and reported with their index in "errors".
+        """
+        files = request.FILES.getlist("file")
+        if not files:
+            raise ValidationError({"file": _("No files were submitted.")})
 
-        # Get custom storage location
-        if meta and storage_location:
-            storage = AttachmentFileStorage(location=meta.storage_location)
-        else:
-            # Default storage value from FileField "file"
-            storage = attachment.file.storage
+        values = {}
+        for field in ("content_object", "context", "name"):
+            field_values = request.data.getlist(field)
+            if len(field_values) not in (0, 1, len(files)):
+                raise ValidationError(
+                    {
+                        field: _(
+                            "Expected a single value or one value per file ({count})."
+                        ).format(count=len(files))
+                    }
+                )
+            values[field] = field_values
+
+        attachments = []
+        errors = {}
+        for index, file in enumerate(files):
+            data = {"file": file}
+            for field, field_values in values.items():
+                if field_values:
+                    data[field] = field_values[index if len(field_values) > 1 else 0]
+
+            serializer = self.get_serializer(data=data)
+            if serializer.is_valid():
+                attachments.append((index, Attachment(**serializer.validated_data)))
+            else:
+                errors[index] = serializer.errors
 
-        # Return the file path using the appropriate storage system
-        return storage.path(attachment.file.name)
+        created, upload_errors = Attachment.objects.bulk_upload(
+            attachment for index, attachment in attachments
+        )
+        for position, error in upload_errors.items():
+            errors[attachments[position][0]] = error.detail
+
+        return Response(
+            {
+                "created": self.get_serializer(created, many=True).data,
+                "errors": [
+                    {"index": index, "file": files[index].name, "errors": errors[index]}
+                    for index in sorted(errors)
+                ],
+            },
+            status=HTTP_201_CREATED if created else HTTP_400_BAD_REQUEST,
+        )
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        parser_classes=[JSONParser, FormParser, MultiPartParser],
+    )
+    def preflight(self, request, *args, **kwargs):
+        """
+        Creates an attachment referencing an already stored file with the given SHA-256 hash and size (if the
+        content_object's AttachmentMeta.deduplicate allows it), so the file does not have to be uploaded again.
+        Responds with "upload_required" if the file has to be uploaded. Only files of attachments the requester can
+        view are referenced.
+        """
+        serializer = AttachmentPreflightSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        attachment = Attachment.objects.create_by_reference(
+            content_object=data["content_object"],
+            content_hash=data["sha256"],
+            size=data["size"],
+            context=data["context"],
+            name=data.get("name", ""),
+            candidates=self.get_queryset(),
+        )
+        if attachment is None:
+            return Response({"upload_required": True})
+        return Response(self.get_serializer(attachment).data, status=HTTP_201_CREATED)
 
     @action(
         detail=True,
@@ -60,8 +146,47 @@ class AttachmentViewSet(viewsets.ModelViewSet):
     def download(self, request, format=None, *args, **kwargs):
         """Downloads the uploaded attachment file."""
         attachment = self.get_object()
+        return self.get_download_response(
+            attachment, variant=request.query_params.get("variant")
+        )
+
+    @action(
+        detail=True,
+        methods=["GET"],
+        url_path="signed-download",
+        renderer_classes=[JSONRenderer, FileDownloadRenderer],
+        authentication_classes=[],
+        permission_classes=[AllowAny],
+    )
+    def signed_download(self, request, pk=None, format=None, *args, **kwargs):
+        """
+        Downloads the uploaded attachment file via a signed, expiring URL (see `DownloadURLField`).
+        Access is granted by the signature alone, so neither the user nor the viewable() filter are evaluated.
+        """
+        expires = request.query_params.get("expires")
+        signature = request.query_params.get("signature")
+        if not is_valid_download_signature(pk, expires, signature):
+            raise PermissionDenied()
+
+        attachment = Attachment.objects.filter(pk=pk).first()
+        if attachment is None:
+            raise Http404()
+
+        response = self.get_download_response(
+            attachment, variant=request.query_params.get("variant")
+        )
+        patch_cache_control(response, max_age=max(int(expires) - int(time.time()), 0))
+        return response
+
+    def get_download_response(self, attachment, variant=None):
+        """
+        Stream the attachment's file, or the given image variant of it (see settings.ATTACHMENT_IMAGE_VARIANTS).
+        Compressed files (see settings.ATTACHMENT_COMPRESSION) are served as stored with a Content-Encoding if the
+        client accepts it, decompressed while streaming otherwise.
+        """
         extension = attachment.get_extension()
-        storage_path = self.get_storage_path()
+        storage = attachment.file.storage
+        name = attachment.file.name
 
         if attachment.name:
             download_file_name = f"{attachment.name}{extension}"
@@ -70,11 +195,57 @@ class AttachmentViewSet(viewsets.ModelViewSet):
 
         # Check if file exists via storage due to custom storage locations
         # without triggering SuspiciousFileOperation
-        if not attachment.file.storage.exists(attachment.file.name):
+        if not storage.exists(name):
             raise Http404()
 
-        return FileResponse(
-            open(storage_path, "rb"),
-            as_attachment=True,
-            filename=download_file_name,
-        )
+        if is_quarantined(attachment):
+            raise PermissionDenied(
+                _("The file is quarantined until it was scanned and found clean.")
+            )
+
+        if variant:
+            try:
+                name = get_image_variant(attachment, variant)
+            except KeyError:
+                raise ValidationError(
+                    {
+                        "variant": _("Unknown image variant {variant}").format(
+                            variant=variant
+                        )
+                    },
+                    code="invalid",
+                )
+            except ValueError:
+                raise ValidationError(
+                    {"variant": _("Image variants are only available for images")},
+                    code="invalid",
+                )
+            download_file_name = (
+                os.path.splitext(download_file_name)[0] + os.path.splitext(name)[1]
+            )
+
+        access_tracker.record(attachment)
+
+        # open via the storage API (works for non-filesystem storages as well)
+        file = storage.open(name, "rb")
+        codec = None
+        if not variant and attachment.meta.get("compression"):
+            codec = get_codec(attachment.meta["compression"])
+        if codec is None:
+            return FileResponse(file, as_attachment=True, filename=download_file_name)
+
+        accept_encoding = self.request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if accepts_encoding(accept_encoding, codec.content_encoding):
+            response = FileResponse(
+                file, as_attachment=True, filename=download_file_name
+            )
+            response["Content-Encoding"] = codec.content_encoding
+        else:
+            response = FileResponse(
+                DecompressedFile(file, codec),
+                as_attachment=True,
+                filename=download_file_name,
+            )
+            response["Content-Length"] = attachment.get_size()
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
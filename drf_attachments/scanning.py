@@ -0,0 +1,189 @@
+import hashlib
+import socket
+import struct
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from django.utils.module_loading import import_string
+
+from drf_attachments.compression import open_stored_file
+from drf_attachments.config import config
+from drf_attachments.processing import ProcessingStage
+
+__all__ = [
+    "CLEAN",
+    "INFECTED",
+    "PENDING",
+    "ClamdScanner",
+    "FakeScanner",
+    "ScanResult",
+    "ScanStage",
+    "Scanner",
+    "get_scanner",
+    "is_quarantined",
+]
+
+# scan_status of Attachments (empty if the file was not scanned, e.g. because no scanner was configured)
+PENDING = "pending"
+CLEAN = "clean"
+INFECTED = "infected"
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class ScanResult:
+    clean: bool
+    signature: Optional[str] = None
+
+
+class Scanner:
+    """Malware scanner interface (see settings.ATTACHMENT_SCANNER)"""
+
+    def scan(self, chunks) -> ScanResult:
+        """Scan the file given as iterable of byte chunks"""
+        raise NotImplementedError()
+
+
+class ClamdScanner(Scanner):
+    """
+    Client of a clamd daemon (or any service implementing its INSTREAM command), connected via a unix socket
+    (`socket_path`) or TCP (`host` and `port`)
+    """
+
+    def __init__(self, socket_path=None, host="localhost", port=3310, timeout=60):
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def connect(self):
+        if self.socket_path:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.timeout)
+            connection.connect(self.socket_path)
+            return connection
+        return socket.create_connection((self.host, self.port), timeout=self.timeout)
+
+    def scan(self, chunks) -> ScanResult:
+        with self.connect() as connection:
+            connection.sendall(b"zINSTREAM\0")
+            for chunk in chunks:
+                connection.sendall(struct.pack("!L", len(chunk)) + chunk)
+            connection.sendall(struct.pack("!L", 0))
+
+            response = b""
+            while not response.endswith(b"\0"):
+                data = connection.recv(4096)
+                if not data:
+                    break
+                response += data
+
+        # e.g. "stream: OK" or "stream: Eicar-Signature FOUND"
+        result = response.rstrip(b"\0").decode().split(":", 1)[-1].strip()
+        if result == "OK":
+            return ScanResult(clean=True)
+        if result.endswith(" FOUND"):
+            return ScanResult(clean=False, signature=result[: -len(" FOUND")])
+        raise OSError(f"Unexpected clamd response: {result}")
+
+
+class FakeScanner(Scanner):
+    """Local scanner for tests, detecting the EICAR test file only"""
+
+    EICAR = rb"X5O!P%@AP[4\PZX54(P^)7CC)7}$EICAR-STANDARD-ANTIVIRUS-TEST-FILE!$H+H*"
+
+    def __init__(self):
+        self.scanned = 0
+
+    def scan(self, chunks) -> ScanResult:
+        self.scanned += 1
+        if self.EICAR in b"".join(chunks):
+            return ScanResult(clean=False, signature="Eicar-Test-Signature")
+        return ScanResult(clean=True)
+
+
+_scanners = {}
+_scanners_lock = threading.Lock()
+_scan_semaphores = {}
+
+
+def get_scanner() -> Optional[Scanner]:
+    """The scanner of settings.ATTACHMENT_SCANNER (shared per process), None if scanning is disabled"""
+    path = config.scanner()
+    if not path:
+        return None
+
+    with _scanners_lock:
+        if path not in _scanners:
+            _scanners[path] = import_string(path)(**config.scanner_options())
+        return _scanners[path]
+
+
+def _get_scan_semaphore():
+    concurrency = config.scan_concurrency()
+    with _scanners_lock:
+        if concurrency not in _scan_semaphores:
+            _scan_semaphores[concurrency] = threading.BoundedSemaphore(concurrency)
+        return _scan_semaphores[concurrency]
+
+
+def is_quarantined(attachment):
+    """Files are not served until they were scanned and found clean (unscanned files of an empty status are served)"""
+    return attachment.scan_status in (PENDING, INFECTED)
+
+
+class ScanStage(ProcessingStage):
+    """
+    Scans new files with the scanner of settings.ATTACHMENT_SCANNER (at most settings.ATTACHMENT_SCAN_CONCURRENCY
+    files per process at once). The SHA-256 hash of the file is stored as content_hash, files with the hash of an
+    already scanned file reuse its result instead of being scanned again.
+    Infected files fail the processing (so no further stages are run).
+    """
+
+    name = "scan"
+
+    def is_required(self, attachment):
+        return get_scanner() is not None
+
+    def process(self, attachment):
+        from drf_attachments.models import Attachment
+
+        # the hash is only computed on upload for deduplicated content_objects (see AttachmentMeta.deduplicate)
+        content_hash = attachment.content_hash or self.get_content_hash(attachment)
+        scan_status = (
+            Attachment.all_objects.filter(
+                content_hash=content_hash, scan_status__in=(CLEAN, INFECTED)
+            )
+            .values_list("scan_status", flat=True)
+            .first()
+        )
+        signature = None
+
+        if scan_status is None:
+            with _get_scan_semaphore():
+                result = get_scanner().scan(self.read_chunks(attachment))
+            scan_status = CLEAN if result.clean else INFECTED
+            signature = result.signature
+
+        attachment.content_hash = content_hash
+        attachment.scan_status = scan_status
+        Attachment.all_objects.filter(
+            pk=attachment.pk, file=attachment.file.name
+        ).update(content_hash=content_hash, scan_status=scan_status)
+
+        if scan_status == INFECTED:
+            raise ValueError(f"infected ({signature or 'known infected file'})")
+
+    @staticmethod
+    def read_chunks(attachment):
+        # compressed files are scanned (and hashed) by their original content
+        with open_stored_file(attachment) as file:
+            yield from iter(lambda: file.read(CHUNK_SIZE), b"")
+
+    def get_content_hash(self, attachment):
+        content_hash = hashlib.sha256()
+        for chunk in self.read_chunks(attachment):
+            content_hash.update(chunk)
+        return content_hash.hexdigest()
@@ -0,0 +1,63 @@
+import math
+import time
+
+from django.core import signing
+
+from drf_attachments.config import config
+
+__all__ = [
+    "get_download_expiry",
+    "get_download_signature",
+    "is_valid_download_signature",
+]
+
+SALT = "drf_attachments.download"
+
+
+def get_download_expiry(max_age=None):
+    """
+    Return the unix timestamp until which a newly signed download URL is valid.
+    The timestamp is rounded up to the next full minute, so all URLs signed for the same attachment within that minute
+    are identical (and can be cached by clients or a CDN).
+    """
+    if max_age is None:
+        max_age = config.signed_download_url_max_age()
+    return int(math.ceil((time.time() + max_age) / 60) * 60)
+
+
+def get_download_signature(pk, expires):
+    """HMAC signature (based on settings.SECRET_KEY) of the attachment pk and the expiry timestamp"""
+    return _get_signer().signature(_get_signed_value(pk, expires))
+
+
+def is_valid_download_signature(pk, expires, signature):
+    """
+    Check the signature of a download URL and whether it is still valid.
+    Only the SECRET_KEY (and SECRET_KEY_FALLBACKS) are used, no database queries are involved.
+    """
+    if not expires or not signature:
+        return False
+
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+
+    if expires < time.time():
+        return False
+
+    signer = _get_signer()
+    try:
+        signer.unsign(f"{_get_signed_value(pk, expires)}{signer.sep}{signature}")
+    except signing.BadSignature:
+        return False
+
+    return True
+
+
+def _get_signer():
+    return signing.Signer(salt=SALT)
+
+
+def _get_signed_value(pk, expires):
+    return f"{pk}:{expires}"
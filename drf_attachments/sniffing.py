@@ -0,0 +1,117 @@
+import re
+import struct
+import threading
+
+import magic
+
+__all__ = [
+    "get_magic",
+    "is_container",
+    "sniff_mime_type",
+]
+
+# magic numbers of common file types, answered without libmagic: (mime_type, ((offset, bytes), ...))
+SIGNATURES = (
+    ("image/jpeg", ((0, b"\xff\xd8\xff"),)),
+    ("image/png", ((0, b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR"),)),
+    ("image/gif", ((0, b"GIF87a"),)),
+    ("image/gif", ((0, b"GIF89a"),)),
+    ("image/webp", ((0, b"RIFF"), (8, b"WEBP"))),
+    ("application/pdf", ((0, b"%PDF-"),)),
+    ("application/gzip", ((0, b"\x1f\x8b\x08"),)),
+)
+
+# formats identified by their contents, sniffed within settings.ATTACHMENT_MIME_SNIFF_WINDOW (e.g. OOXML or ODF)
+ZIP_SIGNATURE = b"PK\x03\x04"
+OLE2_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+CONTAINER_SIGNATURES = (ZIP_SIGNATURE, OLE2_SIGNATURE)
+
+# root element of an SVG document (after the optional XML declaration, comments and doctype)
+SVG_ROOT = re.compile(
+    rb"\A(?:\xef\xbb\xbf)?\s*(?:<\?xml[^>]*>\s*)?(?:<!--.*?-->\s*)*(?:<!DOCTYPE\s+svg[^>]*>\s*)?<svg[\s>]",
+    re.DOTALL,
+)
+
+# mime types an OpenDocument `mimetype` entry may declare, anything else is left to libmagic
+OPENDOCUMENT_MIME_TYPE = re.compile(
+    r"\Aapplication/vnd\.oasis\.opendocument\.[a-z0-9.+-]+\Z"
+)
+
+OOXML_DIRECTORIES = (
+    (
+        "word/",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ),
+    ("xl/", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    (
+        "ppt/",
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ),
+)
+
+_local = threading.local()
+
+
+def get_magic():
+    """libmagic handle of the current thread (python-magic serializes all calls of a shared handle)"""
+    handle = getattr(_local, "magic", None)
+    if handle is None:
+        handle = _local.magic = magic.Magic(mime=True)
+    return handle
+
+
+def is_container(data):
+    """Whether the data starts with the magic number of a container format (identified by its contents)"""
+    return data.startswith(CONTAINER_SIGNATURES)
+
+
+def _iter_zip_entries(data):
+    """Yield (name, content) of the leading zip entries within the data (content is None unless stored)"""
+    offset = 0
+    while data.startswith(ZIP_SIGNATURE, offset) and offset + 30 <= len(data):
+        flags, method = struct.unpack_from("<HH", data, offset + 6)
+        compressed_size, _, name_length, extra_length = struct.unpack_from(
+            "<IIHH", data, offset + 18
+        )
+        start = offset + 30 + name_length + extra_length
+        name = data[offset + 30 : offset + 30 + name_length]
+        stored = method == 0 and start + compressed_size <= len(data)
+        yield name, data[start : start + compressed_size] if stored else None
+
+        if flags & 0x08:
+            # the size follows the data (data descriptor), the next entry can't be located
+            return
+        offset = start + compressed_size
+
+
+def _sniff_zip(data):
+    names = []
+    for name, content in _iter_zip_entries(data):
+        if not names and name == b"mimetype" and content:
+            # OpenDocument formats store their mime type as first, uncompressed entry (any other zip could claim
+            # an arbitrary mime type this way)
+            mime_type = content.decode("ascii", "replace").strip()
+            return mime_type if OPENDOCUMENT_MIME_TYPE.match(mime_type) else None
+        names.append(name.decode("utf-8", "replace"))
+
+    if "[Content_Types].xml" in names:
+        for directory, mime_type in OOXML_DIRECTORIES:
+            if any(name.startswith(directory) for name in names):
+                return mime_type
+    return None
+
+
+def sniff_mime_type(data):
+    """
+    Identify common file types by their magic numbers in pure Python (without walking libmagic's rules). Return None
+    for any other file type.
+    """
+    for mime_type, parts in SIGNATURES:
+        if all(data.startswith(part, offset) for offset, part in parts):
+            return mime_type
+
+    if data.startswith(ZIP_SIGNATURE):
+        return _sniff_zip(data)
+    if SVG_ROOT.match(data):
+        return "image/svg+xml"
+    return None
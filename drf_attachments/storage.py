@@ -1,17 +1,43 @@
 import os
+import random
+import shutil
+import threading
+import time
+from functools import lru_cache
 from uuid import uuid1
 
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
 from django.core.files.storage import FileSystemStorage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.utils import timezone
+from django.utils.module_loading import import_string
 
 __all__ = [
     "AttachmentFileStorage",
     "attachment_upload_path",
+    "choose_storage_volume",
+    "get_attachment_storage",
+    "get_attachment_storage_for_content_type",
+    "get_storage_for_location",
+    "get_storage_location",
+    "get_tier_volumes",
+    "get_volume_free_space",
+    "get_volume_storage",
+    "get_volume_tier",
+    "link_file",
+    "COLD_TIER",
+    "HOT_TIER",
 ]
 
+from drf_attachments.config import config
 from drf_attachments.utils import get_admin_attachment_url
 
+HOT_TIER = "hot"
+COLD_TIER = "cold"
+
 
 class AttachmentFileStorage(FileSystemStorage):
     """
@@ -33,6 +59,192 @@ class AttachmentFileStorage(FileSystemStorage):
         return get_admin_attachment_url(attachment.pk)
 
 
+def get_storage_location(model_class):
+    """Directory of the attachments of the given content_object model (AttachmentMeta.storage_location)"""
+    meta = getattr(model_class, "AttachmentMeta", None)
+    return getattr(meta, "storage_location", None) or settings.PRIVATE_ROOT
+
+
+def get_attachment_storage(model_class=None):
+    """
+    Storage (settings.ATTACHMENT_STORAGE_CLASS) of the attachments of the given content_object model.
+    Storages are shared per location and never altered, so they are safe to use from concurrent threads.
+    """
+    return _get_storage(config.storage_class(), get_storage_location(model_class))
+
+
+def get_storage_for_location(location):
+    """
+    Storage (settings.ATTACHMENT_STORAGE_CLASS) of the given location, e.g. to reopen the storage of an attachment in
+    another process by its `location`
+    """
+    return _get_storage(config.storage_class(), location)
+
+
+@lru_cache(maxsize=None)
+def _get_storage(storage_class, location):
+    return import_string(storage_class)(location=location)
+
+
+@receiver(setting_changed)
+def clear_storage_cache(setting, **kwargs):
+    if setting in ("ATTACHMENT_STORAGE_CLASS", "PRIVATE_ROOT"):
+        _get_storage.cache_clear()
+    if setting in ("ATTACHMENT_STORAGE_CLASS", "ATTACHMENT_STORAGE_VOLUMES"):
+        with _volume_free_space_lock:
+            _volume_free_space.clear()
+
+
+def get_attachment_storage_for_content_type(content_type_id, volume=""):
+    """
+    Storage of the attachments of the given content_type (ContentTypes are cached, so no query is required).
+    Attachments placed on a storage volume (see settings.ATTACHMENT_STORAGE_VOLUMES) use the storage of that volume.
+    """
+    if volume:
+        return get_volume_storage(volume)
+
+    model_class = None
+    if content_type_id is not None:
+        model_class = ContentType.objects.get_for_id(content_type_id).model_class()
+    return get_attachment_storage(model_class)
+
+
+def get_volume_storage(volume):
+    """Storage of the given volume (settings.ATTACHMENT_STORAGE_VOLUMES)"""
+    volumes = config.storage_volumes()
+    if volume not in volumes:
+        raise ImproperlyConfigured(
+            f"Unknown attachment storage volume {volume!r}, it must be defined in settings.ATTACHMENT_STORAGE_VOLUMES"
+        )
+    return _get_storage(config.storage_class(), volumes[volume]["location"])
+
+
+# volume name -> (expiry timestamp, free bytes), measured at most once per settings.ATTACHMENT_STORAGE_VOLUME_STATS_TTL
+_volume_free_space = {}
+_volume_free_space_lock = threading.Lock()
+
+
+def get_volume_free_space(volume):
+    """
+    Free space (in bytes) of the given volume: the free space of its file system (if it is stored locally), limited to
+    the remaining configured "capacity" (if defined). Measurements are reused for
+    settings.ATTACHMENT_STORAGE_VOLUME_STATS_TTL seconds.
+    """
+    now = time.monotonic()
+    with _volume_free_space_lock:
+        expires, free_space = _volume_free_space.get(volume, (0, 0))
+    if expires > now:
+        return free_space
+
+    free_space = _measure_volume_free_space(volume)
+    with _volume_free_space_lock:
+        _volume_free_space[volume] = (
+            now + config.storage_volume_stats_ttl(),
+            free_space,
+        )
+    return free_space
+
+
+def _measure_volume_free_space(volume):
+    from drf_attachments.models import Attachment
+
+    options = config.storage_volumes()[volume]
+    storage = get_volume_storage(volume)
+
+    free_space = None
+    if isinstance(storage, FileSystemStorage):
+        free_space = shutil.disk_usage(_get_existing_directory(storage.location)).free
+
+    capacity = options.get("capacity")
+    if capacity is not None:
+        used = Attachment.all_objects.filter(volume=volume).aggregate_size()
+        remaining = int(capacity) - used
+        free_space = remaining if free_space is None else min(free_space, remaining)
+
+    return max(free_space or 0, 0)
+
+
+def _get_existing_directory(path):
+    # the storage directory is created with the first file
+    while not os.path.isdir(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+def get_volume_tier(volume):
+    """Storage tier ("hot" or "cold") of the given volume, files without a volume are stored on the hot tier"""
+    if not volume:
+        return HOT_TIER
+    return config.storage_volumes()[volume].get("tier", HOT_TIER)
+
+
+def get_tier_volumes(tier):
+    """Names of the volumes of the given storage tier"""
+    return [name for name in config.storage_volumes() if get_volume_tier(name) == tier]
+
+
+def choose_storage_volume(size=0, exclude=(), tier=HOT_TIER):
+    """
+    Choose the volume (settings.ATTACHMENT_STORAGE_VOLUMES) of the given storage tier (new files are stored on the
+    hot tier) for a file of the given size, randomly weighted by the free space and the configured "weight" of each
+    volume (volumes with a weight of 0 are never chosen).
+    The size is reserved on the chosen volume until its free space is measured again.
+    Return None if no volume has enough free space.
+    """
+    names = []
+    weights = []
+    for name, options in config.storage_volumes().items():
+        weight = float(options.get("weight", 1))
+        if name in exclude or weight <= 0 or get_volume_tier(name) != tier:
+            continue
+        free_space = get_volume_free_space(name)
+        if free_space and free_space >= size:
+            names.append(name)
+            weights.append(free_space * weight)
+
+    if not names:
+        return None
+
+    volume = random.choices(names, weights=weights)[0]
+    with _volume_free_space_lock:
+        if volume in _volume_free_space:
+            expires, free_space = _volume_free_space[volume]
+            _volume_free_space[volume] = (expires, free_space - size)
+    return volume
+
+
+def link_file(source_storage, name, target_storage):
+    """
+    Make the file of the source storage available within the target storage without copying it (as hard link) if both
+    are file system storages on the same device, copy it otherwise. Return its name within the target storage.
+    """
+    if source_storage is target_storage:
+        return name
+
+    target_name = target_storage.get_available_name(name)
+    try:
+        source_path = source_storage.path(name)
+        target_path = target_storage.path(target_name)
+    except NotImplementedError:
+        # no local files (e.g. object storages)
+        source_path = target_path = None
+
+    if source_path and target_path:
+        try:
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            os.link(source_path, target_path)
+            # a hard link keeps the modification time of the source, the link is only referenced once its
+            # Attachment is saved, so it must not look old to collect_attachment_orphans in the meantime
+            os.utime(target_path)
+            return target_name
+        except OSError:
+            # e.g. different devices or no support for hard links, copy the file instead
+            pass
+
+    with source_storage.open(name, "rb") as file:
+        return target_storage.save(target_name, file)
+
+
 def attachment_upload_path(attachment, filename):
     """
     If not defined otherwise, a content_object's attachment files will be uploaded as
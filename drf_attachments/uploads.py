@@ -0,0 +1,66 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from rest_framework.exceptions import ValidationError
+
+from drf_attachments.config import config
+
+__all__ = [
+    "inspect_attachments",
+    "run_concurrently",
+]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=config.upload_workers(),
+                thread_name_prefix="drf_attachments_upload",
+            )
+        return _pool
+
+
+def run_concurrently(function, items):
+    """
+    Call the function for each item in the shared pool of settings.ATTACHMENT_UPLOAD_WORKERS threads (in the calling
+    thread if it is 0 or for a single item). Return the results in the order of the items, exceptions are returned
+    instead of being raised.
+    The function must not access the database (the threads use their own connections).
+    """
+
+    def call(item):
+        try:
+            return function(item)
+        except Exception as e:
+            return e
+
+    items = list(items)
+    if config.upload_workers() == 0 or len(items) < 2:
+        return [call(item) for item in items]
+    return list(_get_pool().map(call, items))
+
+
+def inspect_attachments(attachments):
+    """
+    Extract the file meta data of new Attachments and validate them (see Attachment.inspect()) concurrently, so the
+    latency of multi-file uploads is close to the one of the slowest file (libmagic and file reads release the GIL).
+    The content_object of the Attachments must be assigned already. Return the ValidationError of each invalid
+    Attachment by its index.
+    """
+    attachments = list(attachments)
+    for attachment in attachments:
+        attachment.previous_instance = None
+    results = run_concurrently(lambda attachment: attachment.inspect(), attachments)
+
+    errors = {}
+    for index, result in enumerate(results):
+        if isinstance(result, ValidationError):
+            errors[index] = result
+        elif isinstance(result, Exception):
+            raise result
+    return errors
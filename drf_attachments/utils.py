@@ -1,18 +1,42 @@
+import hashlib
 import os
+from functools import lru_cache
+from urllib.parse import quote
 
-import magic
-from django.urls import reverse
+from django.conf import settings
+from django.urls import get_script_prefix, get_urlconf, reverse
+from django.utils.http import RFC3986_SUBDELIMS
+
+from drf_attachments.config import config
+from drf_attachments.sniffing import get_magic, is_container, sniff_mime_type
+from drf_attachments.variants import get_image_variant_names
+
+# any value accepted by the router's pk pattern that is never altered by URL quoting
+URL_PK_PLACEHOLDER = "00000000-0000-0000-0000-000000000000"
 
 
 def get_mime_type(file):
     """
-    Get MIME by reading the header of the file
+    Get MIME by reading the header of the file. Common file types are identified by their magic numbers, any other
+    via libmagic. The header of container formats (e.g. OOXML) is read up to settings.ATTACHMENT_MIME_SNIFF_WINDOW.
     """
     initial_pos = file.tell()
     file.seek(0)
-    mime_type = magic.from_buffer(file.read(1024), mime=True)
+    data = file.read(1024)
+    if is_container(data):
+        data += file.read(max(config.mime_sniff_window() - len(data), 0))
+    file.seek(initial_pos)
+    return sniff_mime_type(data) or get_magic().from_buffer(data)
+
+
+def get_content_hash(file):
+    """SHA-256 hash (hex digest) of the file's content (keeping its position)"""
+    initial_pos = file.tell()
+    content_hash = hashlib.sha256()
+    for chunk in file.chunks():
+        content_hash.update(chunk)
     file.seek(initial_pos)
-    return mime_type
+    return content_hash.hexdigest()
 
 
 def get_extension(file):
@@ -20,26 +44,66 @@ def get_extension(file):
     return file_extension.lower()
 
 
-def remove_file(file_path, raise_exceptions=False):
-    if not os.path.isfile(file_path):
+def delete_files(storage, names, raise_exceptions=False):
+    """
+    Delete the given files and their image variants (see settings.ATTACHMENT_IMAGE_VARIANTS) via the storage API.
+    Storages providing a `delete_many(names)` method (e.g. object storages with bulk deletes) delete all files with a
+    single call.
+    """
+    names = [name for name in names if name]
+    if not names:
+        return
+    names += [variant for name in names for variant in get_image_variant_names(name)]
+
+    if hasattr(storage, "delete_many"):
+        try:
+            storage.delete_many(names)
+        except Exception:
+            if raise_exceptions:
+                # forward the thrown exception
+                raise
+            # just continue if deletion of old files was not possible and no exceptions should be raised
         return
 
-    try:
-        os.remove(file_path)
-    except Exception:
-        if raise_exceptions:
-            # forward the thrown exception
-            raise
-        # just continue if deletion of old file was not possible and no exceptions should be raised
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            if raise_exceptions:
+                # forward the thrown exception
+                raise
+            # just continue with the other files if deletion was not possible and no exceptions should be raised
+
+
+def get_url_template(view_name):
+    """
+    Return the (prefix, suffix) parts of the URL of a detail route around its pk, e.g.
+    ("/api/attachment/", "/download/"). The route is only reversed once per view name, script prefix and urlconf.
+    """
+    return _get_url_template(
+        view_name, get_script_prefix(), get_urlconf() or settings.ROOT_URLCONF
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_url_template(view_name, script_prefix, urlconf):
+    # script_prefix is only part of the cache key, reverse() reads the current one by itself
+    url = reverse(view_name, kwargs={"pk": URL_PK_PLACEHOLDER}, urlconf=urlconf)
+    prefix, suffix = url.split(URL_PK_PLACEHOLDER, 1)
+    return prefix, suffix
+
+
+def format_url_pk(pk):
+    """Quote a pk the same way reverse() does"""
+    return quote(str(pk), safe=RFC3986_SUBDELIMS + "/~:@")
 
 
 def get_api_attachment_url(attachment_pk):
-    return reverse("attachment-download", kwargs={"pk": attachment_pk})
+    prefix, suffix = get_url_template("attachment-download")
+    return f"{prefix}{format_url_pk(attachment_pk)}{suffix}"
+
 
 def get_admin_attachment_url(attachment_pk):
     return reverse(
-        "admin:drf_attachments_attachment_download",
-        kwargs={
-            "object_id": attachment_pk
-        }
+        "admin:drf_attachments_attachment_download", kwargs={"object_id": attachment_pk}
     )
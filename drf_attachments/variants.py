@@ -0,0 +1,171 @@
+import io
+import mimetypes
+import os
+import threading
+
+from django.core.files.base import ContentFile
+
+from drf_attachments.compression import open_stored_file
+from drf_attachments.config import config
+from drf_attachments.processing import ProcessingStage
+from drf_attachments.workers import create_process_pool
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover
+    Image = None
+
+__all__ = [
+    "ImageVariantStage",
+    "generate_image_variants",
+    "get_image_variant",
+    "get_image_variant_name",
+    "get_image_variant_names",
+    "render_image_variant",
+]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_image_variant_name(name, variant):
+    """
+    Deterministic name of the given variant (settings.ATTACHMENT_IMAGE_VARIANTS) of a file, stored next to the
+    original as <stem>.<variant>.<extension> (e.g. "attachments/202401/<uuid>.thumbnail.webp")
+    """
+    stem, extension = os.path.splitext(name)
+    image_format = config.image_variants()[variant].get("format")
+    if image_format:
+        extension = f".{image_format.lower()}"
+    return f"{stem}.{variant}{extension}"
+
+
+def get_image_variant_names(name):
+    """
+    Names of all variants of the given file (whether they have been generated or not), none unless its extension
+    is the one of an image (so deleting other files costs no extra storage calls)
+    """
+    variants = config.image_variants()
+    if not variants:
+        return []
+    mime_type, _encoding = mimetypes.guess_type(name)
+    if not mime_type or not mime_type.startswith("image/"):
+        return []
+    return [get_image_variant_name(name, variant) for variant in variants]
+
+
+def render_image_variant(data, width=None, height=None, format=None, quality=None):
+    """
+    Resize the given image (bytes) to fit into width x height (keeping its aspect ratio, never enlarging it) and
+    return it encoded in the given format (the original format by default) as bytes.
+    Runs within the worker processes of the variant pool, so it must only receive and return picklable values.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image_format = (format or image.format).upper()
+        # apply the EXIF orientation, variants don't keep the EXIF data
+        variant = ImageOps.exif_transpose(image)
+        variant.thumbnail((width or variant.width, height or variant.height))
+
+        if image_format == "JPEG" and variant.mode not in ("RGB", "L"):
+            variant = variant.convert("RGB")
+
+        output = io.BytesIO()
+        options = {"quality": quality} if quality else {}
+        variant.save(output, format=image_format, **options)
+        return output.getvalue()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = create_process_pool(config.image_variant_workers())
+        return _pool
+
+
+def _render(attachment, variants):
+    """Render the given variants of the attachment's file, via the process pool unless it is disabled"""
+    with open_stored_file(attachment) as file:
+        data = file.read()
+
+    options = [config.image_variants()[variant] for variant in variants]
+    kwargs = [
+        {key: value for key, value in option.items() if key != "on_upload"}
+        for option in options
+    ]
+    if config.image_variant_workers() == 0:
+        return [render_image_variant(data, **kwarg) for kwarg in kwargs]
+
+    pool = _get_pool()
+    futures = [pool.submit(render_image_variant, data, **kwarg) for kwarg in kwargs]
+    return [future.result() for future in futures]
+
+
+def _store(storage, name, data):
+    # variants are never overwritten, a concurrently generated variant is identical
+    if not storage.exists(name):
+        storage.save(name, ContentFile(data))
+
+
+def get_image_variant(attachment, variant):
+    """
+    Return the name of the given variant of the attachment's file within the file's storage, the variant is generated
+    on first access. Raise a KeyError for unknown variants and a ValueError if the file can't be converted.
+    """
+    if variant not in config.image_variants():
+        raise KeyError(variant)
+    if Image is None or not attachment.is_image:
+        raise ValueError(
+            "Image variants can only be created of images (requires Pillow)"
+        )
+
+    storage = attachment.file.storage
+    name = get_image_variant_name(attachment.file.name, variant)
+    if not storage.exists(name):
+        try:
+            (data,) = _render(attachment, [variant])
+        except (OSError, Image.DecompressionBombError) as e:
+            raise ValueError(str(e)) from e
+        _store(storage, name, data)
+    return name
+
+
+def _get_upload_variants():
+    return [
+        variant
+        for variant, options in config.image_variants().items()
+        if options.get("on_upload")
+    ]
+
+
+def generate_image_variants(attachment):
+    """
+    Generate all variants of the attachment's file that are configured with "on_upload": True (in parallel via the
+    process pool). Variants that can't be generated are generated on demand instead.
+    """
+    variants = _get_upload_variants()
+    if Image is None or not variants or not attachment.is_image:
+        return
+
+    try:
+        rendered = _render(attachment, variants)
+    except (OSError, Image.DecompressionBombError):
+        return
+
+    storage = attachment.file.storage
+    for variant, data in zip(variants, rendered):
+        _store(storage, get_image_variant_name(attachment.file.name, variant), data)
+
+
+class ImageVariantStage(ProcessingStage):
+    """Generates the image variants configured with "on_upload": True after the upload"""
+
+    name = "image_variants"
+
+    def is_required(self, attachment):
+        return (
+            Image is not None and bool(_get_upload_variants()) and attachment.is_image
+        )
+
+    def process(self, attachment):
+        generate_image_variants(attachment)
@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+from collections import Counter
+from tempfile import SpooledTemporaryFile
+
+from django.core.files import File
+
+from drf_attachments.compression import (
+    CHUNK_SIZE,
+    SPOOL_SIZE,
+    DecompressedFile,
+    get_codec,
+)
+from drf_attachments.metadata import extract_meta
+from drf_attachments.storage import get_storage_for_location
+from drf_attachments.utils import get_content_hash, get_extension, get_mime_type
+
+__all__ = [
+    "Checkpoint",
+    "get_meta_drift",
+    "inspect_stored_file",
+    "inspect_stored_files",
+]
+
+
+def inspect_stored_file(location, name, compression=None):
+    """
+    Read the stored file of an attachment (decompressed, see settings.ATTACHMENT_COMPRESSION) from the storage of the
+    given location and return its meta data (like Attachment.set_file_meta()) and its SHA-256 hash, None if the file
+    is missing. Runs within the worker processes of inspect_stored_files(), so it must not access the database.
+    """
+    if not name:
+        return None
+    storage = get_storage_for_location(location)
+    try:
+        file = storage.open(name, "rb")
+    except FileNotFoundError:
+        return None
+
+    with file:
+        stored_size = file.size
+        if compression:
+            output = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            shutil.copyfileobj(
+                DecompressedFile(file, get_codec(compression)), output, CHUNK_SIZE
+            )
+            output.seek(0)
+            file = File(output, name=name)
+
+        with file:
+            meta = {"mime_type": get_mime_type(file), "size": file.size}
+            if compression:
+                # the stored name only carries the extension of the codec
+                meta["stored_size"] = stored_size
+            else:
+                meta["extension"] = get_extension(file)
+            meta.update(extract_meta(file, meta["mime_type"]))
+            return meta, get_content_hash(file)
+
+
+def _inspect_stored_file(args):
+    return inspect_stored_file(*args)
+
+
+def inspect_stored_files(files, pool=None):
+    """
+    Inspect the given (location, name, compression) files (see inspect_stored_file()) via the process pool, within
+    the current process if it is None. Return the results in the order of the files.
+    """
+    if pool is None:
+        return [_inspect_stored_file(file) for file in files]
+    return list(pool.map(_inspect_stored_file, files, chunksize=16))
+
+
+def get_meta_drift(meta, inspected_meta):
+    """Keys of the inspected meta data that are missing from or differ from the stored meta"""
+    return sorted(
+        key for key, value in inspected_meta.items() if meta.get(key) != value
+    )
+
+
+class Checkpoint:
+    """
+    Progress of a long running command (the last processed pk and its statistics), written to a JSON file after each
+    batch so the command can resume after an interruption
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.last_pk = None
+        self.stats = Counter()
+
+    def load(self):
+        """Load the progress of an interrupted run (if any). Return whether it was found."""
+        if not self.path or not os.path.isfile(self.path):
+            return False
+        with open(self.path) as file:
+            data = json.load(file)
+        self.last_pk = data["last_pk"]
+        self.stats = Counter(data["stats"])
+        return True
+
+    def save(self, last_pk):
+        self.last_pk = str(last_pk)
+        if not self.path:
+            return
+        # replaced atomically, an interrupted write keeps the previous checkpoint
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump({"last_pk": self.last_pk, "stats": self.stats}, file)
+        os.replace(temporary_path, self.path)
+
+    def remove(self):
+        if self.path and os.path.isfile(self.path):
+            os.remove(self.path)
@@ -0,0 +1,24 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+__all__ = [
+    "create_process_pool",
+]
+
+
+def _setup_worker():
+    # worker processes started via "spawn" or "forkserver" (the default on macOS and of newer Python versions) don't
+    # inherit the loaded apps of the parent process, importing the models would raise AppRegistryNotReady
+    django.setup(set_prefix=False)
+
+
+def create_process_pool(max_workers=None, mp_context=None):
+    """
+    Process pool for CPU-bound work (e.g. image variants or the verification of stored files) whose workers set up
+    Django (from the DJANGO_SETTINGS_MODULE of the current process) before they run any task, independent of the
+    start method of the processes. Tasks should still only receive and return plain, picklable values.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=mp_context, initializer=_setup_worker
+    )
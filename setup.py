@@ -25,6 +25,9 @@ setup(
         "rest-framework-generic-relations>=2.0.0",
         "content-disposition>=1.1.0",
     ],
+    extras_require={
+        "images": ["Pillow>=9.1"],
+    },
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Framework :: Django",
@@ -0,0 +1,42 @@
+"""
+Compares the mime type detection via magic numbers (drf_attachments.sniffing) with libmagic.
+
+Usage (from the tests folder): python benchmarks/mime_sniffing.py [--rounds 2000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from testapp.tests.demo_files import DemoFile  # noqa: E402
+
+from drf_attachments.sniffing import get_magic, sniff_mime_type  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=2000)
+    rounds = parser.parse_args().rounds
+
+    print(f"{'file':<12} {'mime type':<20} {'signatures':>12} {'libmagic':>12}")
+    for file_name in (DemoFile.JPG, DemoFile.PDF, DemoFile.SVG):
+        with open(os.path.join(DemoFile.DIRECTORY, file_name), "rb") as file:
+            data = file.read(1024)
+
+        fast = timeit.timeit(lambda: sniff_mime_type(data), number=rounds)
+        libmagic = timeit.timeit(lambda: get_magic().from_buffer(data), number=rounds)
+        print(
+            f"{file_name:<12} {sniff_mime_type(data):<20} "
+            f"{fast / rounds * 1e6:>10.1f}us {libmagic / rounds * 1e6:>10.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
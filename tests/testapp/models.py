@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 
 from drf_attachments.models.fields import AttachmentRelation
@@ -14,6 +16,7 @@ class PhotoAlbum(models.Model):
     class AttachmentMeta:
         valid_mime_types = ["image/jpeg", "application/pdf"]
         valid_extensions = [".jpg", ".jpeg", ".pdf"]
+        deduplicate = True
 
 
 class Thumbnail(models.Model):
@@ -28,6 +31,7 @@ class Thumbnail(models.Model):
         valid_mime_types = ["image/jpeg"]
         valid_extensions = [".jpg"]
         unique_upload_per_context = True
+        deduplicate = True
 
 
 class Diagram(models.Model):
@@ -70,3 +74,17 @@ class Profile(models.Model):
         valid_mime_types = ["image/jpeg"]
         valid_extensions = [".jpg", ".jpeg"]
         unique_upload = True
+
+
+class Report(models.Model):
+    """
+    Report identified by a UUID with any number of PDF files as attachments.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=50)
+    attachments = AttachmentRelation()
+
+    class AttachmentMeta:
+        valid_mime_types = ["application/pdf"]
+        valid_extensions = [".pdf"]
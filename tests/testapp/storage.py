@@ -0,0 +1,57 @@
+import threading
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class InMemoryObjectStorage(Storage):
+    """
+    In-process stand-in for an object storage (e.g. S3): objects are stored per bucket (location) in memory, there is
+    no local file path, and bulk deletes are supported via `delete_many`.
+    """
+
+    buckets = {}
+    delete_many_calls = []
+    _lock = threading.Lock()
+
+    def __init__(self, location=""):
+        self.location = location
+
+    @classmethod
+    def reset(cls):
+        cls.buckets.clear()
+        cls.delete_many_calls.clear()
+
+    @property
+    def bucket(self):
+        return self.buckets.setdefault(self.location, {})
+
+    def _open(self, name, mode="rb"):
+        return ContentFile(self.bucket[name], name=name)
+
+    def _save(self, name, content):
+        content.seek(0)
+        with self._lock:
+            self.bucket[name] = content.read()
+        return name
+
+    def delete(self, name):
+        with self._lock:
+            self.bucket.pop(name, None)
+
+    def delete_many(self, names):
+        with self._lock:
+            self.delete_many_calls.append(list(names))
+            for name in names:
+                self.bucket.pop(name, None)
+
+    def exists(self, name):
+        return name in self.bucket
+
+    def size(self, name):
+        return len(self.bucket[name])
+
+    def url(self, name):
+        return f"https://objects.example.com/{self.location}/{name}"
@@ -0,0 +1,148 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from testapp.models import PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.access import access_tracker
+from drf_attachments.models import Attachment
+
+
+@override_settings(ATTACHMENT_ACCESS_TRACKING=True)
+class TestAccessTracking(TestCase):
+    def setUp(self):
+        super().setUp()
+        access_tracker.flush()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+            self.attachment = Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=self.photo_album,
+                file=file,
+            )
+
+    def download(self):
+        response = self.client.get(f"/api/attachment/{self.attachment.pk}/download/")
+        self.assertEqual(200, response.status_code)
+
+    def test_downloads_are_buffered(self):
+        with self.assertNumQueries(0):
+            access_tracker.record(self.attachment)
+            access_tracker.record(self.attachment)
+        self.assertEqual(1, access_tracker.pending())
+
+        self.attachment.refresh_from_db()
+        self.assertIsNone(self.attachment.last_access_date)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(1, access_tracker.flush())
+        self.attachment.refresh_from_db()
+        self.assertIsNotNone(self.attachment.last_access_date)
+        self.assertEqual(2, self.attachment.download_count)
+        self.assertEqual(0, access_tracker.pending())
+
+    def test_download_counts(self):
+        with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+            other = Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=self.photo_album,
+                file=file,
+            )
+        for _ in range(3):
+            self.download()
+        access_tracker.record(other)
+        self.assertEqual(2, access_tracker.pending())
+
+        # the aggregated increments of all attachments are written with a single query
+        with self.assertNumQueries(1):
+            self.assertEqual(2, access_tracker.flush())
+
+        self.download()
+        access_tracker.flush()
+
+        self.attachment.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(4, self.attachment.download_count)
+        self.assertEqual(1, other.download_count)
+        self.assertLess(other.last_access_date, self.attachment.last_access_date)
+
+    def test_flush_in_batches(self):
+        others = []
+        for _ in range(2):
+            with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+                others.append(
+                    Attachment.objects.create(
+                        context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                        content_object=self.photo_album,
+                        file=file,
+                    )
+                )
+        for attachment in [self.attachment, *others]:
+            access_tracker.record(attachment)
+
+        # one bounded UPDATE per batch
+        with mock.patch("drf_attachments.access.FLUSH_BATCH_SIZE", 2):
+            with self.assertNumQueries(2):
+                self.assertEqual(3, access_tracker.flush())
+        self.assertEqual(
+            [1, 1, 1],
+            [
+                attachment.download_count
+                for attachment in Attachment.objects.filter(
+                    pk__in=[self.attachment.pk, *[other.pk for other in others]]
+                )
+            ],
+        )
+
+    def test_admin(self):
+        self.download()
+        access_tracker.flush()
+
+        response = self.client.get("/admin/drf_attachments/attachment/")
+        self.assertContains(response, '<td class="field-download_count">1</td>')
+
+    @override_settings(ATTACHMENT_ACCESS_FLUSH_SIZE=1)
+    def test_flush_on_size(self):
+        self.download()
+
+        self.attachment.refresh_from_db()
+        self.assertIsNotNone(self.attachment.last_access_date)
+
+    @override_settings(ATTACHMENT_ACCESS_FLUSH_INTERVAL=0)
+    def test_flush_on_interval(self):
+        self.download()
+
+        self.attachment.refresh_from_db()
+        self.assertIsNotNone(self.attachment.last_access_date)
+
+    def test_flush_by_timer(self):
+        with mock.patch("drf_attachments.access.threading.Timer") as timer_class:
+            access_tracker.record(self.attachment)
+            access_tracker.record(self.attachment)
+
+        # a single timer flushes the buffer of a quiet process after the interval
+        timer_class.assert_called_once_with(60, access_tracker._flush_in_background)
+        timer_class.return_value.start.assert_called_once_with()
+
+        access_tracker.flush()
+        timer_class.return_value.cancel.assert_called_once_with()
+        self.attachment.refresh_from_db()
+        self.assertEqual(2, self.attachment.download_count)
+
+    def test_flush_at_exit(self):
+        access_tracker.record(self.attachment)
+        access_tracker.flush_at_exit()
+
+        self.attachment.refresh_from_db()
+        self.assertEqual(1, self.attachment.download_count)
+        self.assertEqual(0, access_tracker.pending())
+
+    @override_settings(ATTACHMENT_ACCESS_TRACKING=False)
+    def test_disabled(self):
+        self.download()
+
+        self.assertEqual(0, access_tracker.pending())
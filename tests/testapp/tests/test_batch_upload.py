@@ -0,0 +1,262 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, transaction
+from django.test import TestCase, override_settings
+from rest_framework.status import HTTP_201_CREATED, HTTP_400_BAD_REQUEST
+from testapp.models import Diagram, PhotoAlbum, Thumbnail
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment, AttachmentUsage
+from drf_attachments.models.querysets import AttachmentQuerySet
+from drf_attachments.storage import get_volume_storage
+
+
+def upload_file(file_name):
+    with open(os.path.join(DemoFile.DIRECTORY, file_name), "rb") as file:
+        return SimpleUploadedFile(file_name, file.read())
+
+
+class TestBatchUpload(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.thumbnail = Thumbnail.objects.create(name="thumbnail1")
+        self.diagram = Diagram.objects.create(name="diagram1")
+
+    def batch_upload(self, files, **data):
+        return self.client.post(
+            path="/api/attachment/batch/",
+            data={"file": [upload_file(file_name) for file_name in files], **data},
+        )
+
+    def test_batch_upload(self):
+        response = self.batch_upload(
+            [DemoFile.JPG, DemoFile.PDF, DemoFile.JPG],
+            content_object="http://any.domain/api/photo_album/album1/",
+            context=settings.ATTACHMENT_CONTEXT_WORK_PHOTO,
+            name=["first", "second", "third"],
+        )
+        self.assertEqual(HTTP_201_CREATED, response.status_code, response.content)
+        self.assertEqual(3, len(response.json()["created"]))
+        self.assertEqual([], response.json()["errors"])
+
+        attachments = self.photo_album.attachments.order_by("name")
+        self.assertEqual(["first", "second", "third"], [a.name for a in attachments])
+        self.assertEqual(
+            ["image/jpeg", "application/pdf", "image/jpeg"],
+            [a.get_mime_type() for a in attachments],
+        )
+        for attachment in attachments:
+            self.assertTrue(os.path.isfile(attachment.file.path))
+
+    def test_batch_upload_reports_errors_per_file(self):
+        response = self.batch_upload(
+            [DemoFile.JPG, DemoFile.SVG, DemoFile.PDF],
+            content_object=[
+                "http://any.domain/api/photo_album/album1/",
+                "http://any.domain/api/photo_album/album1/",
+                "http://any.domain/api/photo_album/unknown/",
+            ],
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+        )
+        self.assertEqual(HTTP_201_CREATED, response.status_code, response.content)
+
+        data = response.json()
+        self.assertEqual(1, len(data["created"]))
+        self.assertEqual([1, 2], [error["index"] for error in data["errors"]])
+        self.assertEqual(DemoFile.SVG, data["errors"][0]["file"])
+        self.assertIn("file", data["errors"][0]["errors"])
+        self.assertIn("content_object", data["errors"][1]["errors"])
+        self.assertEqual(1, Attachment.objects.count())
+
+    def test_batch_upload_without_valid_files(self):
+        response = self.batch_upload(
+            [DemoFile.SVG],
+            content_object="http://any.domain/api/photo_album/album1/",
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+        )
+        self.assertEqual(HTTP_400_BAD_REQUEST, response.status_code, response.content)
+        self.assertEqual(0, Attachment.objects.count())
+
+        response = self.client.post(path="/api/attachment/batch/", data={})
+        self.assertEqual(HTTP_400_BAD_REQUEST, response.status_code, response.content)
+
+    def test_batch_upload_validates_value_count(self):
+        response = self.batch_upload(
+            [DemoFile.JPG, DemoFile.JPG, DemoFile.JPG],
+            content_object="http://any.domain/api/photo_album/album1/",
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+            name=["first", "second"],
+        )
+        self.assertEqual(HTTP_400_BAD_REQUEST, response.status_code, response.content)
+        self.assertIn("name", response.json())
+
+    def test_batch_upload_applies_uniqueness_once(self):
+        self.batch_upload(
+            [DemoFile.JPG],
+            content_object="http://any.domain/api/thumbnail/thumbnail1/",
+            context=settings.ATTACHMENT_CONTEXT_WORK_PHOTO,
+            name="old",
+        )
+        self.batch_upload(
+            [DemoFile.SVG],
+            content_object="http://any.domain/api/diagram/diagram1/",
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+            name="old",
+        )
+        old_thumbnail = self.thumbnail.attachments.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.batch_upload(
+                [DemoFile.JPG, DemoFile.JPG, DemoFile.JPG, DemoFile.SVG, DemoFile.SVG],
+                content_object=[
+                    "http://any.domain/api/thumbnail/thumbnail1/",
+                    "http://any.domain/api/thumbnail/thumbnail1/",
+                    "http://any.domain/api/thumbnail/thumbnail1/",
+                    "http://any.domain/api/diagram/diagram1/",
+                    "http://any.domain/api/diagram/diagram1/",
+                ],
+                context=[
+                    settings.ATTACHMENT_CONTEXT_WORK_PHOTO,
+                    settings.ATTACHMENT_CONTEXT_WORK_PHOTO,
+                    settings.ATTACHMENT_CONTEXT_VACATION_PHOTO,
+                    settings.ATTACHMENT_DEFAULT_CONTEXT,
+                    settings.ATTACHMENT_DEFAULT_CONTEXT,
+                ],
+                name=["work1", "work2", "vacation", "diagram1", "diagram2"],
+            )
+        self.assertEqual(HTTP_201_CREATED, response.status_code, response.content)
+
+        # the earlier uploads are replaced by the later ones of the same batch
+        data = response.json()
+        self.assertEqual([0, 3], [error["index"] for error in data["errors"]])
+        self.assertEqual(
+            {"vacation", "work2"},
+            set(self.thumbnail.attachments.values_list("name", flat=True)),
+        )
+        self.assertEqual(
+            ["diagram2"], list(self.diagram.attachments.values_list("name", flat=True))
+        )
+        self.assertFalse(os.path.exists(old_thumbnail.file.path))
+
+    @override_settings(ATTACHMENT_UPLOAD_WORKERS=0)
+    def test_replaced_file_is_kept_on_failure(self):
+        self.batch_upload(
+            [DemoFile.SVG],
+            content_object="http://any.domain/api/diagram/diagram1/",
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+        )
+        old_diagram = self.diagram.attachments.get()
+        attachment = Attachment(
+            content_object=self.diagram,
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+            file=upload_file(DemoFile.SVG),
+        )
+
+        # the usage counters are updated after the replaced Attachment was deleted
+        with mock.patch.object(
+            AttachmentQuerySet, "_record_usage", side_effect=DatabaseError("failed")
+        ):
+            with self.assertRaises(DatabaseError):
+                Attachment.objects.bulk_upload([attachment])
+
+        # the replaced Attachment is rolled back along with its file
+        self.assertEqual(old_diagram, self.diagram.attachments.get())
+        self.assertTrue(os.path.isfile(old_diagram.file.path))
+
+    def test_replaced_file_is_kept_until_commit(self):
+        self.batch_upload(
+            [DemoFile.SVG],
+            content_object="http://any.domain/api/diagram/diagram1/",
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+        )
+        old_diagram = self.diagram.attachments.get()
+        attachment = Attachment(
+            content_object=self.diagram,
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+            file=upload_file(DemoFile.SVG),
+        )
+
+        # e.g. ATOMIC_REQUESTS, rolled back after the upload
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                Attachment.objects.bulk_upload([attachment])
+                transaction.set_rollback(True)
+
+        self.assertEqual([], callbacks)
+        self.assertEqual(old_diagram, self.diagram.attachments.get())
+        self.assertTrue(os.path.isfile(old_diagram.file.path))
+
+    @override_settings(ATTACHMENT_UPLOAD_WORKERS=2)
+    def test_bulk_upload_to_storage_volumes(self):
+        locations = {}
+        for volume in ("a", "b"):
+            locations[volume] = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, locations[volume])
+        attachments = [
+            Attachment(
+                content_object=self.photo_album,
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                file=upload_file(file_name),
+            )
+            for file_name in (DemoFile.JPG, DemoFile.PDF)
+        ]
+
+        with self.settings(ATTACHMENT_STORAGE_VOLUMES=locations):
+            created, errors = Attachment.objects.bulk_upload(attachments)
+
+            for attachment in created:
+                self.assertIn(attachment.volume, locations)
+                self.assertTrue(
+                    get_volume_storage(attachment.volume).exists(attachment.file.name)
+                )
+                self.assertFalse(
+                    os.path.exists(
+                        os.path.join(settings.PRIVATE_ROOT, attachment.file.name)
+                    )
+                )
+
+    @override_settings(ATTACHMENT_UPLOAD_WORKERS=0)
+    def test_bulk_upload_queryset(self):
+        attachments = [
+            Attachment(
+                content_object=self.photo_album,
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                file=upload_file(file_name),
+            )
+            for file_name in (DemoFile.JPG, DemoFile.XYZ, DemoFile.PDF)
+        ]
+
+        with self.assertNumQueries(3):
+            # savepoint, insert, release
+            created, errors = Attachment.objects.bulk_upload(attachments)
+
+        self.assertEqual([attachments[0], attachments[2]], created)
+        self.assertEqual([1], list(errors))
+        self.assertIn("file", errors[1].detail)
+        self.assertEqual(2, self.photo_album.attachments.count())
+
+    @override_settings(ATTACHMENT_USAGE_TRACKING=True)
+    def test_batch_upload_records_usage(self):
+        self.batch_upload(
+            [DemoFile.JPG, DemoFile.PDF],
+            content_object="http://any.domain/api/photo_album/album1/",
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+        )
+
+        attachment = self.photo_album.attachments.first()
+        self.assertEqual(
+            (2, self.photo_album.attachments.aggregate_size()),
+            AttachmentUsage.objects.get_usage(
+                attachment.content_type_id, self.photo_album.pk
+            ),
+        )
@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from testapp.models import Diagram, File, PhotoAlbum, Thumbnail
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment, AttachmentUsage
+from drf_attachments.scanning import is_quarantined
+
+
+class TestCloning(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage_location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_location)
+
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.other_album = PhotoAlbum.objects.create(name="album2")
+        self.thumbnail = Thumbnail.objects.create(name="thumbnail1")
+        self.attachments = [
+            self.create_attachment(
+                self.photo_album, DemoFile.JPG, settings.ATTACHMENT_CONTEXT_WORK_PHOTO
+            ),
+            self.create_attachment(
+                self.photo_album,
+                DemoFile.JPG,
+                settings.ATTACHMENT_CONTEXT_VACATION_PHOTO,
+            ),
+        ]
+
+    @staticmethod
+    def create_attachment(content_object, file_name, context):
+        with DemoFile(file_name, as_django_file=True) as file:
+            return Attachment.objects.create(
+                name=file_name,
+                context=context,
+                content_object=content_object,
+                file=file,
+            )
+
+    def test_clone_to(self):
+        # select, savepoint, insert, release
+        with self.assertNumQueries(4):
+            clones = self.photo_album.attachments.all().clone_to(self.other_album)
+
+        self.assertEqual(2, self.other_album.attachments.count())
+        self.assertEqual(2, self.photo_album.attachments.count())
+        for attachment, clone in zip(self.attachments, clones):
+            self.assertNotEqual(attachment.pk, clone.pk)
+            self.assertEqual(attachment.file.name, clone.file.name)
+            self.assertEqual(attachment.context, clone.context)
+            self.assertEqual(attachment.meta, clone.meta)
+
+        # the shared files are removed with their last reference
+        path = self.attachments[0].file.path
+        self.attachments[0].delete()
+        self.assertTrue(os.path.isfile(path))
+        clones[0].delete()
+        self.assertFalse(os.path.isfile(path))
+
+    @override_settings(
+        ATTACHMENT_SCANNER="drf_attachments.scanning.FakeScanner",
+        ATTACHMENT_PROCESSING_EXECUTOR="sync",
+    )
+    def test_clone_to_of_pending_scan(self):
+        source = self.create_attachment(
+            self.thumbnail, DemoFile.JPG, settings.ATTACHMENT_DEFAULT_CONTEXT
+        )
+        self.assertEqual("pending", source.scan_status)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            clone = source.clone_to(self.other_album)
+
+        # the clone is processed (and scanned) itself instead of staying quarantined
+        clone.refresh_from_db()
+        self.assertEqual("ready", clone.processing_status)
+        self.assertEqual("clean", clone.scan_status)
+        self.assertFalse(is_quarantined(clone))
+
+    def test_clone_to_other_storage_location(self):
+        with mock.patch.object(
+            Thumbnail.AttachmentMeta,
+            "storage_location",
+            self.storage_location,
+            create=True,
+        ):
+            clone = self.attachments[0].clone_to(self.thumbnail)
+
+        source_path = self.attachments[0].file.path
+        clone_path = os.path.join(self.storage_location, clone.file.name)
+        self.assertTrue(os.path.isfile(clone_path))
+        # hard linked instead of copied
+        self.assertTrue(os.path.samefile(source_path, clone_path))
+
+    def test_clone_to_validates_target(self):
+        diagram = Diagram.objects.create(name="diagram1")
+        with self.assertRaises(ValidationError) as context:
+            self.photo_album.attachments.all().clone_to(diagram)
+        self.assertIn("file", context.exception.detail)
+
+        # the thumbnail only allows one attachment per context
+        with self.assertRaises(ValidationError):
+            self.photo_album.attachments.all().clone_to(
+                self.thumbnail, context=settings.ATTACHMENT_CONTEXT_WORK_PHOTO
+            )
+        self.assertEqual(0, Attachment.objects.filter(object_id="thumbnail1").count())
+
+    def test_clone_to_replaces_attachments_of_target(self):
+        replaced = self.create_attachment(
+            self.thumbnail, DemoFile.JPG, settings.ATTACHMENT_CONTEXT_WORK_PHOTO
+        )
+
+        self.photo_album.attachments.all().clone_to(self.thumbnail)
+
+        self.assertFalse(Attachment.objects.filter(pk=replaced.pk).exists())
+        self.assertEqual(2, self.thumbnail.attachments.count())
+
+    def test_reassign_to(self):
+        count = self.photo_album.attachments.all().reassign_to(self.other_album)
+
+        self.assertEqual(2, count)
+        self.assertEqual(0, self.photo_album.attachments.count())
+        self.assertEqual(
+            {attachment.pk for attachment in self.attachments},
+            set(self.other_album.attachments.values_list("pk", flat=True)),
+        )
+        for attachment in self.attachments:
+            self.assertTrue(os.path.isfile(attachment.file.path))
+
+    def test_reassign_to_other_storage_location(self):
+        attachment = self.attachments[0]
+        source_path = attachment.file.path
+
+        with mock.patch.object(
+            Thumbnail.AttachmentMeta,
+            "storage_location",
+            self.storage_location,
+            create=True,
+        ):
+            attachment.reassign_to(self.thumbnail)
+
+        self.assertEqual(self.thumbnail.pk, attachment.object_id)
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.storage_location, attachment.file.name))
+        )
+        self.assertFalse(os.path.isfile(source_path))
+
+    def test_reassign_to_validates_target(self):
+        file = File.objects.create(name="file1")
+        # only a single attachment is allowed for files
+        with self.assertRaises(ValidationError):
+            self.photo_album.attachments.all().reassign_to(file)
+        self.assertEqual(2, self.photo_album.attachments.count())
+
+    @override_settings(ATTACHMENT_USAGE_TRACKING=True)
+    def test_usage(self):
+        AttachmentUsage.objects.all().delete()
+        content_type_id = self.attachments[0].content_type_id
+        size = sum(attachment.get_size() for attachment in self.attachments)
+
+        self.photo_album.attachments.all().clone_to(self.other_album)
+        self.assertEqual(
+            (2, size), AttachmentUsage.objects.get_usage(content_type_id, "album2")
+        )
+
+        self.photo_album.attachments.all().reassign_to(self.other_album)
+        self.assertEqual(
+            (4, 2 * size),
+            AttachmentUsage.objects.get_usage(content_type_id, "album2"),
+        )
+        self.assertEqual(
+            (-2, -size), AttachmentUsage.objects.get_usage(content_type_id, "album1")
+        )
@@ -0,0 +1,176 @@
+import gzip
+import os
+import zlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from rest_framework.status import HTTP_200_OK
+from testapp.models import File, PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.compression import accepts_encoding, open_stored_file
+from drf_attachments.models import Attachment
+
+CSV = b"".join(f"{i},row {i},{i * 2}\n".encode() for i in range(400))
+
+
+@override_settings(ATTACHMENT_COMPRESSION={"text/*": {}})
+class TestCompression(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.file = File.objects.create(name="file1")
+
+    def create_attachment(self, data=CSV, name="data.csv", content_object=None):
+        return Attachment.objects.create(
+            name="data",
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+            content_object=content_object or self.file,
+            file=ContentFile(data, name=name),
+        )
+
+    def read_stored(self, attachment):
+        with attachment.file.storage.open(attachment.file.name, "rb") as file:
+            return file.read()
+
+    def download(self, attachment, **headers):
+        return self.client.get(
+            f"/api/attachment/{attachment.pk}/download/", headers=headers
+        )
+
+    def test_compressed_at_rest(self):
+        attachment = self.create_attachment()
+
+        stored = self.read_stored(attachment)
+        self.assertEqual(CSV, gzip.decompress(stored))
+        self.assertTrue(attachment.file.name.endswith(".gz"))
+        self.assertEqual("gzip", attachment.meta["compression"])
+        self.assertEqual(len(CSV), attachment.get_size())
+        self.assertEqual(len(stored), attachment.get_stored_size())
+        self.assertLess(attachment.get_stored_size(), attachment.get_size() / 2)
+        self.assertEqual(".csv", attachment.get_extension())
+
+        with open_stored_file(attachment) as file:
+            self.assertEqual(CSV, file.read())
+
+    def test_rules(self):
+        with override_settings(
+            ATTACHMENT_COMPRESSION={
+                "text/*": {"codec": "deflate", "level": 9, "min_size": 4096},
+                "text/csv": None,
+            }
+        ):
+            # files only allow a single attachment
+            csv = self.create_attachment()
+            text = self.create_attachment(
+                b"plain text\n" * 500,
+                name="data.txt",
+                content_object=File.objects.create(name="file2"),
+            )
+            small = self.create_attachment(
+                b"plain text\n" * 200,
+                name="data.txt",
+                content_object=File.objects.create(name="file3"),
+            )
+
+        self.assertNotIn("compression", csv.meta)
+        self.assertEqual(CSV, self.read_stored(csv))
+        self.assertEqual("deflate", text.meta["compression"])
+        self.assertEqual(b"plain text\n" * 500, zlib.decompress(self.read_stored(text)))
+        # below the min_size
+        self.assertNotIn("stored_size", small.meta)
+
+    @override_settings(ATTACHMENT_COMPRESSION={"*/*": {}, "image/*": {"min_size": 0}})
+    def test_incompressible_files_are_stored_as_is(self):
+        # compressing the JPEG saves less than 10%
+        photo_album = PhotoAlbum.objects.create(name="album1")
+        with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+            attachment = Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=photo_album,
+                file=file,
+            )
+
+        self.assertNotIn("compression", attachment.meta)
+        self.assertEqual(attachment.get_size(), attachment.get_stored_size())
+
+    def test_download_with_content_encoding(self):
+        attachment = self.create_attachment()
+
+        response = self.download(attachment, accept_encoding="br, gzip;q=0.8")
+        self.assertEqual(HTTP_200_OK, response.status_code)
+        self.assertEqual("gzip", response["Content-Encoding"])
+        self.assertEqual("text/csv", response["Content-Type"])
+        self.assertIn("Accept-Encoding", response["Vary"])
+        body = response.getvalue()
+        self.assertEqual(str(len(body)), response["Content-Length"])
+        self.assertEqual(CSV, gzip.decompress(body))
+
+    def test_download_decompressed(self):
+        attachment = self.create_attachment()
+
+        for accept_encoding in ("", "identity", "gzip;q=0, deflate"):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.download(attachment, accept_encoding=accept_encoding)
+                self.assertEqual(HTTP_200_OK, response.status_code)
+                self.assertFalse(response.has_header("Content-Encoding"))
+                self.assertEqual(str(len(CSV)), response["Content-Length"])
+                self.assertEqual(CSV, response.getvalue())
+
+    def test_bulk_upload(self):
+        attachments = [
+            Attachment(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=File.objects.create(name=f"bulk{i}"),
+                file=ContentFile(CSV, name="data.csv"),
+            )
+            for i in range(2)
+        ]
+        created, errors = Attachment.objects.bulk_upload(attachments)
+
+        self.assertEqual({}, errors)
+        for attachment in created:
+            self.assertEqual("gzip", attachment.meta["compression"])
+            self.assertEqual(CSV, gzip.decompress(self.read_stored(attachment)))
+
+    def test_replaced_file_is_compressed(self):
+        attachment = self.create_attachment()
+        old_path = attachment.file.path
+
+        attachment.file = ContentFile(b"replaced\n" * 200, name="data.txt")
+        attachment.save()
+
+        self.assertFalse(os.path.isfile(old_path))
+        with open_stored_file(attachment) as file:
+            self.assertEqual(b"replaced\n" * 200, file.read())
+        self.assertEqual(len(b"replaced\n" * 200), attachment.get_size())
+
+    def test_save_compressed(self):
+        attachment = self.create_attachment(b"line\n" * 1_000, name="notes.txt")
+        self.assertLess(attachment.get_stored_size(), File.AttachmentMeta.min_size)
+
+        # the original size is validated, not the one of the compressed file
+        attachment.name = "renamed"
+        attachment.save()
+
+        attachment.refresh_from_db()
+        self.assertEqual("renamed", attachment.name)
+        self.assertEqual(5_000, attachment.get_size())
+
+    def test_accepts_encoding(self):
+        for accept_encoding, expected in (
+            ("gzip", True),
+            ("deflate, GZIP;q=0.5", True),
+            ("*", True),
+            ("*;q=0.1, br", True),
+            ("", False),
+            ("br, deflate", False),
+            ("gzip;q=0", False),
+            ("*, gzip;q=0", False),
+            ("gzip;q=invalid", False),
+        ):
+            with self.subTest(accept_encoding):
+                self.assertEqual(expected, accepts_encoding(accept_encoding, "gzip"))
@@ -0,0 +1,150 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST
+from testapp.models import Diagram, PhotoAlbum, Thumbnail
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment
+
+
+def read_demo_file(file_name):
+    with open(os.path.join(DemoFile.DIRECTORY, file_name), "rb") as file:
+        return file.read()
+
+
+def filter_viewable_thumbnails(queryset):
+    return queryset.filter(content_type__model="thumbnail")
+
+
+class TestDeduplication(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.thumbnail = Thumbnail.objects.create(name="thumbnail1")
+        self.diagram = Diagram.objects.create(name="diagram1")
+
+        with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+            self.stored = Attachment.objects.create(
+                name="stored",
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=self.photo_album,
+                file=file,
+            )
+        data = read_demo_file(DemoFile.JPG)
+        self.sha256 = hashlib.sha256(data).hexdigest()
+        self.size = len(data)
+
+    def preflight(self, content_object_path, sha256=None, size=None, **data):
+        return self.client.post(
+            path="/api/attachment/preflight/",
+            data={
+                "content_object": f"http://any.domain/api/{content_object_path}/",
+                "context": settings.ATTACHMENT_CONTEXT_WORK_PHOTO,
+                "sha256": sha256 or self.sha256,
+                "size": self.size if size is None else size,
+                **data,
+            },
+            content_type="application/json",
+        )
+
+    def test_content_hash_on_upload(self):
+        self.assertEqual(self.sha256, self.stored.content_hash)
+
+    def test_no_content_hash_without_deduplication(self):
+        with DemoFile(DemoFile.SVG, as_django_file=True) as file:
+            attachment = Attachment.objects.create(
+                content_object=self.diagram,
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                file=file,
+            )
+
+        self.assertEqual("", attachment.content_hash)
+
+    def test_preflight_references_stored_file(self):
+        response = self.preflight(f"thumbnail/{self.thumbnail.pk}", name="referenced")
+        self.assertEqual(HTTP_201_CREATED, response.status_code, response.content)
+        self.assertEqual("referenced", response.json()["name"])
+
+        attachment = self.thumbnail.attachments.get()
+        self.assertEqual(self.stored.file.name, attachment.file.name)
+        self.assertEqual(settings.ATTACHMENT_CONTEXT_WORK_PHOTO, attachment.context)
+        self.assertEqual(self.stored.meta, attachment.meta)
+        self.assertEqual(self.sha256, attachment.content_hash)
+
+    def test_preflight_requires_upload(self):
+        for content_object_path, sha256, size in (
+            # no deduplication for the content_object
+            (f"diagram/{self.diagram.pk}", None, None),
+            # unknown hash or size
+            (f"thumbnail/{self.thumbnail.pk}", "0" * 64, None),
+            (f"thumbnail/{self.thumbnail.pk}", None, 1),
+        ):
+            with self.subTest(content_object_path=content_object_path):
+                response = self.preflight(content_object_path, sha256, size)
+                self.assertEqual(HTTP_200_OK, response.status_code, response.content)
+                self.assertEqual({"upload_required": True}, response.json())
+
+        self.assertEqual(1, Attachment.objects.count())
+
+    def test_preflight_validates_attachment(self):
+        response = self.preflight(f"thumbnail/{self.thumbnail.pk}", sha256="xyz")
+        self.assertEqual(HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertIn("sha256", response.json())
+
+        # the PDF matches the hash, but is not allowed for thumbnails
+        with DemoFile(DemoFile.PDF, as_django_file=True) as file:
+            pdf = Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=self.photo_album,
+                file=file,
+            )
+        response = self.preflight(
+            f"thumbnail/{self.thumbnail.pk}",
+            sha256=pdf.content_hash,
+            size=pdf.get_size(),
+        )
+        self.assertEqual(HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertIn("file", response.json())
+
+    @override_settings(
+        ATTACHMENT_FILTER_VIEWABLE_CONTENT_OBJECTS_CALLABLE=(
+            "testapp.tests.test_deduplication.filter_viewable_thumbnails"
+        )
+    )
+    def test_preflight_ignores_files_the_requester_cannot_view(self):
+        # the stored file belongs to a photo album, which is not viewable
+        response = self.preflight(f"thumbnail/{self.thumbnail.pk}")
+        self.assertEqual(HTTP_200_OK, response.status_code, response.content)
+        self.assertEqual({"upload_required": True}, response.json())
+        self.assertFalse(self.thumbnail.attachments.exists())
+
+    @override_settings(ATTACHMENT_SCANNER="drf_attachments.scanning.FakeScanner")
+    def test_preflight_ignores_unscanned_files(self):
+        response = self.preflight(f"thumbnail/{self.thumbnail.pk}")
+        self.assertEqual({"upload_required": True}, response.json())
+
+    def test_shared_file_is_deleted_with_last_reference(self):
+        self.preflight(f"thumbnail/{self.thumbnail.pk}")
+        referenced = self.thumbnail.attachments.get()
+        path = self.stored.file.path
+
+        self.stored.delete()
+        self.assertTrue(os.path.isfile(path))
+        referenced.delete()
+        self.assertFalse(os.path.isfile(path))
+
+    def test_shared_file_is_kept_by_queryset_delete(self):
+        self.preflight(f"thumbnail/{self.thumbnail.pk}")
+        path = self.stored.file.path
+
+        Attachment.objects.filter(pk=self.stored.pk).delete()
+        self.assertTrue(os.path.isfile(path))
+        Attachment.objects.all().delete()
+        self.assertFalse(os.path.isfile(path))
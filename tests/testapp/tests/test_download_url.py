@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import clear_script_prefix, reverse, set_script_prefix
+from rest_framework.status import HTTP_200_OK, HTTP_403_FORBIDDEN
+from rest_framework.test import APIRequestFactory
+from testapp.models import PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment
+from drf_attachments.rest.serializers import AttachmentSubSerializer
+
+
+class TestDownloadURL(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.attachments = [self.create_attachment(name=f"attach{i}") for i in range(3)]
+
+    def tearDown(self):
+        clear_script_prefix()
+        super().tearDown()
+
+    def test_relative_url_matches_reverse(self):
+        data = AttachmentSubSerializer(self.attachments, many=True).data
+
+        for attachment, item in zip(self.attachments, data):
+            self.assertEqual(
+                reverse("attachment-download", kwargs={"pk": attachment.pk}),
+                item["download_url"],
+            )
+
+    def test_absolute_url_matches_build_absolute_uri(self):
+        for host in ("testserver", "other.example.com"):
+            request = APIRequestFactory().get("/", HTTP_HOST=host)
+            data = AttachmentSubSerializer(
+                self.attachments, many=True, context={"request": request}
+            ).data
+
+            for attachment, item in zip(self.attachments, data):
+                self.assertEqual(
+                    request.build_absolute_uri(
+                        reverse("attachment-download", kwargs={"pk": attachment.pk})
+                    ),
+                    item["download_url"],
+                )
+                self.assertTrue(item["download_url"].startswith(f"http://{host}/"))
+
+    def test_url_follows_script_prefix(self):
+        set_script_prefix("/prefix/")
+        data = AttachmentSubSerializer(self.attachments[0]).data
+
+        self.assertEqual(
+            f"/prefix/api/attachment/{self.attachments[0].pk}/download/",
+            data["download_url"],
+        )
+
+    @override_settings(ATTACHMENT_SIGNED_DOWNLOAD_URLS=True)
+    def test_signed_download_without_authentication(self):
+        attachment = self.attachments[0]
+        download_url = AttachmentSubSerializer(attachment).data["download_url"]
+        self.assertTrue(
+            download_url.startswith(
+                f"/api/attachment/{attachment.pk}/signed-download/?"
+            )
+        )
+
+        # no user is logged in
+        response = self.client.get(download_url)
+        self.assertEqual(HTTP_200_OK, response.status_code)
+        with DemoFile(DemoFile.JPG) as demo_file:
+            self.assertEqual(demo_file.read(), response.getvalue())
+        self.assertIn("max-age=", response["Cache-Control"])
+
+    @override_settings(ATTACHMENT_SIGNED_DOWNLOAD_URLS=True)
+    def test_signed_download_rejects_tampered_url(self):
+        download_url = AttachmentSubSerializer(self.attachments[0]).data["download_url"]
+
+        # signature of another attachment
+        response = self.client.get(
+            download_url.replace(
+                str(self.attachments[0].pk), str(self.attachments[1].pk)
+            )
+        )
+        self.assertEqual(HTTP_403_FORBIDDEN, response.status_code)
+
+        # unsigned
+        response = self.client.get(download_url.split("?")[0])
+        self.assertEqual(HTTP_403_FORBIDDEN, response.status_code)
+
+    @override_settings(
+        ATTACHMENT_SIGNED_DOWNLOAD_URLS=True, ATTACHMENT_SIGNED_DOWNLOAD_URL_MAX_AGE=60
+    )
+    def test_signed_download_expires(self):
+        download_url = AttachmentSubSerializer(self.attachments[0]).data["download_url"]
+
+        with mock.patch("drf_attachments.signing.time.time", return_value=4102444800):
+            response = self.client.get(download_url)
+        self.assertEqual(HTTP_403_FORBIDDEN, response.status_code)
+
+    def create_attachment(self, name):
+        with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+            return Attachment.objects.create(
+                name=name,
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=self.photo_album,
+                file=file,
+            )
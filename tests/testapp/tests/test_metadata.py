@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from testapp.models import PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.metadata import extract_meta
+from drf_attachments.models import Attachment
+from drf_attachments.rest.serializers import AttachmentWithMetaDataSerializer
+
+
+class TestMetadata(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+
+    def test_image_meta(self):
+        attachment = self.create_attachment(DemoFile.JPG)
+
+        self.assertEqual(429, attachment.meta["width"])
+        self.assertEqual(315, attachment.meta["height"])
+        self.assertEqual(1, attachment.meta["orientation"])
+
+    def test_pdf_meta(self):
+        attachment = self.create_attachment(DemoFile.PDF)
+
+        self.assertEqual(1, attachment.meta["page_count"])
+        self.assertNotIn("width", attachment.meta)
+
+    def test_linearized_pdf_meta(self):
+        data = b"%PDF-1.4\n1 0 obj\n<< /Linearized 1 /L 1000 /N 12 /T 900 >>\nendobj\n"
+        file = ContentFile(data, name="linearized.pdf")
+
+        self.assertEqual({"page_count": 12}, extract_meta(file, "application/pdf"))
+
+    @override_settings(ATTACHMENT_META_READ_LIMIT=16)
+    def test_bounded_read(self):
+        with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+            # the image header is not within the first 16 bytes
+            self.assertEqual({}, extract_meta(file, "image/jpeg"))
+
+    def test_skipped_for_unchanged_file(self):
+        attachment = self.create_attachment(DemoFile.JPG)
+        attachment = Attachment.objects.get(pk=attachment.pk)
+
+        with mock.patch("drf_attachments.models.models.extract_meta") as extract:
+            attachment.name = "renamed"
+            attachment.save()
+        extract.assert_not_called()
+        self.assertEqual(429, attachment.meta["width"])
+
+    def test_replaced_file(self):
+        attachment = self.create_attachment(DemoFile.JPG)
+
+        with DemoFile(DemoFile.PDF, as_django_file=True) as file:
+            attachment.file = file
+            attachment.save()
+
+        self.assertEqual(1, attachment.meta["page_count"])
+        self.assertNotIn("width", attachment.meta)
+
+    def test_serializer_fields(self):
+        image = self.create_attachment(DemoFile.JPG)
+        pdf = self.create_attachment(DemoFile.PDF)
+        context = {"request": APIRequestFactory().get("/")}
+
+        data = AttachmentWithMetaDataSerializer(image, context=context).data
+        self.assertEqual(
+            {"width": 429, "height": 315, "orientation": 1, "page_count": None},
+            {
+                key: data[key]
+                for key in ("width", "height", "orientation", "page_count")
+            },
+        )
+        data = AttachmentWithMetaDataSerializer(pdf, context=context).data
+        self.assertEqual(1, data["page_count"])
+        self.assertIsNone(data["width"])
+
+        # opt-in, the default serializer keeps its fields
+        data = self.client.get(f"/api/attachment/{image.pk}/").json()
+        self.assertNotIn("width", data)
+
+    def create_attachment(self, file_name):
+        with DemoFile(file_name, as_django_file=True) as file:
+            return Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=self.photo_album,
+                file=file,
+            )
@@ -0,0 +1,209 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from testapp.models import Diagram, PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment
+from drf_attachments.orphans import find_orphaned_files, walk_storage
+from drf_attachments.storage import link_file
+
+IMAGE_VARIANTS = {"thumbnail": {"width": 8, "height": 8, "format": "WEBP"}}
+DAY = 60 * 60 * 24
+
+
+def write_file(directory, name, age=2 * DAY):
+    path = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(b"orphan")
+    modified = time.time() - age
+    os.utime(path, (modified, modified))
+    return path
+
+
+@override_settings(ATTACHMENT_IMAGE_VARIANTS=IMAGE_VARIANTS)
+class TestOrphans(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.private_root = tempfile.mkdtemp()
+        self.storage_location = tempfile.mkdtemp()
+        for directory in (self.private_root, self.storage_location):
+            self.addCleanup(shutil.rmtree, directory)
+
+        settings_override = override_settings(PRIVATE_ROOT=self.private_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch.object(
+            Diagram.AttachmentMeta,
+            "storage_location",
+            self.storage_location,
+            create=True,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        photo_album = PhotoAlbum.objects.create(name="album1")
+        with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+            self.photo = Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=photo_album,
+                file=file,
+            )
+        with DemoFile(DemoFile.SVG, as_django_file=True) as file:
+            self.diagram = Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=Diagram.objects.create(name="diagram1"),
+                file=file,
+            )
+        for attachment in (self.photo, self.diagram):
+            os.utime(attachment.file.path, (time.time() - 2 * DAY,) * 2)
+
+        stem = os.path.splitext(self.photo.file.name)[0]
+        self.variant = write_file(self.private_root, f"{stem}.thumbnail.webp")
+        self.orphans = [
+            write_file(self.private_root, "attachments/202001/orphan.pdf"),
+            write_file(self.private_root, "attachments/202001/orphan.thumbnail.webp"),
+            # a file of the default storage is orphaned within another location
+            write_file(self.storage_location, self.photo.file.name),
+        ]
+        self.recent = write_file(
+            self.private_root, "attachments/202001/upload.pdf", age=60
+        )
+
+    def call_command(self, *args, **kwargs):
+        stdout = io.StringIO()
+        call_command(
+            "collect_attachment_orphans",
+            *args,
+            batch_size=2,
+            workers=2,
+            stdout=stdout,
+            **kwargs,
+        )
+        return stdout.getvalue()
+
+    def test_walk_storage(self):
+        storage = self.photo.file.storage
+        self.assertEqual(
+            {
+                self.photo.file.name,
+                os.path.relpath(self.variant, self.private_root),
+                "attachments/202001/orphan.pdf",
+                "attachments/202001/orphan.thumbnail.webp",
+            },
+            set(walk_storage(storage, older_than=time.time() - DAY)),
+        )
+
+    def test_linked_files_are_recent(self):
+        storage = self.diagram.file.storage
+        name = link_file(self.photo.file.storage, self.photo.file.name, storage)
+
+        # not referenced yet (e.g. by a reassigned Attachment), but not collected either
+        self.assertNotIn(name, set(walk_storage(storage, older_than=time.time() - DAY)))
+
+    def test_find_orphaned_files(self):
+        storage = self.photo.file.storage
+        # one query for the files and one for the originals of the image variants
+        with self.assertNumQueries(2):
+            batches = list(
+                find_orphaned_files(
+                    storage,
+                    Q(volume=""),
+                    older_than=time.time() - DAY,
+                    batch_size=10,
+                )
+            )
+        self.assertEqual(
+            [
+                [
+                    "attachments/202001/orphan.pdf",
+                    "attachments/202001/orphan.thumbnail.webp",
+                ]
+            ],
+            [sorted(batch) for batch in batches],
+        )
+
+    @override_settings(
+        ATTACHMENT_IMAGE_VARIANTS={**IMAGE_VARIANTS, "small": {"width": 16}}
+    )
+    def test_find_orphaned_variants(self):
+        storage = self.photo.file.storage
+        stem = os.path.splitext(self.photo.file.name)[0]
+        write_file(self.private_root, f"{stem}.small.jpg")
+        orphans = [
+            f"attachments/202001/orphan{i}.{variant}"
+            for i in range(3)
+            for variant in ("small.jpg", "thumbnail.webp")
+        ]
+        for name in orphans:
+            write_file(self.private_root, name)
+
+        # originals in the same format by name, the others by prefix (in batches of 2 stems)
+        with mock.patch("drf_attachments.orphans.VARIANT_STEM_BATCH_SIZE", 2):
+            with self.assertNumQueries(3):
+                (batch,) = find_orphaned_files(
+                    storage,
+                    Q(volume=""),
+                    older_than=time.time() - DAY,
+                    batch_size=20,
+                )
+
+        self.assertEqual(
+            sorted(
+                orphans
+                + [
+                    "attachments/202001/orphan.pdf",
+                    "attachments/202001/orphan.thumbnail.webp",
+                ]
+            ),
+            sorted(batch),
+        )
+
+    def test_collect_orphans(self):
+        output = self.call_command()
+
+        self.assertIn("Deleted 3 orphaned files.", output)
+        for path in self.orphans:
+            self.assertFalse(os.path.exists(path))
+        for path in (self.photo.file.path, self.diagram.file.path, self.variant):
+            self.assertTrue(os.path.isfile(path))
+        # files younger than --min-age are kept
+        self.assertTrue(os.path.isfile(self.recent))
+
+    def test_dry_run(self):
+        output = self.call_command(dry_run=True, verbosity=2)
+
+        self.assertIn("Found 3 orphaned files.", output)
+        self.assertIn("Orphaned file: attachments/202001/orphan.pdf", output)
+        for path in self.orphans:
+            self.assertTrue(os.path.isfile(path))
+
+    def test_min_age(self):
+        output = self.call_command(min_age=0)
+        self.assertIn("Deleted 4 orphaned files.", output)
+        self.assertFalse(os.path.exists(self.recent))
+
+    def test_missing_files(self):
+        os.remove(self.diagram.file.path)
+        Attachment.objects.filter(pk=self.diagram.pk).update(
+            creation_date=self.diagram.creation_date.replace(year=2020)
+        )
+
+        output = self.call_command(rows=True, dry_run=True)
+        self.assertIn("Found 1 attachments with missing files.", output)
+        self.assertTrue(Attachment.objects.filter(pk=self.diagram.pk).exists())
+
+        output = self.call_command(rows=True)
+        self.assertIn("Deleted 1 attachments with missing files.", output)
+        self.assertEqual(
+            [self.photo.pk], list(Attachment.objects.values_list("pk", flat=True))
+        )
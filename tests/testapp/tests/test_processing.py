@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+from testapp.models import PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment
+from drf_attachments.processing import ProcessingStage, processing_executor
+
+processed = []
+
+
+class RecordingStage(ProcessingStage):
+    name = "recording"
+
+    def is_required(self, attachment):
+        return attachment.get_extension() == ".jpg"
+
+    def process(self, attachment):
+        processed.append(attachment.pk)
+
+
+class FailingStage(ProcessingStage):
+    name = "failing"
+
+    def process(self, attachment):
+        raise ValueError("broken file")
+
+
+RECORDING_STAGE = "testapp.tests.test_processing.RecordingStage"
+FAILING_STAGE = "testapp.tests.test_processing.FailingStage"
+
+
+@override_settings(
+    ATTACHMENT_PROCESSING_STAGES=[RECORDING_STAGE],
+    ATTACHMENT_PROCESSING_EXECUTOR="sync",
+)
+class TestProcessing(TestCase):
+    def setUp(self):
+        super().setUp()
+        processed.clear()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+
+    def test_processed_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            attachment = create_attachment(self.photo_album, DemoFile.JPG)
+        self.assertEqual("pending", attachment.processing_status)
+        self.assertEqual([], processed)
+
+        for callback in callbacks:
+            callback()
+
+        attachment.refresh_from_db()
+        self.assertEqual("ready", attachment.processing_status)
+        self.assertEqual([attachment.pk], processed)
+
+    def test_no_required_stages(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            attachment = create_attachment(self.photo_album, DemoFile.PDF)
+
+        self.assertEqual("ready", attachment.processing_status)
+        self.assertEqual([], callbacks)
+
+    def test_unchanged_file_is_not_processed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = create_attachment(self.photo_album, DemoFile.JPG)
+        attachment.refresh_from_db()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            attachment.name = "renamed"
+            attachment.save()
+
+        self.assertEqual([], callbacks)
+        self.assertEqual("ready", attachment.processing_status)
+
+    @override_settings(ATTACHMENT_PROCESSING_STAGES=[FAILING_STAGE, RECORDING_STAGE])
+    def test_failed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = create_attachment(self.photo_album, DemoFile.JPG)
+
+        attachment.refresh_from_db()
+        self.assertEqual("failed", attachment.processing_status)
+        self.assertEqual("failing: broken file", attachment.meta["processing_error"])
+        # the following stages are skipped
+        self.assertEqual([], processed)
+
+    def test_api(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            attachment = create_attachment(self.photo_album, DemoFile.JPG)
+
+        response = self.client.get(f"/api/attachment/{attachment.pk}/")
+        self.assertEqual("pending", response.json()["processing_status"])
+
+        for callback in callbacks:
+            callback()
+
+        response = self.client.get(f"/api/attachment/{attachment.pk}/")
+        self.assertEqual("ready", response.json()["processing_status"])
+
+
+@override_settings(ATTACHMENT_PROCESSING_STAGES=[RECORDING_STAGE])
+class TestProcessingThreadPool(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        processed.clear()
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+
+    def test_processed_in_worker_thread(self):
+        attachment = create_attachment(self.photo_album, DemoFile.JPG)
+
+        processing_executor.wait(timeout=10)
+
+        attachment.refresh_from_db()
+        self.assertEqual("ready", attachment.processing_status)
+        self.assertEqual([attachment.pk], processed)
+
+
+def create_attachment(content_object, file_name):
+    with DemoFile(file_name, as_django_file=True) as file:
+        return Attachment.objects.create(
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+            content_object=content_object,
+            file=file,
+        )
@@ -0,0 +1,243 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase, override_settings
+from testapp.models import PhotoAlbum, Report
+from testapp.serializers import PhotoAlbumSerializer
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment
+from drf_attachments.models.annotations import annotate_attachment_stats
+from drf_attachments.models.prefetch import prefetch_attachments
+
+
+class TestPrefetchAttachments(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.photo_albums = [
+            PhotoAlbum.objects.create(name=f"album{i}") for i in range(3)
+        ]
+        for photo_album in self.photo_albums:
+            for i, context in enumerate(
+                [
+                    settings.ATTACHMENT_CONTEXT_WORK_PHOTO,
+                    settings.ATTACHMENT_CONTEXT_VACATION_PHOTO,
+                    settings.ATTACHMENT_CONTEXT_VACATION_PHOTO,
+                ]
+            ):
+                self.create_attachment(f"{photo_album.pk}-{i}", context, photo_album)
+
+    def test_nested_attachments_with_single_query(self):
+        queryset = PhotoAlbum.objects.order_by("name").prefetch_related(
+            prefetch_attachments()
+        )
+
+        # one query for the photo albums, one for all of their attachments
+        with self.assertNumQueries(2):
+            data = PhotoAlbumSerializer(queryset, many=True).data
+
+        self.assertEqual(3, len(data))
+        self.assertEqual(
+            ["album0-0", "album0-1", "album0-2"],
+            [attachment["name"] for attachment in data[0]["attachments"]],
+        )
+
+    def test_filter_by_context(self):
+        queryset = PhotoAlbum.objects.prefetch_related(
+            prefetch_attachments(contexts=settings.ATTACHMENT_CONTEXT_VACATION_PHOTO)
+        )
+
+        with self.assertNumQueries(2):
+            for photo_album in queryset:
+                self.assertEqual(
+                    {settings.ATTACHMENT_CONTEXT_VACATION_PHOTO},
+                    {
+                        attachment.context
+                        for attachment in photo_album.attachments.all()
+                    },
+                )
+
+    def test_limit_newest_per_parent(self):
+        queryset = PhotoAlbum.objects.order_by("name").prefetch_related(
+            prefetch_attachments(limit=2)
+        )
+
+        with self.assertNumQueries(2):
+            photo_albums = list(queryset)
+            for photo_album in photo_albums:
+                self.assertEqual(
+                    [f"{photo_album.pk}-2", f"{photo_album.pk}-1"],
+                    [attachment.name for attachment in photo_album.attachments.all()],
+                )
+
+    def test_attachments_by_context(self):
+        queryset = PhotoAlbum.objects.prefetch_related(prefetch_attachments())
+
+        with self.assertNumQueries(2):
+            for photo_album in queryset:
+                attachments_by_context = photo_album.attachments_by_context
+                self.assertEqual(
+                    1,
+                    len(attachments_by_context[settings.ATTACHMENT_CONTEXT_WORK_PHOTO]),
+                )
+                self.assertEqual(
+                    2,
+                    len(
+                        attachments_by_context[
+                            settings.ATTACHMENT_CONTEXT_VACATION_PHOTO
+                        ]
+                    ),
+                )
+
+    @staticmethod
+    def create_attachment(name, context, content_object):
+        with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+            return Attachment.objects.create(
+                name=name,
+                context=context,
+                content_object=content_object,
+                file=file,
+            )
+
+
+class TestAttachmentStatsAnnotations(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.empty_photo_album = PhotoAlbum.objects.create(name="album2")
+        self.attachments = [
+            self.create_attachment(context, file_name)
+            for context, file_name in [
+                (settings.ATTACHMENT_CONTEXT_WORK_PHOTO, DemoFile.JPG),
+                (settings.ATTACHMENT_CONTEXT_VACATION_PHOTO, DemoFile.JPG),
+                (settings.ATTACHMENT_CONTEXT_VACATION_PHOTO, DemoFile.PDF),
+            ]
+        ]
+
+    def test_annotations(self):
+        with self.assertNumQueries(1):
+            photo_albums = list(
+                annotate_attachment_stats(PhotoAlbum.objects.order_by("name"))
+            )
+
+        self.assertEqual(3, photo_albums[0].attachment_count)
+        self.assertEqual(
+            sum(attachment.get_size() for attachment in self.attachments),
+            photo_albums[0].attachment_total_size,
+        )
+        self.assertEqual(
+            max(attachment.creation_date for attachment in self.attachments),
+            photo_albums[0].attachment_latest_upload,
+        )
+
+        self.assertEqual(0, photo_albums[1].attachment_count)
+        self.assertEqual(0, photo_albums[1].attachment_total_size)
+        self.assertIsNone(photo_albums[1].attachment_latest_upload)
+
+    def test_annotations_by_context(self):
+        photo_album = annotate_attachment_stats(
+            PhotoAlbum.objects.filter(pk=self.photo_album.pk),
+            contexts=[settings.ATTACHMENT_CONTEXT_WORK_PHOTO],
+            latest_upload=None,
+        ).get()
+
+        self.assertEqual(1, photo_album.attachment_count)
+        self.assertEqual(
+            self.attachments[0].get_size(), photo_album.attachment_total_size
+        )
+        self.assertFalse(hasattr(photo_album, "attachment_latest_upload"))
+
+    def test_annotations_of_integer_primary_keys(self):
+        user = User.objects.create(username="user")
+        Attachment.objects.filter(pk=self.attachments[0].pk).update(
+            content_type=ContentType.objects.get_for_model(User), object_id=str(user.pk)
+        )
+
+        user = annotate_attachment_stats(User.objects.filter(pk=user.pk)).get()
+        self.assertEqual(1, user.attachment_count)
+
+    def test_annotations_of_uuid_primary_keys(self):
+        report = Report.objects.create(name="report1")
+        Attachment.objects.filter(pk=self.attachments[2].pk).update(
+            content_type=ContentType.objects.get_for_model(Report),
+            object_id=str(report.pk),
+        )
+
+        report = annotate_attachment_stats(Report.objects.all()).get()
+        self.assertEqual(1, report.attachment_count)
+        self.assertEqual(self.attachments[2].get_size(), report.attachment_total_size)
+
+    def create_attachment(self, context, file_name):
+        with DemoFile(file_name, as_django_file=True) as file:
+            return Attachment.objects.create(
+                context=context,
+                content_object=self.photo_album,
+                file=file,
+            )
+
+
+class TestBulkDelete(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage_location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_location)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+
+    @override_settings(ATTACHMENT_DELETE_BATCH_SIZE=2)
+    def test_delete_in_batches(self):
+        attachments = [self.create_attachment(self.photo_album) for _ in range(5)]
+        file_paths = [attachment.file.path for attachment in attachments]
+        self.assertTrue(all(os.path.isfile(file_path) for file_path in file_paths))
+
+        with mock.patch.object(
+            FileSystemStorage,
+            "delete",
+            autospec=True,
+            side_effect=FileSystemStorage.delete,
+        ) as delete_mock:
+            result = Attachment.objects.all().delete()
+
+        self.assertEqual((5, {"drf_attachments.Attachment": 5}), result)
+        self.assertEqual(0, Attachment.objects.count())
+        # every file is removed exactly once
+        self.assertEqual(5, delete_mock.call_count)
+        self.assertFalse(any(os.path.isfile(file_path) for file_path in file_paths))
+
+    def test_delete_removes_files_of_custom_storage_location(self):
+        with mock.patch.object(
+            PhotoAlbum.AttachmentMeta,
+            "storage_location",
+            self.storage_location,
+            create=True,
+        ):
+            attachment = self.create_attachment(self.photo_album)
+            file_path = os.path.join(self.storage_location, attachment.file.name)
+            self.assertTrue(os.path.isfile(file_path))
+
+            Attachment.objects.filter(pk=attachment.pk).delete()
+
+        self.assertFalse(os.path.isfile(file_path))
+
+    def test_delete_only_affects_filtered_attachments(self):
+        kept = self.create_attachment(self.photo_album)
+        deleted = self.create_attachment(self.photo_album)
+
+        Attachment.objects.filter(pk=deleted.pk).delete()
+
+        self.assertEqual([kept], list(Attachment.objects.all()))
+        self.assertTrue(os.path.isfile(kept.file.path))
+
+    @staticmethod
+    def create_attachment(content_object):
+        with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+            return Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=content_object,
+                file=file,
+            )
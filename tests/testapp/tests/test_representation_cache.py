@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from testapp.models import PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment
+from drf_attachments.rest.cache import representation_cache
+from drf_attachments.rest.serializers import AttachmentSubSerializer
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+
+@override_settings(CACHES=CACHES, ATTACHMENT_REPRESENTATION_CACHE="default")
+class TestRepresentationCache(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.attachments = [self.create_attachment(name=f"attach{i}") for i in range(3)]
+        representation_cache.cache.clear()
+        representation_cache.reset_stats()
+
+    def test_unchanged_attachments_are_served_from_cache(self):
+        uncached_data = AttachmentSubSerializer(self.attachments, many=True).data
+        self.assertEqual({"hits": 0, "misses": 3}, representation_cache.stats())
+
+        cached_data = AttachmentSubSerializer(self.attachments, many=True).data
+        self.assertEqual({"hits": 3, "misses": 3}, representation_cache.stats())
+        self.assertEqual(uncached_data, cached_data)
+        self.assertEqual(list(uncached_data[0].keys()), list(cached_data[0].keys()))
+
+    def test_list_looks_up_the_cache_once(self):
+        cache = representation_cache.cache
+        with mock.patch.object(cache, "get", wraps=cache.get) as get:
+            with mock.patch.object(cache, "get_many", wraps=cache.get_many) as get_many:
+                AttachmentSubSerializer(self.attachments, many=True).data
+
+        # the missing entries are not looked up again one by one (get_many() of the local memory cache reads each
+        # key via get())
+        get_many.assert_called_once()
+        self.assertEqual(len(self.attachments), get.call_count)
+
+    def test_changed_attachment_is_serialized_again(self):
+        AttachmentSubSerializer(self.attachments, many=True).data
+
+        attachment = self.attachments[0]
+        attachment.name = "renamed"
+        attachment.save()
+
+        data = AttachmentSubSerializer(self.attachments, many=True).data
+        self.assertEqual("renamed", data[0]["name"])
+        self.assertEqual({"hits": 2, "misses": 4}, representation_cache.stats())
+
+    def test_deleted_attachment_is_invalidated(self):
+        attachment = self.attachments[0]
+        AttachmentSubSerializer(attachment).data
+        key = representation_cache.get_key(attachment.pk)
+        self.assertIsNotNone(representation_cache.cache.get(key))
+
+        attachment.delete()
+        self.assertIsNone(representation_cache.cache.get(key))
+
+    def test_nested_list_endpoint(self):
+        first_response = self.client.get(f"/api/photo_album/{self.photo_album.pk}/")
+        second_response = self.client.get(f"/api/photo_album/{self.photo_album.pk}/")
+
+        self.assertEqual(first_response.json(), second_response.json())
+        self.assertEqual({"hits": 3, "misses": 3}, representation_cache.stats())
+
+    def create_attachment(self, name):
+        with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+            return Attachment.objects.create(
+                name=name,
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=self.photo_album,
+                file=file,
+            )
@@ -0,0 +1,141 @@
+import os
+import socketserver
+import struct
+import tempfile
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from testapp.models import File
+
+from drf_attachments.models import Attachment
+from drf_attachments.scanning import ClamdScanner, FakeScanner, get_scanner
+
+
+@override_settings(
+    ATTACHMENT_SCANNER="drf_attachments.scanning.FakeScanner",
+    ATTACHMENT_PROCESSING_EXECUTOR="sync",
+)
+class TestScanning(TestCase):
+    def setUp(self):
+        super().setUp()
+        get_scanner().scanned = 0
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+
+    def test_clean_file(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            attachment = self.create_attachment(b"harmless content")
+        self.assertEqual("pending", attachment.scan_status)
+
+        # quarantined until scanned
+        response = self.client.get(f"/api/attachment/{attachment.pk}/download/")
+        self.assertEqual(403, response.status_code)
+
+        for callback in callbacks:
+            callback()
+
+        attachment.refresh_from_db()
+        self.assertEqual("clean", attachment.scan_status)
+        self.assertEqual("ready", attachment.processing_status)
+        self.assertEqual(64, len(attachment.content_hash))
+        response = self.client.get(f"/api/attachment/{attachment.pk}/download/")
+        self.assertEqual(200, response.status_code)
+
+    def test_infected_file(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = self.create_attachment(FakeScanner.EICAR)
+
+        attachment.refresh_from_db()
+        self.assertEqual("infected", attachment.scan_status)
+        self.assertEqual("failed", attachment.processing_status)
+        self.assertIn("Eicar-Test-Signature", attachment.meta["processing_error"])
+        response = self.client.get(f"/api/attachment/{attachment.pk}/download/")
+        self.assertEqual(403, response.status_code)
+        response = self.client.get(
+            f"/admin/drf_attachments/attachment/{attachment.pk}/download/"
+        )
+        self.assertEqual(403, response.status_code)
+
+    def test_result_cached_by_content_hash(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.create_attachment(b"same content")
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.create_attachment(b"same content")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_attachment(b"other content")
+
+        self.assertEqual(2, get_scanner().scanned)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual("clean", second.scan_status)
+        self.assertEqual(first.content_hash, second.content_hash)
+
+    @override_settings(ATTACHMENT_SCANNER=None)
+    def test_disabled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = self.create_attachment(FakeScanner.EICAR)
+
+        attachment.refresh_from_db()
+        self.assertEqual("", attachment.scan_status)
+        response = self.client.get(f"/api/attachment/{attachment.pk}/download/")
+        self.assertEqual(200, response.status_code)
+
+    @staticmethod
+    def create_attachment(content):
+        file = File.objects.create(name=f"file{File.objects.count()}")
+        return Attachment.objects.create(
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+            content_object=file,
+            # File attachments must have at least 1000 bytes
+            file=ContentFile(content.ljust(2000, b" "), name="file.txt"),
+        )
+
+
+class FakeClamdHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        assert self.request.recv(10) == b"zINSTREAM\0"
+        data = b""
+        while True:
+            (length,) = struct.unpack("!L", self.recv_exactly(4))
+            if not length:
+                break
+            data += self.recv_exactly(length)
+
+        if FakeScanner.EICAR in data:
+            self.request.sendall(b"stream: Eicar-Signature FOUND\0")
+        else:
+            self.request.sendall(b"stream: OK\0")
+
+    def recv_exactly(self, length):
+        data = b""
+        while len(data) < length:
+            data += self.request.recv(length - len(data))
+        return data
+
+
+class TestClamdScanner(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.socket_path = os.path.join(directory.name, "clamd.sock")
+
+        server = socketserver.ThreadingUnixStreamServer(
+            self.socket_path, FakeClamdHandler
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+    def test_scan(self):
+        scanner = ClamdScanner(socket_path=self.socket_path)
+
+        result = scanner.scan([b"harmless ", b"content"])
+        self.assertTrue(result.clean)
+
+        result = scanner.scan([b"prefix", FakeScanner.EICAR])
+        self.assertFalse(result.clean)
+        self.assertEqual("Eicar-Signature", result.signature)
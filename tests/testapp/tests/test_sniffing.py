@@ -0,0 +1,118 @@
+import gzip
+import io
+import os
+import threading
+import zipfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.sniffing import get_magic, sniff_mime_type
+from drf_attachments.utils import get_mime_type
+
+
+def image(image_format):
+    output = io.BytesIO()
+    Image.new("RGB", (8, 8), "orange").save(output, format=image_format)
+    return output.getvalue()
+
+
+def zip_file(*entries, compression=zipfile.ZIP_DEFLATED):
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w") as archive:
+        for name, content in entries:
+            archive.writestr(name, content, compress_type=compression)
+    return output.getvalue()
+
+
+def docx(padding=0):
+    return zip_file(
+        ("[Content_Types].xml", "<Types/>"),
+        ("_rels/.rels", os.urandom(padding)),
+        ("word/document.xml", "<document/>"),
+    )
+
+
+class TestSniffing(SimpleTestCase):
+    def samples(self):
+        samples = {
+            "png": image("PNG"),
+            "gif": image("GIF"),
+            "webp": image("WEBP"),
+            "gzip": gzip.compress(b"attachment"),
+            "docx": docx(),
+            "xlsx": zip_file(
+                ("[Content_Types].xml", "<Types/>"),
+                ("_rels/.rels", "<Relationships/>"),
+                ("xl/workbook.xml", "<workbook/>"),
+            ),
+            "odt": zip_file(
+                ("mimetype", "application/vnd.oasis.opendocument.text"),
+                ("content.xml", "<content/>"),
+                compression=zipfile.ZIP_STORED,
+            ),
+            "svg": b'<?xml version="1.0"?>\n<!-- icon -->\n<svg xmlns="http://www.w3.org/2000/svg"/>',
+        }
+        for file_name in (DemoFile.JPG, DemoFile.PDF, DemoFile.SVG):
+            with open(os.path.join(DemoFile.DIRECTORY, file_name), "rb") as file:
+                samples[file_name] = file.read()
+        return samples
+
+    def test_signatures_match_libmagic(self):
+        for name, data in self.samples().items():
+            with self.subTest(name):
+                mime_type = sniff_mime_type(data[: 64 * 1024])
+                self.assertIsNotNone(mime_type)
+                self.assertEqual(get_magic().from_buffer(data), mime_type)
+
+    def test_unknown_types_fall_back_to_libmagic(self):
+        for data, mime_type in (
+            (b"plain text", "text/plain"),
+            (b'<?xml version="1.0"?><root/>', "text/xml"),
+            (zip_file(("readme.txt", "text")), "application/zip"),
+            # a zip can't claim an arbitrary mime type by its mimetype entry
+            (
+                zip_file(
+                    ("mimetype", "image/png"),
+                    ("readme.txt", "text"),
+                    compression=zipfile.ZIP_STORED,
+                ),
+                "application/zip",
+            ),
+            (b"", "application/x-empty"),
+        ):
+            with self.subTest(mime_type):
+                self.assertIsNone(sniff_mime_type(data))
+                self.assertEqual(mime_type, get_mime_type(ContentFile(data)))
+
+    def test_get_mime_type_skips_libmagic(self):
+        with mock.patch("drf_attachments.utils.get_magic") as get_magic_mock:
+            file = ContentFile(self.samples()[DemoFile.JPG])
+            file.seek(10)
+            self.assertEqual("image/jpeg", get_mime_type(file))
+
+        get_magic_mock.assert_not_called()
+        # the position of the file is kept
+        self.assertEqual(10, file.tell())
+
+    def test_sniff_window(self):
+        data = docx(padding=4000)
+        self.assertEqual(
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            get_mime_type(ContentFile(data)),
+        )
+
+        with override_settings(ATTACHMENT_MIME_SNIFF_WINDOW=1024):
+            self.assertEqual("application/zip", get_mime_type(ContentFile(data)))
+
+    def test_magic_handle_per_thread(self):
+        handles = []
+        thread = threading.Thread(target=lambda: handles.append(get_magic()))
+        thread.start()
+        thread.join()
+
+        self.assertIs(get_magic(), get_magic())
+        self.assertIsNot(get_magic(), handles[0])
@@ -0,0 +1,109 @@
+import os
+from datetime import timedelta
+from functools import partial
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.status import HTTP_204_NO_CONTENT, HTTP_404_NOT_FOUND
+from testapp.models import File, PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment, AttachmentUsage
+
+
+@override_settings(ATTACHMENT_SOFT_DELETE=True)
+class TestSoftDelete(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+
+    def test_delete_via_api_is_soft(self):
+        attachment = self.create_attachment(self.photo_album, DemoFile.JPG)
+
+        response = self.client.delete(f"/api/attachment/{attachment.pk}/")
+        self.assertEqual(HTTP_204_NO_CONTENT, response.status_code, response.content)
+
+        # hidden from the API and the related manager, but the row and file are kept
+        response = self.client.get(f"/api/attachment/{attachment.pk}/")
+        self.assertEqual(HTTP_404_NOT_FOUND, response.status_code, response.content)
+        self.assertEqual(0, self.photo_album.attachments.count())
+        self.assertTrue(Attachment.all_objects.get(pk=attachment.pk).is_deleted)
+        self.assertTrue(os.path.isfile(attachment.file.path))
+
+    def test_restore(self):
+        attachment = self.create_attachment(self.photo_album, DemoFile.JPG)
+        attachment.delete()
+
+        self.assertEqual(1, Attachment.all_objects.filter(pk=attachment.pk).restore())
+        self.assertEqual([attachment], list(self.photo_album.attachments.all()))
+
+    @override_settings(ATTACHMENT_USAGE_TRACKING=True)
+    def test_save_soft_deleted(self):
+        attachment = self.create_attachment(self.photo_album, DemoFile.JPG)
+        attachment.delete()
+        content_type = ContentType.objects.get_for_model(PhotoAlbum)
+        usage = partial(
+            AttachmentUsage.objects.get_usage, content_type.pk, self.photo_album.pk
+        )
+        self.assertEqual((0, 0), usage())
+
+        # e.g. edited in the admin, which lists soft-deleted attachments as well
+        attachment = Attachment.all_objects.get(pk=attachment.pk)
+        attachment.name = "renamed"
+        attachment.save()
+        self.assertEqual((0, 0), usage())
+
+        Attachment.all_objects.filter(pk=attachment.pk).restore()
+        self.assertEqual((1, attachment.get_size()), usage())
+
+    def test_attachments_of_deleted_content_object_are_soft_deleted(self):
+        file = File.objects.create(name="file1")
+        attachment = self.create_attachment(file, DemoFile.PDF)
+
+        response = self.client.delete(f"/api/file/{file.pk}/")
+        self.assertEqual(HTTP_204_NO_CONTENT, response.status_code, response.content)
+
+        self.assertEqual(0, Attachment.objects.count())
+        self.assertTrue(Attachment.all_objects.get(pk=attachment.pk).is_deleted)
+        self.assertTrue(os.path.isfile(attachment.file.path))
+
+    def test_purge_command(self):
+        expired = self.create_attachment(self.photo_album, DemoFile.JPG)
+        recent = self.create_attachment(self.photo_album, DemoFile.JPG)
+        kept = self.create_attachment(self.photo_album, DemoFile.JPG)
+        Attachment.objects.filter(pk=expired.pk).soft_delete(
+            deleted_at=timezone.now() - timedelta(days=2)
+        )
+        recent.delete()
+
+        call_command("purge_attachments", stdout=mock.MagicMock())
+
+        self.assertEqual(
+            {recent.pk, kept.pk},
+            set(Attachment.all_objects.values_list("pk", flat=True)),
+        )
+        self.assertFalse(os.path.isfile(expired.file.path))
+        self.assertTrue(os.path.isfile(recent.file.path))
+
+    def test_hard_delete(self):
+        attachment = self.create_attachment(self.photo_album, DemoFile.JPG)
+        attachment.delete(hard=True)
+
+        self.assertFalse(Attachment.all_objects.exists())
+        self.assertFalse(os.path.isfile(attachment.file.path))
+
+    @staticmethod
+    def create_attachment(content_object, file_name):
+        with DemoFile(file_name, as_django_file=True) as file:
+            return Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=content_object,
+                file=file,
+            )
@@ -0,0 +1,252 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.status import HTTP_201_CREATED
+from testapp.models import Diagram, PhotoAlbum, Thumbnail
+from testapp.storage import InMemoryObjectStorage
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment
+from drf_attachments.storage import get_attachment_storage, get_volume_storage
+
+
+class TestStorageLocations(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.storage_location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_location)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.diagram = Diagram.objects.create(name="diagram1")
+
+        patcher = mock.patch.object(
+            PhotoAlbum.AttachmentMeta,
+            "storage_location",
+            self.storage_location,
+            create=True,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_storage_per_location(self):
+        photo = self.create_attachment(self.photo_album, DemoFile.JPG)
+        diagram = self.create_attachment(self.diagram, DemoFile.SVG)
+
+        self.assertEqual(
+            os.path.join(self.storage_location, photo.file.name), photo.file.path
+        )
+        self.assertTrue(os.path.isfile(photo.file.path))
+        self.assertEqual(
+            os.path.abspath(os.path.join(settings.PRIVATE_ROOT, diagram.file.name)),
+            diagram.file.path,
+        )
+        self.assertTrue(os.path.isfile(diagram.file.path))
+
+        # the storage instances are shared per location, the field's storage is never altered
+        self.assertIs(get_attachment_storage(PhotoAlbum), photo.file.storage)
+        self.assertIs(get_attachment_storage(Diagram), diagram.file.storage)
+        self.assertEqual(
+            os.path.abspath(settings.PRIVATE_ROOT),
+            Attachment._meta.get_field("file").storage.location,
+        )
+
+        # the storage is resolved when reading from the database as well
+        self.assertEqual(photo.file.path, Attachment.objects.get(pk=photo.pk).file.path)
+
+    def test_download_from_custom_location(self):
+        photo = self.create_attachment(self.photo_album, DemoFile.JPG)
+
+        response = self.client.get(f"/api/attachment/{photo.pk}/download/")
+
+        with DemoFile(DemoFile.JPG) as demo_file:
+            self.assertEqual(demo_file.read(), response.getvalue())
+
+    @staticmethod
+    def create_attachment(content_object, file_name):
+        with DemoFile(file_name, as_django_file=True) as file:
+            return Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=content_object,
+                file=file,
+            )
+
+
+@override_settings(ATTACHMENT_STORAGE_CLASS="testapp.storage.InMemoryObjectStorage")
+class TestObjectStorage(TestCase):
+    def setUp(self):
+        super().setUp()
+        InMemoryObjectStorage.reset()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.thumbnail = Thumbnail.objects.create(name="thumbnail1")
+
+    def test_upload_and_download(self):
+        with DemoFile(DemoFile.JPG) as file:
+            response = self.client.post(
+                path="/api/attachment/",
+                data={
+                    "name": "My Attachment",
+                    "context": settings.ATTACHMENT_DEFAULT_CONTEXT,
+                    "content_object": f"http://any.domain/api/photo_album/{self.photo_album.pk}/",
+                    "file": file,
+                },
+            )
+        self.assertEqual(HTTP_201_CREATED, response.status_code, response.content)
+
+        attachment = Attachment.objects.get()
+        self.assertIsInstance(attachment.file.storage, InMemoryObjectStorage)
+        self.assertTrue(attachment.file.storage.exists(attachment.file.name))
+        self.assertEqual(24_819, attachment.get_size())
+
+        response = self.client.get(f"/api/attachment/{attachment.pk}/download/")
+        with DemoFile(DemoFile.JPG) as demo_file:
+            self.assertEqual(demo_file.read(), response.getvalue())
+
+    @override_settings(ATTACHMENT_DELETE_BATCH_SIZE=2)
+    def test_bulk_delete_uses_delete_many(self):
+        attachments = [
+            self.create_attachment(self.photo_album, DemoFile.JPG) for _ in range(3)
+        ]
+
+        Attachment.objects.all().delete()
+
+        self.assertEqual(
+            [2, 1], [len(names) for names in InMemoryObjectStorage.delete_many_calls]
+        )
+        storage = attachments[0].file.storage
+        self.assertFalse(
+            any(storage.exists(attachment.file.name) for attachment in attachments)
+        )
+
+    def test_replaced_file_is_deleted(self):
+        first = self.create_attachment(self.thumbnail, DemoFile.JPG)
+        self.create_attachment(self.thumbnail, DemoFile.JPG)
+
+        self.assertEqual(1, Attachment.objects.count())
+        self.assertFalse(first.file.storage.exists(first.file.name))
+
+    @staticmethod
+    def create_attachment(content_object, file_name):
+        with DemoFile(file_name, as_django_file=True) as file:
+            return Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=content_object,
+                file=file,
+            )
+
+
+class TestStorageVolumes(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.locations = {}
+        for name in ("a", "b"):
+            self.locations[name] = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, self.locations[name])
+
+    def volumes(self, a=None, b=None):
+        return {
+            "a": {"location": self.locations["a"], **(a or {})},
+            "b": {"location": self.locations["b"], **(b or {})},
+        }
+
+    def test_placement_by_free_space(self):
+        # volume "a" is (almost) full
+        with override_settings(
+            ATTACHMENT_STORAGE_VOLUMES=self.volumes(a={"capacity": 1000})
+        ):
+            for _ in range(3):
+                attachment = self.create_attachment(DemoFile.JPG)
+                self.assertEqual("b", attachment.volume)
+                self.assertEqual(
+                    os.path.join(self.locations["b"], attachment.file.name),
+                    attachment.file.path,
+                )
+                self.assertTrue(os.path.isfile(attachment.file.path))
+
+    def test_placement_by_weight(self):
+        with override_settings(
+            ATTACHMENT_STORAGE_VOLUMES=self.volumes(b={"weight": 0})
+        ):
+            attachment = self.create_attachment(DemoFile.JPG)
+
+        self.assertEqual("a", attachment.volume)
+
+    def test_placement_by_capacity(self):
+        volumes = self.volumes(a={"capacity": 30_000}, b={"capacity": 30_000})
+        with override_settings(ATTACHMENT_STORAGE_VOLUMES=volumes):
+            first = self.create_attachment(DemoFile.JPG)
+            second = self.create_attachment(DemoFile.JPG)
+
+            # the capacity of both volumes is used up
+            with self.assertRaises(ValidationError):
+                self.create_attachment(DemoFile.JPG)
+
+        self.assertEqual({"a", "b"}, {first.volume, second.volume})
+
+    def test_download_and_delete(self):
+        with override_settings(
+            ATTACHMENT_STORAGE_VOLUMES=self.volumes(a={"weight": 0})
+        ):
+            attachment = self.create_attachment(DemoFile.JPG)
+            path = attachment.file.path
+
+            # the storage is resolved from the stored volume
+            attachment = Attachment.objects.get(pk=attachment.pk)
+            self.assertIs(get_volume_storage("b"), attachment.file.storage)
+
+            response = self.client.get(f"/api/attachment/{attachment.pk}/download/")
+            with DemoFile(DemoFile.JPG) as demo_file:
+                self.assertEqual(demo_file.read(), response.getvalue())
+
+            Attachment.objects.all().delete()
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_rebalance(self):
+        with override_settings(
+            ATTACHMENT_STORAGE_VOLUMES=self.volumes(b={"weight": 0})
+        ):
+            old_paths = [
+                self.create_attachment(DemoFile.JPG).file.path for _ in range(3)
+            ]
+        old_paths.append(self.create_attachment(DemoFile.JPG).file.path)
+
+        # drain volume "a" (and the default storage) into volume "b"
+        with override_settings(
+            ATTACHMENT_STORAGE_VOLUMES=self.volumes(a={"weight": 0})
+        ):
+            call_command(
+                "rebalance_attachment_volumes",
+                unassigned=True,
+                batch_size=2,
+                workers=2,
+                stdout=open(os.devnull, "w"),
+            )
+
+            for attachment in Attachment.objects.all():
+                self.assertEqual("b", attachment.volume)
+                self.assertTrue(os.path.isfile(attachment.file.path))
+                self.assertTrue(attachment.file.path.startswith(self.locations["b"]))
+
+        for path in old_paths:
+            self.assertFalse(os.path.exists(path))
+
+    def create_attachment(self, file_name):
+        with DemoFile(file_name, as_django_file=True) as file:
+            return Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=self.photo_album,
+                file=file,
+            )
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from testapp.models import PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment
+
+
+@override_settings(ATTACHMENT_COLD_STORAGE_AFTER=60 * 60 * 24 * 7)
+class TestTiering(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.locations = {}
+        for name in ("hot", "cold"):
+            self.locations[name] = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, self.locations[name])
+
+        settings_override = override_settings(
+            ATTACHMENT_STORAGE_VOLUMES={
+                "hot": self.locations["hot"],
+                "cold": {"location": self.locations["cold"], "tier": "cold"},
+            }
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_uploads_are_stored_on_hot_tier(self):
+        attachment = self.create_attachment()
+
+        self.assertEqual("hot", attachment.volume)
+
+    def test_move_to_cold_tier(self):
+        old = self.create_attachment(creation_date=timezone.now() - timedelta(days=30))
+        recently_accessed = self.create_attachment(
+            creation_date=timezone.now() - timedelta(days=30),
+            last_access_date=timezone.now() - timedelta(days=1),
+        )
+        new = self.create_attachment()
+        hot_path = old.file.path
+
+        self.tier()
+
+        old.refresh_from_db()
+        self.assertEqual("cold", old.volume)
+        self.assertTrue(old.file.path.startswith(self.locations["cold"]))
+        self.assertTrue(os.path.isfile(old.file.path))
+        self.assertFalse(os.path.exists(hot_path))
+        recently_accessed.refresh_from_db()
+        self.assertEqual("hot", recently_accessed.volume)
+        new.refresh_from_db()
+        self.assertEqual("hot", new.volume)
+
+        # downloads are served from the cold tier
+        response = self.client.get(f"/api/attachment/{old.pk}/download/")
+        with DemoFile(DemoFile.JPG) as demo_file:
+            self.assertEqual(demo_file.read(), response.getvalue())
+
+    def test_promote_to_hot_tier(self):
+        attachment = self.create_attachment(
+            creation_date=timezone.now() - timedelta(days=30)
+        )
+        self.tier()
+        cold_path = Attachment.objects.get(pk=attachment.pk).file.path
+
+        Attachment.objects.filter(pk=attachment.pk).update(
+            last_access_date=timezone.now()
+        )
+        self.tier(promote=True)
+
+        attachment.refresh_from_db()
+        self.assertEqual("hot", attachment.volume)
+        self.assertTrue(os.path.isfile(attachment.file.path))
+        self.assertFalse(os.path.exists(cold_path))
+
+    def tier(self, **options):
+        call_command("tier_attachments", stdout=open(os.devnull, "w"), **options)
+
+    def create_attachment(self, **values):
+        with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+            attachment = Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=self.photo_album,
+                file=file,
+            )
+        # creation_date is set automatically on creation
+        Attachment.objects.filter(pk=attachment.pk).update(**values)
+        return attachment
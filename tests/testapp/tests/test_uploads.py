@@ -0,0 +1,186 @@
+import os
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from testapp.models import PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment
+from drf_attachments.rest.serializers import AttachmentSerializer
+from drf_attachments.uploads import inspect_attachments
+from drf_attachments.utils import get_mime_type
+
+FORMSET_PREFIX = "drf_attachments-attachment-content_type-object_id"
+
+
+def upload_file(file_name):
+    with open(os.path.join(DemoFile.DIRECTORY, file_name), "rb") as file:
+        return SimpleUploadedFile(file_name, file.read())
+
+
+class TestUploadInspection(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.threads = []
+
+    def get_mime_type(self, file):
+        self.threads.append(threading.current_thread().name)
+        return get_mime_type(file)
+
+    def create_attachments(self, *file_names):
+        return [
+            Attachment(
+                content_object=self.photo_album,
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                file=upload_file(file_name),
+            )
+            for file_name in file_names
+        ]
+
+    def test_inspect_attachments(self):
+        attachments = self.create_attachments(DemoFile.JPG, DemoFile.SVG, DemoFile.PDF)
+
+        with mock.patch(
+            "drf_attachments.models.models.get_mime_type", self.get_mime_type
+        ):
+            errors = inspect_attachments(attachments)
+
+        self.assertEqual([1], list(errors))
+        self.assertIn("file", errors[1].detail)
+        self.assertEqual("image/jpeg", attachments[0].get_mime_type())
+        self.assertEqual("application/pdf", attachments[2].get_mime_type())
+        self.assertTrue(
+            all(name.startswith("drf_attachments_upload") for name in self.threads)
+        )
+
+    @override_settings(ATTACHMENT_UPLOAD_WORKERS=0)
+    def test_inspect_attachments_without_workers(self):
+        attachments = self.create_attachments(DemoFile.JPG, DemoFile.PDF)
+
+        with mock.patch(
+            "drf_attachments.models.models.get_mime_type", self.get_mime_type
+        ):
+            self.assertEqual({}, inspect_attachments(attachments))
+
+        self.assertEqual([threading.current_thread().name] * 2, self.threads)
+
+    def test_inspected_attachments_are_not_inspected_again(self):
+        attachments = self.create_attachments(DemoFile.JPG, DemoFile.PDF)
+        inspect_attachments(attachments)
+
+        with mock.patch(
+            "drf_attachments.models.models.get_mime_type", self.get_mime_type
+        ):
+            for attachment in attachments:
+                attachment.save()
+            self.assertEqual([], self.threads)
+
+            # changes of saved attachments are inspected again
+            attachments[0].file = upload_file(DemoFile.JPG)
+            attachments[0].save()
+            self.assertEqual(1, len(self.threads))
+
+    def test_replaced_files_are_inspected_again(self):
+        (attachment,) = self.create_attachments(DemoFile.JPG)
+        inspect_attachments([attachment])
+
+        # replaced by an invalid file before the attachment is saved
+        attachment.file = upload_file(DemoFile.SVG)
+        with self.assertRaises(ValidationError):
+            attachment.save()
+        self.assertFalse(Attachment.objects.exists())
+
+    def test_list_serializer(self):
+        data = [
+            {
+                "content_object": "http://any.domain/api/photo_album/album1/",
+                "context": settings.ATTACHMENT_DEFAULT_CONTEXT,
+                "file": upload_file(file_name),
+            }
+            for file_name in (DemoFile.JPG, DemoFile.PDF)
+        ]
+        serializer = AttachmentSerializer(data=data, many=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        with mock.patch(
+            "drf_attachments.models.models.get_mime_type", self.get_mime_type
+        ):
+            attachments = serializer.save()
+
+        self.assertEqual(2, self.photo_album.attachments.count())
+        self.assertEqual(
+            ["image/jpeg", "application/pdf"],
+            [attachment.get_mime_type() for attachment in attachments],
+        )
+        # each file is inspected once (within the pool)
+        self.assertEqual(2, len(self.threads))
+
+    def test_list_serializer_errors(self):
+        data = [
+            {
+                "content_object": "http://any.domain/api/photo_album/album1/",
+                "context": settings.ATTACHMENT_DEFAULT_CONTEXT,
+                "file": upload_file(file_name),
+            }
+            for file_name in (DemoFile.JPG, DemoFile.SVG)
+        ]
+        serializer = AttachmentSerializer(data=data, many=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        with self.assertRaises(ValidationError) as context:
+            serializer.save()
+
+        self.assertEqual({}, context.exception.detail[0])
+        self.assertIn("file", context.exception.detail[1])
+        self.assertEqual(0, Attachment.objects.count())
+
+
+class TestAdminInlineInspection(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+
+    def post_inline_forms(self, *file_names):
+        data = {
+            "name": self.photo_album.name,
+            f"{FORMSET_PREFIX}-TOTAL_FORMS": len(file_names),
+            f"{FORMSET_PREFIX}-INITIAL_FORMS": 0,
+        }
+        for index, file_name in enumerate(file_names):
+            data[f"{FORMSET_PREFIX}-{index}-name"] = f"attachment{index}"
+            data[
+                f"{FORMSET_PREFIX}-{index}-context"
+            ] = settings.ATTACHMENT_DEFAULT_CONTEXT
+            data[f"{FORMSET_PREFIX}-{index}-file"] = upload_file(file_name)
+
+        return self.client.post(
+            f"/admin/testapp/photoalbum/{self.photo_album.pk}/change/", data
+        )
+
+    def test_inline_attachments(self):
+        response = self.post_inline_forms(DemoFile.JPG, DemoFile.PDF)
+        self.assertEqual(302, response.status_code)
+        self.assertEqual(
+            {"attachment0": "image/jpeg", "attachment1": "application/pdf"},
+            {
+                attachment.name: attachment.get_mime_type()
+                for attachment in self.photo_album.attachments.all()
+            },
+        )
+
+    def test_inline_attachment_errors(self):
+        response = self.post_inline_forms(DemoFile.JPG, DemoFile.SVG)
+        self.assertEqual(200, response.status_code)
+
+        formset = response.context["inline_admin_formsets"][0].formset
+        self.assertEqual({}, formset.forms[0].errors)
+        self.assertIn("file", formset.forms[1].errors)
+        self.assertEqual(0, Attachment.objects.count())
@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from testapp.models import Diagram, PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment, AttachmentUsage
+from drf_attachments.models.annotations import annotate_attachment_stats
+
+JPG_SIZE = 24_819  # Bytes
+SVG_SIZE = 703  # Bytes
+
+
+@override_settings(ATTACHMENT_USAGE_TRACKING=True)
+class TestUsage(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.diagram = Diagram.objects.create(name="diagram1")
+        self.photo_album_type = ContentType.objects.get_for_model(PhotoAlbum)
+
+    def test_counters_follow_uploads_and_deletes(self):
+        first = self.create_attachment(self.photo_album, DemoFile.JPG)
+        self.create_attachment(self.photo_album, DemoFile.JPG)
+        self.assertEqual(
+            (2, 2 * JPG_SIZE),
+            AttachmentUsage.objects.get_usage(
+                self.photo_album_type.pk, self.photo_album.pk
+            ),
+        )
+        self.assertEqual(
+            (2, 2 * JPG_SIZE),
+            AttachmentUsage.objects.get_usage(self.photo_album_type.pk),
+        )
+
+        first.delete()
+        self.assertEqual(
+            (1, JPG_SIZE),
+            AttachmentUsage.objects.get_usage(
+                self.photo_album_type.pk, self.photo_album.pk
+            ),
+        )
+
+        # updating an attachment without changing its file keeps the counters
+        attachment = Attachment.objects.get()
+        attachment.name = "renamed"
+        attachment.save()
+        self.assertEqual(
+            (1, JPG_SIZE),
+            AttachmentUsage.objects.get_usage(
+                self.photo_album_type.pk, self.photo_album.pk
+            ),
+        )
+
+    def test_counters_follow_unique_upload_replacement(self):
+        self.create_attachment(self.diagram, DemoFile.SVG)
+        self.create_attachment(self.diagram, DemoFile.SVG)
+
+        self.assertEqual(
+            (1, SVG_SIZE),
+            AttachmentUsage.objects.get_usage(
+                ContentType.objects.get_for_model(Diagram).pk, self.diagram.pk
+            ),
+        )
+
+    def test_max_total_size_is_enforced(self):
+        with mock.patch.object(
+            PhotoAlbum.AttachmentMeta, "max_total_size", 2 * JPG_SIZE, create=True
+        ):
+            self.create_attachment(self.photo_album, DemoFile.JPG)
+            self.create_attachment(self.photo_album, DemoFile.JPG)
+
+            with self.assertNumQueries(1), self.assertRaises(ValidationError):
+                self.create_attachment(self.photo_album, DemoFile.JPG)
+
+        self.assertEqual(2, Attachment.objects.count())
+
+    def test_reconcile_command(self):
+        self.create_attachment(self.photo_album, DemoFile.JPG)
+        self.create_attachment(self.diagram, DemoFile.SVG)
+        AttachmentUsage.objects.update(attachment_count=42, total_size=42)
+
+        call_command("reconcile_attachment_usage", stdout=mock.MagicMock())
+
+        self.assertEqual(
+            (1, JPG_SIZE),
+            AttachmentUsage.objects.get_usage(
+                self.photo_album_type.pk, self.photo_album.pk
+            ),
+        )
+        self.assertEqual(
+            (1, JPG_SIZE),
+            AttachmentUsage.objects.get_usage(self.photo_album_type.pk),
+        )
+        self.assertEqual(4, AttachmentUsage.objects.count())
+
+    def test_annotations_from_usage_counters(self):
+        self.create_attachment(self.photo_album, DemoFile.JPG)
+
+        photo_album = annotate_attachment_stats(
+            PhotoAlbum.objects.all(), use_usage_counters=True
+        ).get()
+        self.assertEqual(1, photo_album.attachment_count)
+        self.assertEqual(JPG_SIZE, photo_album.attachment_total_size)
+
+    @staticmethod
+    def create_attachment(content_object, file_name):
+        with DemoFile(file_name, as_django_file=True) as file:
+            return Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=content_object,
+                file=file,
+            )
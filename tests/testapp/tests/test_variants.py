@@ -0,0 +1,174 @@
+import io
+import os
+from multiprocessing import get_context
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from PIL import Image
+from testapp.models import PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment
+from drf_attachments.rest.fields import DownloadURLField
+from drf_attachments.utils import delete_files
+from drf_attachments.variants import get_image_variant_name
+from drf_attachments.workers import create_process_pool
+
+IMAGE_VARIANTS = {
+    "thumbnail": {"width": 50, "format": "webp"},
+    "small": {"width": 100, "height": 100, "on_upload": True},
+}
+
+
+@override_settings(
+    ATTACHMENT_IMAGE_VARIANTS=IMAGE_VARIANTS,
+    ATTACHMENT_IMAGE_VARIANT_WORKERS=0,
+    ATTACHMENT_PROCESSING_EXECUTOR="sync",
+)
+class TestImageVariants(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(username="superuser")
+        self.client.force_login(self.superuser)
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+
+    def test_variant_on_demand(self):
+        attachment = self.create_attachment(DemoFile.JPG)
+        name = get_image_variant_name(attachment.file.name, "thumbnail")
+        self.assertEqual(
+            os.path.splitext(attachment.file.name)[0] + ".thumbnail.webp", name
+        )
+        self.assertFalse(attachment.file.storage.exists(name))
+
+        response = self.client.get(
+            f"/api/attachment/{attachment.pk}/download/?variant=thumbnail"
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertIn(".webp", response["Content-Disposition"])
+        with Image.open(io.BytesIO(response.getvalue())) as image:
+            self.assertEqual("WEBP", image.format)
+            self.assertEqual(50, image.width)
+        # stored next to the original
+        self.assertTrue(attachment.file.storage.exists(name))
+
+    def test_variant_on_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = self.create_attachment(DemoFile.JPG)
+
+        name = get_image_variant_name(attachment.file.name, "small")
+        self.assertTrue(attachment.file.storage.exists(name))
+        self.assertFalse(
+            attachment.file.storage.exists(
+                get_image_variant_name(attachment.file.name, "thumbnail")
+            )
+        )
+        with attachment.file.storage.open(name) as file, Image.open(file) as image:
+            self.assertEqual("JPEG", image.format)
+            self.assertLessEqual(max(image.size), 100)
+
+    @override_settings(ATTACHMENT_IMAGE_VARIANT_WORKERS=1)
+    def test_variant_via_process_pool(self):
+        attachment = self.create_attachment(DemoFile.JPG)
+
+        response = self.client.get(
+            f"/api/attachment/{attachment.pk}/download/?variant=thumbnail"
+        )
+
+        with Image.open(io.BytesIO(response.getvalue())) as image:
+            self.assertEqual(50, image.width)
+
+    @override_settings(ATTACHMENT_IMAGE_VARIANT_WORKERS=1)
+    def test_variant_via_spawned_process_pool(self):
+        # workers started via "spawn" (the default on macOS) don't inherit the loaded apps
+        pool = create_process_pool(1, mp_context=get_context("spawn"))
+        self.addCleanup(pool.shutdown)
+        attachment = self.create_attachment(DemoFile.JPG)
+
+        with mock.patch("drf_attachments.variants._pool", pool):
+            response = self.client.get(
+                f"/api/attachment/{attachment.pk}/download/?variant=thumbnail"
+            )
+
+        with Image.open(io.BytesIO(response.getvalue())) as image:
+            self.assertEqual(50, image.width)
+
+    def test_invalid_variant(self):
+        image = self.create_attachment(DemoFile.JPG)
+        pdf = self.create_attachment(DemoFile.PDF)
+
+        response = self.client.get(
+            f"/api/attachment/{image.pk}/download/?variant=unknown"
+        )
+        self.assertEqual(400, response.status_code)
+        response = self.client.get(
+            f"/api/attachment/{pdf.pk}/download/?variant=thumbnail"
+        )
+        self.assertEqual(400, response.status_code)
+
+    def test_variants_are_deleted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            attachments = [self.create_attachment(DemoFile.JPG) for _ in range(2)]
+        for attachment in attachments:
+            self.client.get(
+                f"/api/attachment/{attachment.pk}/download/?variant=thumbnail"
+            )
+        names = [
+            get_image_variant_name(attachment.file.name, variant)
+            for attachment in attachments
+            for variant in IMAGE_VARIANTS
+        ]
+        storage = attachments[0].file.storage
+        self.assertTrue(all(storage.exists(name) for name in names))
+
+        attachments[0].delete()
+        Attachment.objects.all().delete()
+
+        self.assertFalse(any(storage.exists(name) for name in names))
+
+    def test_delete_files_continues_after_failures(self):
+        storage = mock.Mock(spec=["delete"])
+        storage.delete.side_effect = [OSError("busy"), None, None, None, None, None]
+
+        delete_files(storage, ["a.jpg", "b.jpg"])
+
+        self.assertEqual(
+            ["a.jpg", "b.jpg"]
+            + [
+                get_image_variant_name(name, variant)
+                for name in ("a.jpg", "b.jpg")
+                for variant in IMAGE_VARIANTS
+            ],
+            [call.args[0] for call in storage.delete.call_args_list],
+        )
+
+    def test_delete_files_of_other_types(self):
+        storage = mock.Mock(spec=["delete"])
+
+        delete_files(storage, ["a.pdf", "b.csv.gz"])
+
+        # no variant names of files other than images
+        self.assertEqual(
+            ["a.pdf", "b.csv.gz"],
+            [call.args[0] for call in storage.delete.call_args_list],
+        )
+
+    def test_download_url_field(self):
+        attachment = self.create_attachment(DemoFile.JPG)
+        field = DownloadURLField(variant="thumbnail")
+        field.bind("thumbnail_url", None)
+
+        self.assertEqual(
+            f"/api/attachment/{attachment.pk}/download/?variant=thumbnail",
+            field.get_attribute(attachment),
+        )
+
+    def create_attachment(self, file_name):
+        with DemoFile(file_name, as_django_file=True) as file:
+            return Attachment.objects.create(
+                context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                content_object=self.photo_album,
+                file=file,
+            )
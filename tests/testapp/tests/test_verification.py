@@ -0,0 +1,235 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from multiprocessing import get_context
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from testapp.models import File, PhotoAlbum
+from testapp.tests.demo_files import DemoFile
+
+from drf_attachments.models import Attachment, AttachmentUsage
+from drf_attachments.verification import (
+    Checkpoint,
+    inspect_stored_file,
+    inspect_stored_files,
+)
+from drf_attachments.workers import create_process_pool
+
+CSV = b"".join(f"{i},row {i},{i * 2}\n".encode() for i in range(400))
+
+
+@override_settings(ATTACHMENT_USAGE_TRACKING=True)
+class TestVerification(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.checkpoint = os.path.join(self.directory, "checkpoint.json")
+
+        self.photo_album = PhotoAlbum.objects.create(name="album1")
+        self.photos = []
+        for _ in range(3):
+            with DemoFile(DemoFile.JPG, as_django_file=True) as file:
+                self.photos.append(
+                    Attachment.objects.create(
+                        context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+                        content_object=self.photo_album,
+                        file=file,
+                    )
+                )
+        self.photos.sort(key=lambda attachment: attachment.pk)
+
+    def call_command(self, *args, **kwargs):
+        stdout = io.StringIO()
+        kwargs.setdefault("workers", 0)
+        call_command(
+            "verify_attachments",
+            *args,
+            batch_size=2,
+            checkpoint=self.checkpoint,
+            stdout=stdout,
+            stderr=io.StringIO(),
+            **kwargs,
+        )
+        return stdout.getvalue()
+
+    def test_inspect_stored_file(self):
+        photo = self.photos[0]
+        meta, content_hash = inspect_stored_file(
+            photo.file.storage.location, photo.file.name
+        )
+        self.assertEqual(photo.meta, {**photo.meta, **meta})
+        self.assertEqual(photo.content_hash, content_hash)
+        self.assertIsNone(
+            inspect_stored_file(photo.file.storage.location, "attachments/missing")
+        )
+
+    def test_verify(self):
+        output = self.call_command()
+
+        self.assertIn("Verified 3 attachments", output)
+        self.assertIn(
+            "Updated 0 attachments with drifted meta data, 0 missing and 0 mismatched content hashes.",
+            output,
+        )
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_drifted_meta(self):
+        drifted, unhashed, missing = self.photos
+        meta = {**drifted.meta, "mime_type": "text/plain", "size": 1}
+        Attachment.objects.filter(pk=drifted.pk).update(meta=meta)
+        Attachment.objects.filter(pk=unhashed.pk).update(content_hash="")
+        os.remove(missing.file.path)
+        content_type = ContentType.objects.get_for_model(PhotoAlbum)
+        usage = AttachmentUsage.objects.get_usage(content_type.pk, self.photo_album.pk)
+        # the counters were recorded with the drifted size
+        AttachmentUsage.objects.record(
+            [(content_type.pk, self.photo_album.pk, 0, 1 - drifted.get_size())]
+        )
+
+        output = self.call_command(dry_run=True)
+        self.assertIn("Found 1 attachments with drifted meta data", output)
+        Attachment.objects.get(pk=drifted.pk, meta__mime_type="text/plain")
+
+        output = self.call_command(verbosity=2)
+        self.assertIn(
+            "Updated 1 attachments with drifted meta data (mime_type: 1, size: 1), "
+            "1 missing and 0 mismatched content hashes.",
+            output,
+        )
+        self.assertIn(f"Missing file of attachment {missing.pk}", output)
+
+        drifted.refresh_from_db()
+        self.assertEqual("image/jpeg", drifted.meta["mime_type"])
+        self.assertEqual(os.path.getsize(drifted.file.path), drifted.get_size())
+        unhashed.refresh_from_db()
+        self.assertEqual(self.photos[0].content_hash, unhashed.content_hash)
+        # the counters follow the corrected size
+        self.assertEqual(
+            usage,
+            AttachmentUsage.objects.get_usage(content_type.pk, self.photo_album.pk),
+        )
+
+    @override_settings(ATTACHMENT_COMPRESSION={"text/*": {}})
+    def test_compressed(self):
+        attachment = Attachment.objects.create(
+            name="data",
+            context=settings.ATTACHMENT_DEFAULT_CONTEXT,
+            content_object=File.objects.create(name="file1"),
+            file=ContentFile(CSV, name="data.csv"),
+        )
+        Attachment.objects.filter(pk=attachment.pk).update(content_hash="")
+
+        output = self.call_command()
+        self.assertIn("Updated 0 attachments with drifted meta data", output)
+        attachment.refresh_from_db()
+        self.assertEqual(len(CSV), attachment.get_size())
+        self.assertEqual(".csv", attachment.get_extension())
+        self.assertEqual(64, len(attachment.content_hash))
+
+    def test_replaced_file(self):
+        drifted = self.photos[0]
+        Attachment.objects.filter(pk=drifted.pk).update(
+            meta={**drifted.meta, "size": 1}
+        )
+        inspect = inspect_stored_files
+
+        def replace_file(files, pool=None):
+            results = inspect(files, pool=pool)
+            if drifted.file.name not in [name for _, name, _ in files]:
+                return results
+            # replaced (and its meta data changed) while the files were inspected
+            Attachment.objects.filter(pk=drifted.pk).update(
+                file="attachments/replaced.jpg",
+                meta={**drifted.meta, "processing_error": "failed"},
+            )
+            return results
+
+        with mock.patch(
+            "drf_attachments.management.commands.verify_attachments.inspect_stored_files",
+            side_effect=replace_file,
+        ):
+            output = self.call_command()
+
+        self.assertIn("Skipped 1 attachments whose files were replaced", output)
+        drifted.refresh_from_db()
+        self.assertEqual("attachments/replaced.jpg", drifted.file.name)
+        self.assertEqual("failed", drifted.meta["processing_error"])
+
+    def test_keeps_concurrent_meta_changes(self):
+        drifted = self.photos[0]
+        Attachment.objects.filter(pk=drifted.pk).update(
+            meta={**drifted.meta, "size": 1}
+        )
+        inspect = inspect_stored_files
+
+        def change_meta(files, pool=None):
+            results = inspect(files, pool=pool)
+            if drifted.file.name not in [name for _, name, _ in files]:
+                return results
+            Attachment.objects.filter(pk=drifted.pk).update(
+                meta={**drifted.meta, "size": 1, "processing_error": "failed"}
+            )
+            return results
+
+        with mock.patch(
+            "drf_attachments.management.commands.verify_attachments.inspect_stored_files",
+            side_effect=change_meta,
+        ):
+            self.call_command()
+
+        drifted.refresh_from_db()
+        self.assertEqual(os.path.getsize(drifted.file.path), drifted.get_size())
+        self.assertEqual("failed", drifted.meta["processing_error"])
+
+    def test_resume(self):
+        Attachment.objects.filter(pk__in=[photo.pk for photo in self.photos]).update(
+            content_hash=""
+        )
+        # interrupted after the first batch
+        with mock.patch.object(Checkpoint, "remove"):
+            with mock.patch(
+                "drf_attachments.management.commands.verify_attachments.inspect_stored_files",
+                side_effect=[
+                    [
+                        inspect_stored_file(
+                            photo.file.storage.location, photo.file.name
+                        )
+                        for photo in self.photos[:2]
+                    ],
+                    KeyboardInterrupt,
+                ],
+            ):
+                with self.assertRaises(KeyboardInterrupt):
+                    self.call_command()
+        with open(self.checkpoint) as file:
+            self.assertEqual(str(self.photos[1].pk), json.load(file)["last_pk"])
+
+        output = self.call_command()
+        self.assertIn(f"Resuming after attachment {self.photos[1].pk}.", output)
+        self.assertIn("Verified 3 attachments, 1 in", output)
+        self.assertIn("3 missing and 0 mismatched content hashes", output)
+        self.assertFalse(Attachment.objects.filter(content_hash="").exists())
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_process_pool(self):
+        Attachment.objects.filter(pk=self.photos[0].pk).update(content_hash="")
+        output = self.call_command(workers=2)
+        self.assertIn("1 missing and 0 mismatched content hashes", output)
+        self.assertFalse(Attachment.objects.filter(content_hash="").exists())
+
+    def test_spawned_process_pool(self):
+        photo = self.photos[0]
+        # workers started via "spawn" (e.g. on macOS) don't inherit the loaded apps
+        with create_process_pool(1, mp_context=get_context("spawn")) as pool:
+            ((meta, content_hash),) = inspect_stored_files(
+                [(photo.file.storage.location, photo.file.name, None)], pool=pool
+            )
+        self.assertEqual(photo.content_hash, content_hash)